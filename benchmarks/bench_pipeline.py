@@ -0,0 +1,426 @@
+"""End-to-end benchmark for the transcription pipeline.
+
+Generates deterministic speech-like audio, serves it from a local HTTP server
+and drives a real ``mini_transcriber.py`` process through its HTTP API for
+every combination of model size, compute type and thread count. Per-task
+numbers come from ``/api/tasks/{id}/timing``; results are written as JSON so
+two runs can be compared with ``--baseline``.
+
+``--profiles`` runs every clip with each decoding profile. ``--references DIR``
+adds real clips: every audio file with a same-named ``.txt`` transcript is
+transcribed and scored (character error rate for CJK text, word error rate
+otherwise), so the accuracy cost of a faster profile can be measured.
+
+Example:
+    python benchmarks/bench_pipeline.py --models tiny,base --compute int8,float32 \
+        --threads 2,4 --lengths 30,300 --profiles fast,balanced,accurate \
+        --references ~/bench-clips --output bench.json
+"""
+
+import argparse
+import functools
+import http.server
+import itertools
+import json
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SERVICE_SCRIPT = REPO_DIR / "mini_transcriber.py"
+SAMPLE_RATE = 16000
+TERMINAL_STATUSES = ("done", "error", "canceled")
+AUDIO_SUFFIXES = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".webm", ".mp4")
+
+
+def synth_speech(seconds: float, seed: int = 1234) -> np.ndarray:
+    """Syllable-like voiced bursts with a moving pitch, formant-ish harmonics and pauses."""
+    rng = np.random.default_rng(seed)
+    total = int(seconds * SAMPLE_RATE)
+    out = np.zeros(total, dtype=np.float32)
+    pos = 0
+    while pos < total:
+        if rng.random() < 0.15:
+            pos += int(rng.uniform(0.2, 0.6) * SAMPLE_RATE)
+            continue
+        length = min(int(rng.uniform(0.12, 0.35) * SAMPLE_RATE), total - pos)
+        t = np.arange(length) / SAMPLE_RATE
+        f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        formants = rng.uniform([300, 900, 2200], [800, 1800, 3000])
+        burst = np.zeros(length, dtype=np.float64)
+        for harmonic in range(1, 16):
+            freq = f0 * harmonic
+            gain = sum(np.exp(-(((freq - formant) / 150) ** 2)) for formant in formants) + 0.02
+            burst += gain / harmonic * np.sin(harmonic * phase)
+        burst *= np.hanning(length)
+        burst += rng.normal(0, 0.01, length)
+        out[pos:pos + length] = burst / (np.abs(burst).max() or 1) * 0.5
+        pos += length + int(rng.uniform(0.02, 0.08) * SAMPLE_RATE)
+    return out
+
+
+def write_wav(path: Path, samples: np.ndarray) -> None:
+    with wave.open(str(path), "wb") as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(SAMPLE_RATE)
+        handle.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class QuietServer(http.server.ThreadingHTTPServer):
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # yt-dlp probes the file and drops the connection; that is not an error here
+        pass
+
+
+def start_file_server(directory: Path) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(QuietHandler, directory=str(directory))
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="bench-files", daemon=True).start()
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Service:
+    """One mini_transcriber.py process with its own TEMP_DIR."""
+
+    def __init__(self, python: str, env: Dict[str, str], keep_dir: bool) -> None:
+        self.port = free_port()
+        self.token = uuid.uuid4().hex
+        self.base_dir = Path(tempfile.mkdtemp(prefix="bench-transcriber-"))
+        self.keep_dir = keep_dir
+        service_env = dict(os.environ)
+        service_env.update(env)
+        service_env.update(
+            {
+                "TRANSCRIBER_BASE_DIR": str(self.base_dir),
+                "TRANSCRIBER_PORT": str(self.port),
+                "TRANSCRIBER_TOKEN": self.token,
+                "TRANSCRIBER_IDLE_SECONDS": "0",
+                # Repeats and profile runs reuse the same clips; dedup would skip their transcription
+                "TRANSCRIBER_DEDUP": "0",
+                "TRANSCRIBER_TWO_PASS": "0",
+            }
+        )
+        self.log_handle = (self.base_dir / "bench-stderr.log").open("wb")
+        self.process = subprocess.Popen(
+            [python, str(SERVICE_SCRIPT)],
+            env=service_env,
+            stdout=self.log_handle,
+            stderr=subprocess.STDOUT,
+        )
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None, raw: bool = False) -> Any:
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}{path}",
+            data=data,
+            method=method,
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=30) as response:
+            body = response.read()
+        return body.decode("utf-8") if raw else json.loads(body)
+
+    def wait_ready(self, timeout: float) -> float:
+        start = time.monotonic()
+        while time.monotonic() - start < timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"service exited with code {self.process.returncode}")
+            try:
+                self.request("GET", "/health")
+                return time.monotonic() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.1)
+        raise TimeoutError("service did not become ready")
+
+    def run_task(self, url: str, title: str, timeout: float, profile: Optional[str] = None) -> Dict[str, Any]:
+        payload = {"url": url, "title": title, "profile": profile}
+        task_id = self.request("POST", "/api/tasks", payload)["task"]["id"]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            task = next(item for item in self.request("GET", "/api/tasks")["tasks"] if item["id"] == task_id)
+            if task["status"] in TERMINAL_STATUSES:
+                break
+            time.sleep(0.25)
+        else:
+            self.request("POST", f"/api/tasks/{task_id}/cancel")
+            raise TimeoutError(f"task {task_id} did not finish in {timeout:.0f}s")
+        # The worker finalizes the timeline (peak RSS, totals) just after the status flips
+        timing = self.request("GET", f"/api/tasks/{task_id}/timing")
+        while timing["running"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+            timing = self.request("GET", f"/api/tasks/{task_id}/timing")
+        text = self.request("GET", f"/api/tasks/{task_id}/result", raw=True) if task["status"] == "done" else None
+        return {"task": task, "timing": timing, "text": text}
+
+    def close(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log_handle.close()
+        if not self.keep_dir:
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+def stage_seconds(timeline: Optional[Dict[str, Any]], *names: str) -> float:
+    if not timeline:
+        return 0.0
+    return round(sum(stage["ms"] for stage in timeline["stages"] if stage["name"] in names) / 1000, 3)
+
+
+def error_rate(reference: str, hypothesis: str) -> float:
+    """Levenshtein distance over characters (CJK) or words, divided by the reference length."""
+    ascii_letters = sum(char.isascii() and char.isalpha() for char in reference)
+    if ascii_letters > len(reference) / 2:
+        ref = re.findall(r"\w+", reference.lower())
+        hyp = re.findall(r"\w+", hypothesis.lower())
+    else:
+        ref = [char for char in reference if char.isalnum()]
+        hyp = [char for char in hypothesis if char.isalnum()]
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_token in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_token != hyp_token)))
+        previous = current
+    return round(previous[-1] / len(ref), 4)
+
+
+def summarize(result: Dict[str, Any], clip: Dict[str, Any], profile: Optional[str]) -> Dict[str, Any]:
+    task = result["task"]
+    timeline = result["timing"].get("timeline") or {}
+    total = (timeline.get("totalMs") or 0) / 1000
+    reference = clip.get("reference")
+    return {
+        "clip": clip["name"],
+        "profile": profile or task.get("decodeProfile"),
+        "length": timeline.get("audioDuration") or clip.get("length"),
+        "status": task["status"],
+        "error": task.get("errorMessage"),
+        "totalSeconds": round(total, 3),
+        "downloadSeconds": stage_seconds(timeline, "metadata", "download"),
+        "postprocessSeconds": stage_seconds(timeline, "postprocess"),
+        "modelWaitSeconds": stage_seconds(timeline, "model_wait"),
+        "transcribeSeconds": stage_seconds(timeline, "decode", "opencc"),
+        "realtimeFactor": timeline.get("realtimeFactor"),
+        "peakRssMb": round(timeline["peakRssBytes"] / 1048576, 1) if timeline.get("peakRssBytes") else None,
+        "tasksPerHour": round(3600 / total, 2) if total and task["status"] == "done" else None,
+        "errorRate": error_rate(reference, result["text"]) if reference and result["text"] is not None else None,
+        "stages": timeline.get("stages") or [],
+    }
+
+
+def run_config(args: argparse.Namespace, config: Dict[str, Any], clips: List[Dict[str, Any]]) -> Dict[str, Any]:
+    env = {
+        "WHISPER_MODEL": config["model"],
+        "WHISPER_COMPUTE": config["compute"],
+        "TRANSCRIBER_CPU_THREADS": str(config["threads"]),
+    }
+    service = Service(args.python, env, args.keep)
+    entry: Dict[str, Any] = {"config": config, "runs": []}
+    try:
+        entry["readySeconds"] = round(service.wait_ready(args.ready_timeout), 3)
+        # The first task pays for the model load; report it separately from steady state
+        entry["warmup"] = summarize(service.run_task(clips[0]["url"], "warmup", args.task_timeout), clips[0], None)
+        for profile, clip, repeat in itertools.product(args.profiles, clips, range(args.repeat)):
+            result = service.run_task(clip["url"], f"bench-{clip['name']}-{repeat}", args.task_timeout, profile)
+            run = summarize(result, clip, profile)
+            entry["runs"].append(run)
+            print(
+                f"  {profile:<9} {clip['name']:<24} status={run['status']} total={run['totalSeconds']}s "
+                f"download={run['downloadSeconds']}s post={run['postprocessSeconds']}s "
+                f"transcribe={run['transcribeSeconds']}s rtf={run['realtimeFactor']} "
+                f"peak={run['peakRssMb']}MB err={run['errorRate']}",
+                flush=True,
+            )
+        finished = [run for run in entry["runs"] if run["status"] == "done"]
+        busy = sum(run["totalSeconds"] for run in finished)
+        entry["tasksPerHour"] = round(len(finished) * 3600 / busy, 2) if busy else None
+        entry["audioHoursPerHour"] = round(sum(run["length"] or 0 for run in finished) / busy, 2) if busy else None
+        entry["profiles"] = profile_summary(finished)
+    except Exception as exc:
+        entry["error"] = str(exc)
+        print(f"  failed: {exc}", flush=True)
+    finally:
+        service.close()
+    return entry
+
+
+def profile_summary(runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Mean realtime factor and error rate per profile, with the error change against "accurate"."""
+    summary: Dict[str, Dict[str, Any]] = {}
+    for profile in dict.fromkeys(run["profile"] for run in runs):
+        own = [run for run in runs if run["profile"] == profile]
+        factors = [run["realtimeFactor"] for run in own if run["realtimeFactor"] is not None]
+        errors = [run["errorRate"] for run in own if run["errorRate"] is not None]
+        summary[profile] = {
+            "runs": len(own),
+            "realtimeFactor": round(sum(factors) / len(factors), 4) if factors else None,
+            "errorRate": round(sum(errors) / len(errors), 4) if errors else None,
+        }
+    accurate = summary.get("accurate", {}).get("errorRate")
+    for item in summary.values():
+        item["errorRateDelta"] = (
+            round(item["errorRate"] - accurate, 4) if item["errorRate"] is not None and accurate is not None else None
+        )
+    return summary
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    return f"{config['model']}/{config['compute']}/t{config['threads']}"
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    previous = {
+        (config_key(entry["config"]), run.get("profile"), run.get("clip")): run
+        for entry in baseline.get("results", [])
+        for run in entry.get("runs", [])
+    }
+    print(f"\nCompared with {baseline_path}:")
+    for entry in results:
+        for run in entry["runs"]:
+            old = previous.get((config_key(entry["config"]), run["profile"], run["clip"]))
+            if not old or not old.get("totalSeconds") or not run["totalSeconds"]:
+                continue
+            change = (run["totalSeconds"] - old["totalSeconds"]) / old["totalSeconds"] * 100
+            print(
+                f"  {config_key(entry['config']):<28} {run['profile']:<9} {run['clip']:<24} "
+                f"{old['totalSeconds']:>8.2f}s -> {run['totalSeconds']:>8.2f}s ({change:+.1f}%) "
+                f"rtf {old.get('realtimeFactor')} -> {run['realtimeFactor']}"
+            )
+
+
+def package_version(name: str) -> Optional[str]:
+    try:
+        from importlib.metadata import version
+
+        return version(name)
+    except Exception:
+        return None
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_list(value: str, cast=str) -> List[Any]:
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="base", help="comma separated WHISPER_MODEL values")
+    parser.add_argument("--compute", default="int8", help="comma separated WHISPER_COMPUTE values")
+    parser.add_argument("--threads", default="4", help="comma separated TRANSCRIBER_CPU_THREADS values")
+    parser.add_argument("--lengths", default="30,120,600", help="comma separated clip lengths in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per clip length")
+    parser.add_argument("--profiles", default="accurate", help="comma separated decoding profiles")
+    parser.add_argument("--references", type=Path, help="directory of audio files with same-named .txt transcripts")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, default=Path("bench_pipeline.json"))
+    parser.add_argument("--baseline", type=Path, help="earlier output to compare against")
+    parser.add_argument("--python", default=sys.executable, help="interpreter used to run the service")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--task-timeout", type=float, default=3600)
+    parser.add_argument("--keep", action="store_true", help="keep each service TEMP_DIR for inspection")
+    args = parser.parse_args()
+    args.profiles = parse_list(args.profiles)
+
+    clip_dir = Path(tempfile.mkdtemp(prefix="bench-clips-"))
+    server = start_file_server(clip_dir)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    clips: List[Dict[str, Any]] = []
+    for length in parse_list(args.lengths, float):
+        name = f"speech-{length:g}s.wav"
+        write_wav(clip_dir / name, synth_speech(length, args.seed))
+        clips.append({"name": name, "length": length, "url": f"{base_url}/{name}"})
+    if args.references:
+        for audio in sorted(args.references.iterdir()):
+            transcript = audio.with_suffix(".txt")
+            if audio.suffix.lower() not in AUDIO_SUFFIXES or not transcript.is_file():
+                continue
+            shutil.copyfile(audio, clip_dir / audio.name)
+            clips.append(
+                {
+                    "name": audio.name,
+                    "url": f"{base_url}/{urllib.request.pathname2url(audio.name)}",
+                    "reference": transcript.read_text(encoding="utf-8"),
+                }
+            )
+    if not clips:
+        parser.error("no clips: pass --lengths and/or --references")
+
+    results = []
+    try:
+        for model, compute, threads in itertools.product(
+            parse_list(args.models), parse_list(args.compute), parse_list(args.threads, int)
+        ):
+            config = {"model": model, "compute": compute, "threads": threads}
+            print(f"{config_key(config)}", flush=True)
+            results.append(run_config(args, config, clips))
+    finally:
+        server.shutdown()
+        shutil.rmtree(clip_dir, ignore_errors=True)
+
+    report = {
+        "createdAt": time.time(),
+        "revision": git_revision(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpuCount": os.cpu_count(),
+        "python": platform.python_version(),
+        "packages": {name: package_version(name) for name in ("yt-dlp", "faster-whisper", "ctranslate2", "av")},
+        "seed": args.seed,
+        "profiles": args.profiles,
+        "clips": [{key: clip.get(key) for key in ("name", "length")} for clip in clips],
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        print_comparison(results, args.baseline)
+    ok = all(
+        "error" not in entry and all(run["status"] == "done" for run in entry["runs"]) for entry in results
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
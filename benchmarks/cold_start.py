@@ -0,0 +1,237 @@
+"""Cold-start benchmark for the local service.
+
+Starts ``mini_transcriber.py`` repeatedly the way the native host does and
+measures, from the moment the process is spawned, when the port accepts
+connections, when ``/health`` answers, when the first authenticated API call
+answers and when background warm-up finishes. The service's own startup
+timeline (``startup`` in ``/api/status``, ms since process start) is recorded
+for every run, so a regression can be traced to a phase.
+
+``--tasks N`` seeds the database with N queued tasks first (the service runs
+with ``TRANSCRIBER_LOCAL_WORKER=0`` so they stay queued), which shows how
+startup scales with history. Results are written as JSON; pass an earlier
+output as ``--baseline`` to compare medians. Uses only the standard library.
+
+Example:
+    python benchmarks/cold_start.py --runs 10 --tasks 500 --output cold.json --baseline previous.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SERVICE_SCRIPT = REPO_DIR / "mini_transcriber.py"
+MARKS = ("portOpenMs", "healthMs", "apiReadyMs", "warmupDoneMs")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port: int, method: str, path: str, token: str = "", payload: Any = None, timeout: float = 5):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def start_service(args: argparse.Namespace, port: int, token: str, base_dir: Path) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "TRANSCRIBER_BASE_DIR": str(base_dir),
+            "TRANSCRIBER_PORT": str(port),
+            "TRANSCRIBER_TOKEN": token,
+            "TRANSCRIBER_IDLE_SECONDS": "0",
+            "TRANSCRIBER_PIPELINE": "fake",
+            "TRANSCRIBER_AUTOTUNE": "0",
+            "TRANSCRIBER_PROBE_DURATION": "0",
+            "TRANSCRIBER_LOCAL_WORKER": "0",
+            "TRANSCRIBER_BULK_MAX_TASKS": str(max(args.tasks, 1)),
+        }
+    )
+    log = (base_dir / "cold-start-stderr.log").open("ab")
+    return subprocess.Popen([args.python, str(SERVICE_SCRIPT)], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stop_service(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def seed_tasks(args: argparse.Namespace, base_dir: Path) -> None:
+    port = free_port()
+    token = uuid.uuid4().hex
+    process = start_service(args, port, token, base_dir)
+    try:
+        measure_until_ready(port, token, process, args.timeout, wait_warmup=False)
+        urls = [f"https://example.invalid/video/{index}" for index in range(args.tasks)]
+        status, data = request(port, "POST", "/api/tasks/bulk", token, {"urls": urls}, timeout=60)
+        if status != 200:
+            raise RuntimeError(f"seeding failed: {status} {data[:200]!r}")
+    finally:
+        stop_service(process)
+
+
+def measure_until_ready(
+    port: int, token: str, process: subprocess.Popen, timeout: float, wait_warmup: bool
+) -> Dict[str, Any]:
+    """Poll the new process; each mark is ms since it was spawned."""
+    spawned = time.perf_counter()
+    deadline = spawned + timeout
+    marks: Dict[str, Any] = {}
+
+    def mark(name: str) -> None:
+        marks.setdefault(name, round((time.perf_counter() - spawned) * 1000, 1))
+
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"service exited with code {process.returncode}")
+        try:
+            if "portOpenMs" not in marks:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                mark("portOpenMs")
+            if "healthMs" not in marks:
+                if request(port, "GET", "/health")[0] != 200:
+                    continue
+                mark("healthMs")
+            if "apiReadyMs" not in marks:
+                if request(port, "GET", "/api/tasks", token, timeout=timeout)[0] != 200:
+                    continue
+                mark("apiReadyMs")
+            status, data = request(port, "GET", "/api/status", token)
+            if status != 200:
+                continue
+            # Revisions before the startup timeline have no "startup"; only the marks are measured
+            startup = json.loads(data).get("startup")
+            phases = startup["phases"] if startup else []
+            if not wait_warmup or not startup or any(item["phase"] == "warmup_done" for item in phases):
+                if wait_warmup and startup:
+                    mark("warmupDoneMs")
+                marks["phases"] = {item["phase"]: item["ms"] for item in phases}
+                return marks
+        except OSError:
+            time.sleep(0.005)
+            continue
+        time.sleep(0.02)
+    raise TimeoutError(f"service not ready after {timeout}s: {marks}")
+
+
+def median(values: List[float]) -> Optional[float]:
+    return round(statistics.median(values), 1) if values else None
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    names = {name for run in runs for name in run["phases"]}
+    phases = {name: median([run["phases"][name] for run in runs if name in run["phases"]]) for name in names}
+    return {
+        "marks": {name: median([run[name] for run in runs if name in run]) for name in MARKS},
+        "phases": dict(sorted(phases.items(), key=lambda item: item[1])),
+    }
+
+
+def print_comparison(summary: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")).get("median", {})
+    print(f"\nCompared with {baseline_path} (medians):")
+    for group in ("marks", "phases"):
+        for name, value in summary[group].items():
+            old = baseline.get(group, {}).get(name)
+            if old is None or value is None:
+                continue
+            change = (value - old) / old * 100 if old else 0.0
+            print(f"  {name:<20} {old:>9.1f}ms -> {value:>9.1f}ms ({change:+.1f}%)")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=0, help="queued tasks to seed the database with")
+    parser.add_argument("--no-warmup", action="store_true", help="stop each run once the API answers")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--output", type=Path, default=Path("cold_start.json"))
+    parser.add_argument("--baseline", type=Path, help="earlier output to compare against")
+    args = parser.parse_args()
+
+    base_dir = Path(tempfile.mkdtemp(prefix="cold-start-transcriber-"))
+    runs: List[Dict[str, Any]] = []
+    try:
+        if args.tasks:
+            seed_tasks(args, base_dir)
+        for index in range(args.runs):
+            port = free_port()
+            token = uuid.uuid4().hex
+            process = start_service(args, port, token, base_dir)
+            try:
+                run = measure_until_ready(port, token, process, args.timeout, wait_warmup=not args.no_warmup)
+            finally:
+                stop_service(process)
+            runs.append(run)
+            print(
+                f"run {index + 1}/{args.runs}: "
+                + " ".join(f"{name}={run[name]}" for name in MARKS if name in run)
+            )
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    summary = summarize(runs)
+    report = {
+        "createdAt": time.time(),
+        "revision": git_revision(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "python": platform.python_version(),
+        "config": {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()},
+        "median": summary,
+        "runs": runs,
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"\n{'phase (median)':<24}{'ms':>10}")
+    for name, value in summary["marks"].items():
+        if value is not None:
+            print(f"{name:<24}{value:>10.1f}")
+    print()
+    for name, value in summary["phases"].items():
+        print(f"{name:<24}{value:>10.1f}")
+    print(f"\nWrote {args.output}")
+    if args.baseline:
+        print_comparison(summary, args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""Load test for the API/orchestration layer, independent of ML cost.
+
+Starts ``mini_transcriber.py`` with ``TRANSCRIBER_PIPELINE=fake`` (timed
+stand-ins for yt-dlp and Whisper that still emit progress, checkpoints and
+DB writes) and ``TRANSCRIBER_LOCK_STATS=1``, then simulates side-panel
+clients: pollers hitting ``/api/tasks``, open ``/api/tasks/stream`` SSE
+connections, and a creator that adds tasks and cancels some of them.
+
+Reports request latency percentiles per endpoint, SSE event gaps, lock
+wait/hold times and DB writes per second (from ``/metrics``). Uses only the
+standard library.
+
+Example:
+    python benchmarks/loadtest.py --pollers 50 --sse 20 --create-rate 2 --duration 60
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SERVICE_SCRIPT = REPO_DIR / "mini_transcriber.py"
+METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+class Recorder:
+    """Thread-safe latency and error bookkeeping per operation."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def error(self, name: str) -> None:
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        with self.lock:
+            names = sorted(set(self.samples) | set(self.errors))
+            return {
+                name: {
+                    "count": len(self.samples.get(name, [])),
+                    "errors": self.errors.get(name, 0),
+                    "perSecond": round(len(self.samples.get(name, [])) / duration, 2),
+                    **percentiles(self.samples.get(name, [])),
+                }
+                for name in names
+            }
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50Ms": None, "p90Ms": None, "p99Ms": None, "maxMs": None}
+    ordered = sorted(values)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {"p50Ms": pick(0.5), "p90Ms": pick(0.9), "p99Ms": pick(0.99), "maxMs": round(ordered[-1] * 1000, 2)}
+
+
+class Client:
+    def __init__(self, port: int, token: str) -> None:
+        self.port = port
+        self.token = token
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def timed(self, recorder: Recorder, name: str, method: str, path: str, payload=None) -> Optional[bytes]:
+        start = time.perf_counter()
+        try:
+            status, data = self.request(method, path, payload)
+        except OSError:
+            recorder.error(name)
+            return None
+        recorder.add(name, time.perf_counter() - start)
+        if status >= 400:
+            recorder.error(name)
+            return None
+        return data
+
+
+def scrape_metrics(client: Client) -> Dict[str, float]:
+    status, data = client.request("GET", "/metrics")
+    values: Dict[str, float] = {}
+    if status != 200:
+        return values
+    for line in data.decode().splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            values[match.group(1) + (match.group(2) or "")] = float(match.group(3))
+    return values
+
+
+def histogram_summary(before: Dict[str, float], after: Dict[str, float], name: str, label: str) -> Dict[str, Any]:
+    def delta(key: str) -> float:
+        return after.get(key, 0.0) - before.get(key, 0.0)
+
+    count = delta(f"{name}_count{label}")
+    total = delta(f"{name}_sum{label}")
+    buckets = []
+    prefix = f"{name}_bucket{label[:-1]},le=" if label else f"{name}_bucket{{le="
+    for key in after:
+        if key.startswith(prefix):
+            bound = key[len(prefix):].strip('"}')
+            buckets.append((float("inf") if bound == "+Inf" else float(bound), delta(key)))
+    buckets.sort()
+
+    def upper_bound(fraction: float) -> Optional[float]:
+        for bound, cumulative in buckets:
+            if count and cumulative >= fraction * count:
+                return None if bound == float("inf") else round(bound * 1000, 3)
+        return None
+
+    return {
+        "count": int(count),
+        "meanMs": round(total / count * 1000, 4) if count else None,
+        "totalMs": round(total * 1000, 2),
+        # Histogram bucket upper bounds, so these are "at most" values
+        "p50LeMs": upper_bound(0.5),
+        "p99LeMs": upper_bound(0.99),
+    }
+
+
+def poller(client: Client, recorder: Recorder, interval: float, stop: threading.Event) -> None:
+    time.sleep(random.uniform(0, interval))
+    while not stop.is_set():
+        client.timed(recorder, "GET /api/tasks", "GET", "/api/tasks")
+        stop.wait(interval)
+
+
+def sse_client(client: Client, recorder: Recorder, stop: threading.Event) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", client.port, timeout=30)
+    start = time.perf_counter()
+    try:
+        conn.request("GET", "/api/tasks/stream", headers={"Authorization": f"Bearer {client.token}"})
+        response = conn.getresponse()
+        last = None
+        while not stop.is_set():
+            line = response.fp.readline()
+            if not line:
+                recorder.error("SSE event")
+                return
+            if not line.startswith(b"data: "):
+                continue
+            now = time.perf_counter()
+            if last is None:
+                recorder.add("SSE first event", now - start)
+            else:
+                # The stream pushes once per second; anything above that is server-side delay
+                recorder.add("SSE event gap", now - last)
+            last = now
+    except OSError:
+        recorder.error("SSE event")
+    finally:
+        conn.close()
+
+
+def creator(
+    client: Client,
+    recorder: Recorder,
+    rate: float,
+    cancel_ratio: float,
+    stop: threading.Event,
+    created: List[str],
+) -> None:
+    while not stop.wait(random.expovariate(rate)):
+        data = client.timed(
+            recorder,
+            "POST /api/tasks",
+            "POST",
+            "/api/tasks",
+            {"url": f"https://example.invalid/video/{uuid.uuid4().hex}", "title": "loadtest"},
+        )
+        if data is None:
+            continue
+        task_id = json.loads(data)["task"]["id"]
+        created.append(task_id)
+        if random.random() < cancel_ratio:
+            timer = threading.Timer(
+                random.uniform(0, 3),
+                client.timed,
+                args=(recorder, "POST /api/tasks/{id}/cancel", "POST", f"/api/tasks/{task_id}/cancel"),
+            )
+            timer.daemon = True
+            timer.start()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_service(args: argparse.Namespace, port: int, token: str, base_dir: Path) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        {
+            "TRANSCRIBER_BASE_DIR": str(base_dir),
+            "TRANSCRIBER_PORT": str(port),
+            "TRANSCRIBER_TOKEN": token,
+            "TRANSCRIBER_IDLE_SECONDS": "0",
+            "TRANSCRIBER_PIPELINE": "fake",
+            "TRANSCRIBER_LOCK_STATS": "1",
+            "TRANSCRIBER_FAKE_DOWNLOAD_SECONDS": str(args.fake_download),
+            "TRANSCRIBER_FAKE_TRANSCRIBE_SECONDS": str(args.fake_transcribe),
+            "TRANSCRIBER_FAKE_PROGRESS_HZ": str(args.progress_hz),
+        }
+    )
+    log = (base_dir / "loadtest-stderr.log").open("wb")
+    return subprocess.Popen([args.python, str(SERVICE_SCRIPT)], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(client: Client, process: Optional[subprocess.Popen], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"service exited with code {process.returncode}")
+        try:
+            if client.request("GET", "/health")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("service did not become ready")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pollers", type=int, default=20, help="clients polling /api/tasks")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--sse", type=int, default=10, help="clients holding /api/tasks/stream open")
+    parser.add_argument("--create-rate", type=float, default=0.5, help="new tasks per second")
+    parser.add_argument("--cancel-ratio", type=float, default=0.2, help="share of created tasks canceled")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--fake-download", type=float, default=2)
+    parser.add_argument("--fake-transcribe", type=float, default=5)
+    parser.add_argument("--progress-hz", type=float, default=4)
+    parser.add_argument("--attach", type=int, help="use an already running service on this port")
+    parser.add_argument("--token", help="token for --attach")
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, default=Path("loadtest.json"))
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    process = None
+    base_dir = None
+    if args.attach:
+        client = Client(args.attach, args.token or "")
+    else:
+        base_dir = Path(tempfile.mkdtemp(prefix="loadtest-transcriber-"))
+        client = Client(free_port(), uuid.uuid4().hex)
+        process = start_service(args, client.port, client.token, base_dir)
+
+    recorder = Recorder()
+    stop = threading.Event()
+    created: List[str] = []
+    try:
+        wait_ready(client, process)
+        before = scrape_metrics(client)
+        threads = [
+            threading.Thread(target=poller, args=(client, recorder, args.poll_interval, stop), daemon=True)
+            for _ in range(args.pollers)
+        ]
+        threads += [
+            threading.Thread(target=sse_client, args=(client, recorder, stop), daemon=True)
+            for _ in range(args.sse)
+        ]
+        if args.create_rate > 0:
+            threads.append(
+                threading.Thread(
+                    target=creator,
+                    args=(client, recorder, args.create_rate, args.cancel_ratio, stop, created),
+                    daemon=True,
+                )
+            )
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        elapsed = time.perf_counter() - started
+        after = scrape_metrics(client)
+        for thread in threads:
+            thread.join(timeout=5)
+    finally:
+        stop.set()
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if base_dir is not None:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    write_count = "transcriber_db_write_seconds_count"
+    db_writes = after.get(write_count, 0) - before.get(write_count, 0)
+    report = {
+        "createdAt": time.time(),
+        "config": {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()},
+        "elapsedSeconds": round(elapsed, 2),
+        "tasksCreated": len(created),
+        "requests": recorder.summary(elapsed),
+        "dbWritesPerSecond": round(db_writes / elapsed, 2),
+        "dbWrite": histogram_summary(before, after, "transcriber_db_write_seconds", ""),
+        "locks": {
+            name: {
+                "wait": histogram_summary(before, after, "transcriber_lock_wait_seconds", f'{{lock="{name}"}}'),
+                "hold": histogram_summary(before, after, "transcriber_lock_hold_seconds", f'{{lock="{name}"}}'),
+            }
+            for name in ("tasks", "db")
+        },
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    print(f"{'operation':<32}{'count':>8}{'err':>6}{'p50ms':>10}{'p90ms':>10}{'p99ms':>10}{'maxms':>10}")
+    for name, stats in report["requests"].items():
+        print(
+            f"{name:<32}{stats['count']:>8}{stats['errors']:>6}{str(stats['p50Ms']):>10}"
+            f"{str(stats['p90Ms']):>10}{str(stats['p99Ms']):>10}{str(stats['maxMs']):>10}"
+        )
+    print(f"\nDB writes/s: {report['dbWritesPerSecond']}  mean write: {report['dbWrite']['meanMs']} ms")
+    for name, stats in report["locks"].items():
+        print(
+            f"lock {name:<6} acquisitions={stats['hold']['count']} mean_hold={stats['hold']['meanMs']}ms "
+            f"p99_hold<={stats['hold']['p99LeMs']}ms mean_wait={stats['wait']['meanMs']}ms "
+            f"p99_wait<={stats['wait']['p99LeMs']}ms"
+        )
+    print(f"\nWrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
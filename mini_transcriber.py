@@ -1,23 +1,86 @@
+import os
+import socket
+import sys
+import time
+
+_MODULE_STARTED_AT = time.time()
+
+
+def _process_started_at() -> float:
+    """Wall-clock start of this process from /proc (Linux); elsewhere the time this module started."""
+    try:
+        with open("/proc/self/stat", "rb") as handle:
+            fields = handle.read().rsplit(b")", 1)[1].split()
+        with open("/proc/uptime", "rb") as handle:
+            uptime = float(handle.read().split()[0])
+        age = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _MODULE_STARTED_AT
+    return min(_MODULE_STARTED_AT, time.time() - age)
+
+
+SERVICE_STARTED_AT = _process_started_at()
+# Startup phases in ms since SERVICE_STARTED_AT, reported by /api/status
+startup_timeline = [{"phase": "module_start", "ms": round((_MODULE_STARTED_AT - SERVICE_STARTED_AT) * 1000, 1)}]
+
+
+def _mark_startup(phase: str) -> None:
+    startup_timeline.append({"phase": phase, "ms": round((time.time() - SERVICE_STARTED_AT) * 1000, 1)})
+
+
+def _prebind_socket():
+    """Listen on the service port before the heavy imports, so early connections queue instead of failing."""
+    host = os.getenv("TRANSCRIBER_HOST", "127.0.0.1")
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        if sys.platform != "win32":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, int(os.getenv("TRANSCRIBER_PORT", "8001"))))
+        sock.listen(2048)
+    except (OSError, ValueError):
+        # uvicorn binds by itself and reports the error
+        sock.close()
+        return None
+    _mark_startup("socket_bound")
+    return sock
+
+
+prebound_socket = None
+if __name__ == "__main__" and os.getenv("TRANSCRIBER_ROLE", "coordinator").lower() != "worker":
+    prebound_socket = _prebind_socket()
+
 import asyncio
+import atexit
+import cProfile
+import hashlib
+import heapq
+import hmac
 import json
-import os
+import re
 import sqlite3
-import sys
 import multiprocessing
+import shutil
 import threading
-import time
+import traceback
+import urllib.error
+import urllib.request
 import uuid
 from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from queue import Empty, Full, Queue
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote, urlparse
 
-from fastapi import Body, FastAPI, HTTPException, Query, Request
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 # Version information
 SERVICE_VERSION = "1.0.1"  # Update this when releasing new native host versions
+_mark_startup("imports_done")
 
 # Default to 4 threads for better performance, or limited by system cores
 default_threads = "4"
@@ -38,6 +101,8 @@ os.environ.setdefault("NUMEXPR_NUM_THREADS", str(CPU_THREADS))
 # Lazy loading placeholders
 WhisperModel = None
 yt_dlp = None
+# Set by _warmup_modules; /health reads it instead of importing yt_dlp
+YTDLP_VERSION: Optional[str] = None
 
 app = FastAPI(title="Mini Video Transcriber")
 
@@ -56,21 +121,135 @@ TEMP_DIR.mkdir(exist_ok=True)
 DB_PATH = Path(os.getenv("TRANSCRIBER_DB_PATH", str(TEMP_DIR / "tasks.db")))
 SERVICE_LOG_PATH = Path(os.getenv("TRANSCRIBER_SERVICE_LOG", str(TEMP_DIR / "service.log")))
 
-def _log(message: str) -> None:
-    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime())
-    formatted = f"{timestamp} {message}"
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_LEVEL = LOG_LEVELS.get(os.getenv("TRANSCRIBER_LOG_LEVEL", "info").lower(), 20)
+# "text" keeps the classic "timestamp MESSAGE" lines, "json" writes one JSON object per line
+LOG_FORMAT = os.getenv("TRANSCRIBER_LOG_FORMAT", "text").lower()
+# service.log is rotated to service.log.1 .. service.log.N once it exceeds this size (0 disables)
+LOG_MAX_BYTES = int(float(os.getenv("TRANSCRIBER_LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUPS = max(1, int(os.getenv("TRANSCRIBER_LOG_BACKUPS", "3")))
+# Records beyond this many pending lines are dropped instead of blocking the caller
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 500
+
+log_queue: "Queue[Any]" = Queue(maxsize=LOG_QUEUE_SIZE)
+log_context = threading.local()
+log_dropped = 0
+
+
+class _LogWriter:
+    """Owns service.log: keeps it open, writes batches and rotates by size."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.handle = None
+        self.size = 0
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.handle = self.path.open("a", encoding="utf-8", errors="ignore")
+        self.size = self.handle.tell()
+
+    def _rotate(self) -> None:
+        self.handle.close()
+        self.handle = None
+        for index in range(LOG_BACKUPS - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self._open()
+
+    def write(self, lines: List[str]) -> None:
+        data = "".join(f"{line}\n" for line in lines)
+        size = len(data.encode("utf-8", errors="ignore"))
+        try:
+            if self.handle is None:
+                self._open()
+            if LOG_MAX_BYTES > 0 and self.size > 0 and self.size + size > LOG_MAX_BYTES:
+                self._rotate()
+            self.handle.write(data)
+            self.handle.flush()
+            self.size += size
+        except OSError:
+            self.handle = None
+        # Always print to stderr so it can be captured by Native Messaging host logs or terminal
+        try:
+            sys.stderr.write(data)
+            sys.stderr.flush()
+        except (AttributeError, BrokenPipeError, OSError, ValueError):
+            # Ignore broken pipe errors when stderr is closed
+            pass
+
+
+def _format_log_record(record: Tuple[float, str, str, Optional[str], Optional[str]]) -> str:
+    created, level, message, task_id, stage = record
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(created))
+    if LOG_FORMAT != "json":
+        return f"{timestamp} {message}"
+    entry: Dict[str, Any] = {"ts": timestamp, "level": level, "msg": message}
+    if task_id:
+        entry["task"] = task_id
+    if stage:
+        entry["stage"] = stage
+    return json.dumps(entry, ensure_ascii=False)
+
+
+def _log_writer_loop() -> None:
+    global log_dropped
+    writer = _LogWriter(SERVICE_LOG_PATH)
+    while True:
+        items = [log_queue.get()]
+        while len(items) < LOG_BATCH_SIZE:
+            try:
+                items.append(log_queue.get_nowait())
+            except Empty:
+                break
+        lines: List[str] = []
+        waiters: List[threading.Event] = []
+        for item in items:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                lines.append(_format_log_record(item))
+        if log_dropped:
+            dropped, log_dropped = log_dropped, 0
+            record = (time.time(), "warning", f"LOG_DROPPED count={dropped}", None, None)
+            lines.append(_format_log_record(record))
+        if lines:
+            writer.write(lines)
+        for waiter in waiters:
+            waiter.set()
+
+
+def _log(message: str, level: str = "info", task_id: Optional[str] = None, stage: Optional[str] = None) -> None:
+    global log_dropped
+    if LOG_LEVELS.get(level, 20) < LOG_LEVEL:
+        return
+    record = (
+        time.time(),
+        level,
+        message,
+        task_id or getattr(log_context, "task_id", None),
+        stage or getattr(log_context, "stage", None),
+    )
     try:
-        SERVICE_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with SERVICE_LOG_PATH.open("a", encoding="utf-8", errors="ignore") as handle:
-            handle.write(f"{formatted}\n")
-    except OSError:
-        pass
-    # Always print to stderr so it can be captured by Native Messaging host logs or terminal
+        log_queue.put_nowait(record)
+    except Full:
+        log_dropped += 1
+
+
+def _flush_logs(timeout: float = 2.0) -> bool:
+    done = threading.Event()
     try:
-        print(formatted, file=sys.stderr)
-    except (BrokenPipeError, OSError):
-        # Ignore broken pipe errors when stderr is closed
-        pass
+        log_queue.put(done, timeout=timeout)
+    except Full:
+        return False
+    return done.wait(timeout)
+
+
+threading.Thread(target=_log_writer_loop, name="log-writer", daemon=True).start()
+atexit.register(_flush_logs)
 
 
 def _log_slow(label: str, start: float, extra: str = "") -> None:
@@ -83,8 +262,154 @@ MODEL_SIZE = os.getenv("WHISPER_MODEL", "base")
 WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
 WHISPER_COMPUTE = os.getenv("WHISPER_COMPUTE", "int8")
 IDLE_SECONDS = int(os.getenv("TRANSCRIBER_IDLE_SECONDS", "3600"))
+# Explicit env settings always win over the auto-tuned profile
+COMPUTE_FROM_ENV = "WHISPER_COMPUTE" in os.environ
+THREADS_FROM_ENV = "TRANSCRIBER_CPU_THREADS" in os.environ
+# Startup values of the settings PUT /api/settings can change; "reset" falls back to these
+SETTINGS_DEFAULTS: Dict[str, Any] = {
+    "modelSize": MODEL_SIZE,
+    "compute": WHISPER_COMPUTE,
+    "cpuThreads": CPU_THREADS,
+    "idleSeconds": IDLE_SECONDS,
+}
+SETTINGS_MODEL_KEYS = ("modelSize", "compute", "cpuThreads")
+COMPUTE_TYPES = (
+    "default",
+    "auto",
+    "int8",
+    "int8_float32",
+    "int8_float16",
+    "int8_bfloat16",
+    "int16",
+    "float16",
+    "bfloat16",
+    "float32",
+)
+# Benchmark compute type x thread count on a short clip the first time a model size is used on CPU
+AUTOTUNE = os.getenv("TRANSCRIBER_AUTOTUNE", "1") == "1"
+TUNING_PATH = TEMP_DIR / "tuning.json"
+TUNING_CLIP_SECONDS = float(os.getenv("TRANSCRIBER_TUNING_CLIP_SECONDS", "20"))
+TUNING_COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+# Named faster-whisper decoding settings; "accurate" matches the library defaults used before
+DECODE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "beam_size": 1,
+        "best_of": 1,
+        "temperature": (0.0, 0.6),
+        "compression_ratio_threshold": 2.4,
+        "log_prob_threshold": -1.0,
+        "condition_on_previous_text": False,
+        "without_timestamps": True,
+    },
+    "balanced": {
+        "beam_size": 2,
+        "best_of": 2,
+        "temperature": (0.0, 0.4, 0.8),
+        "compression_ratio_threshold": 2.4,
+        "log_prob_threshold": -1.0,
+        "condition_on_previous_text": True,
+        "without_timestamps": False,
+    },
+    "accurate": {
+        "beam_size": 5,
+        "best_of": 5,
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "compression_ratio_threshold": 2.4,
+        "log_prob_threshold": -1.0,
+        "condition_on_previous_text": True,
+        "without_timestamps": False,
+    },
+}
+# Two-pass mode: a small model writes a draft first, then MODEL_SIZE produces the final transcript
+DRAFT_MODEL_SIZE = os.getenv("TRANSCRIBER_DRAFT_MODEL", "tiny")
+TWO_PASS_DEFAULT = os.getenv("TRANSCRIBER_TWO_PASS", "0") == "1"
+DEFAULT_DECODE_PROFILE = os.getenv("TRANSCRIBER_DECODE_PROFILE", "accurate")
+if DEFAULT_DECODE_PROFILE not in DECODE_PROFILES:
+    DEFAULT_DECODE_PROFILE = "accurate"
+# JSON object applied on top of every profile, e.g. {"beam_size": 3}
+try:
+    DECODE_OVERRIDES: Dict[str, Any] = json.loads(os.getenv("TRANSCRIBER_DECODE_OVERRIDES") or "{}")
+except ValueError:
+    DECODE_OVERRIDES = {}
+DECODE_OVERRIDES = {
+    key: tuple(value) if isinstance(value, list) else value
+    for key, value in DECODE_OVERRIDES.items()
+    if key in DECODE_PROFILES["accurate"]
+}
 SLOW_LOG_SECONDS = float(os.getenv("TRANSCRIBER_SLOW_LOG_SECONDS", "5"))
-
+# A download strategy that failed this many times in a row is skipped for a cooldown period
+STRATEGY_SKIP_FAILURES = int(os.getenv("TRANSCRIBER_STRATEGY_SKIP_FAILURES", "3"))
+STRATEGY_COOLDOWN_SECONDS = float(os.getenv("TRANSCRIBER_STRATEGY_COOLDOWN_SECONDS", "1800"))
+# Parallel fragment downloads for HLS/DASH sources (yt-dlp concurrent_fragment_downloads)
+CONCURRENT_FRAGMENTS = max(1, int(os.getenv("TRANSCRIBER_CONCURRENT_FRAGMENTS", "4")))
+# Interrupted tasks are re-queued on startup at most this many times before giving up
+MAX_AUTO_RESUME = int(os.getenv("TRANSCRIBER_MAX_AUTO_RESUME", "3"))
+# Decoded segments are flushed to SQLite at least this often while transcribing
+CHECKPOINT_SECONDS = float(os.getenv("TRANSCRIBER_CHECKPOINT_SECONDS", "10"))
+# Characters of already-transcribed text passed as prompt when resuming from a checkpoint
+CHECKPOINT_PROMPT_CHARS = 200
+# Audio is transcribed in windows of this length; segments ending in the guard band are redone
+DECODE_WINDOW_SECONDS = max(60.0, float(os.getenv("TRANSCRIBER_DECODE_WINDOW_SECONDS", "600")))
+DECODE_WINDOW_GUARD_SECONDS = 10.0
+# Repetition guard: identical consecutive segments / compression ratio that count as a decoding loop
+LOOP_REPEAT_LIMIT = int(os.getenv("TRANSCRIBER_LOOP_REPEAT_LIMIT", "3"))
+LOOP_COMPRESSION_LIMIT = float(os.getenv("TRANSCRIBER_LOOP_COMPRESSION_LIMIT", "3.0"))
+# A looping region is decoded once more with these settings, then skipped by LOOP_SKIP_SECONDS
+LOOP_REDECODE_SECONDS = 30.0
+LOOP_SKIP_SECONDS = float(os.getenv("TRANSCRIBER_LOOP_SKIP_SECONDS", "30"))
+LOOP_RETRY_OPTIONS = {"temperature": (0.4, 0.8), "condition_on_previous_text": False, "beam_size": 1, "best_of": 3}
+# Audio fingerprints: a finished transcript is reused when a new download matches it this closely
+DEDUP_ENABLED = os.getenv("TRANSCRIBER_DEDUP", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("TRANSCRIBER_DEDUP_THRESHOLD", "0.7"))
+# Matching clips may differ in length / start offset by this much (re-uploads, trimmed intros)
+DEDUP_MAX_SHIFT_SECONDS = 3.0
+# TEMP_DIR housekeeping: total size budget (0 disables eviction), partial file age and sweep period
+DISK_QUOTA_BYTES = int(float(os.getenv("TRANSCRIBER_DISK_QUOTA_MB", "2048")) * 1024 * 1024)
+PARTIAL_MAX_AGE_SECONDS = float(os.getenv("TRANSCRIBER_PARTIAL_MAX_AGE_HOURS", "24")) * 3600
+SWEEP_INTERVAL_SECONDS = float(os.getenv("TRANSCRIBER_SWEEP_INTERVAL_SECONDS", "300"))
+# On-demand profiler output (see /api/debug/profile); older dumps beyond the limit are deleted
+PROFILE_DIR = TEMP_DIR / "profiles"
+PROFILE_KEEP_FILES = int(os.getenv("TRANSCRIBER_PROFILE_KEEP_FILES", "50"))
+# "fake" swaps the downloader and model for timed stand-ins so the API layer can be load-tested
+PIPELINE_MODE = os.getenv("TRANSCRIBER_PIPELINE", "real").lower()
+FAKE_DOWNLOAD_SECONDS = float(os.getenv("TRANSCRIBER_FAKE_DOWNLOAD_SECONDS", "2"))
+FAKE_TRANSCRIBE_SECONDS = float(os.getenv("TRANSCRIBER_FAKE_TRANSCRIBE_SECONDS", "5"))
+FAKE_AUDIO_SECONDS = float(os.getenv("TRANSCRIBER_FAKE_AUDIO_SECONDS", "300"))
+FAKE_PROGRESS_HZ = max(0.1, float(os.getenv("TRANSCRIBER_FAKE_PROGRESS_HZ", "4")))
+# Record wait/hold times of the task and DB locks in /metrics (adds a little overhead per acquire)
+LOCK_STATS = os.getenv("TRANSCRIBER_LOCK_STATS", "0") == "1"
+# "worker" processes lease tasks from the coordinator at TRANSCRIBER_COORDINATOR_URL instead of serving HTTP
+ROLE = os.getenv("TRANSCRIBER_ROLE", "coordinator").lower()
+COORDINATOR_URL = os.getenv("TRANSCRIBER_COORDINATOR_URL", "").rstrip("/")
+WORKER_ID = os.getenv("TRANSCRIBER_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# A coordinator with remote workers can leave all transcription to them
+LOCAL_WORKER = os.getenv("TRANSCRIBER_LOCAL_WORKER", "1") == "1"
+# Leases not renewed by a heartbeat within this time are re-queued
+LEASE_SECONDS = max(5.0, float(os.getenv("TRANSCRIBER_LEASE_SECONDS", "60")))
+# Workers send downloaded audio back so a re-queued task does not download again
+WORKER_UPLOAD_AUDIO = os.getenv("TRANSCRIBER_WORKER_UPLOAD_AUDIO", "1") == "1"
+# Extensions kept for uploaded audio; anything else (e.g. .txt, .pcm, which name task artifacts) is stored as .audio
+UPLOAD_AUDIO_SUFFIXES = (".m4a", ".mp3", ".mp4", ".webm", ".opus", ".ogg", ".oga", ".wav", ".flac", ".aac", ".mka")
+# Admission limit on audio waiting in the queue (0 = unlimited); beyond it POST /api/tasks returns 429
+MAX_QUEUED_SECONDS = float(os.getenv("TRANSCRIBER_MAX_QUEUED_HOURS", "0")) * 3600
+# Look up the duration of queued URLs (metadata only) for ETAs and the admission limit
+PROBE_DURATION = os.getenv("TRANSCRIBER_PROBE_DURATION", "1") == "1"
+# Finished tasks the queue ETA model is fitted on; used until enough have run
+THROUGHPUT_SAMPLES = 200
+THROUGHPUT_DEFAULT_FACTOR = 0.5
+THROUGHPUT_DEFAULT_DURATION = 600.0
+# Upper bound on tasks created by one bulk/playlist request
+BULK_MAX_TASKS = int(os.getenv("TRANSCRIBER_BULK_MAX_TASKS", "500"))
+# Completion webhooks: attempts per event, first retry delay (x4 per attempt) and request timeout
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("TRANSCRIBER_WEBHOOK_MAX_ATTEMPTS", "6"))
+WEBHOOK_RETRY_SECONDS = float(os.getenv("TRANSCRIBER_WEBHOOK_RETRY_SECONDS", "5"))
+WEBHOOK_TIMEOUT_SECONDS = 10.0
+# Key for the X-Transcriber-Signature HMAC; deliveries are unsigned when unset
+WEBHOOK_SECRET = os.getenv("TRANSCRIBER_WEBHOOK_SECRET", "")
+# Upper bound for GET /api/tasks/{id}/wait
+WAIT_MAX_SECONDS = 300.0
+
+SERVICE_HOST = os.getenv("TRANSCRIBER_HOST", "127.0.0.1")
 SERVICE_PORT = int(os.getenv("TRANSCRIBER_PORT", "8001"))
 SERVICE_TOKEN = os.getenv("TRANSCRIBER_TOKEN")
 TOKEN_PATH = Path(os.getenv("TRANSCRIBER_TOKEN_PATH", str(TEMP_DIR / "service.token")))
@@ -97,21 +422,40 @@ _log(
 if not SERVICE_TOKEN:
     SERVICE_TOKEN = uuid.uuid4().hex
 
-token_source = "env" if os.getenv("TRANSCRIBER_TOKEN") else "auto"
-_log(f"TOKEN_INIT source={token_source} path={TOKEN_PATH}")
-try:
-    TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
-    TOKEN_PATH.write_text(SERVICE_TOKEN, encoding="utf-8")
-    os.chmod(TOKEN_PATH, 0o600)
-    _log("TOKEN_WRITE ok")
-except OSError as exc:
-    _log(f"TOKEN_WRITE failed error={exc}")
+
+def _write_token() -> None:
+    token_source = "env" if os.getenv("TRANSCRIBER_TOKEN") else "auto"
+    _log(f"TOKEN_INIT source={token_source} path={TOKEN_PATH}")
+    try:
+        TOKEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+        TOKEN_PATH.write_text(SERVICE_TOKEN, encoding="utf-8")
+        os.chmod(TOKEN_PATH, 0o600)
+        _log("TOKEN_WRITE ok")
+    except OSError as exc:
+        _log(f"TOKEN_WRITE failed error={exc}", level="warning")
+
 
 model_lock = threading.Lock()
 whisper_model = None
 model_ready = False
 model_loading = False
 model_error = None
+# Settings the current model was built with: modelSize, compute, cpuThreads and where they came from
+model_config: Dict[str, Any] = {}
+model_rebuild: Dict[str, Any] = {"running": False, "lastError": None}
+# Set under `condition` by _start_model_rebuild; the worker swaps the model before its next task
+model_rebuild_requested = False
+# Values saved through PUT /api/settings; they win over env settings and the tuned profile
+settings_lock = threading.Lock()
+runtime_settings: Dict[str, Any] = {}
+draft_model_lock = threading.Lock()
+draft_model = None
+draft_model_loading = False
+draft_model_error: Optional[str] = None
+tuning_lock = threading.Lock()
+tuning_state: Dict[str, Any] = {"running": False, "lastError": None, "progress": None}
+# Parsed tuning.json; read once, replaced by _run_autotune when it rewrites the file
+tuning_cache: Optional[Dict[str, Any]] = None
 
 # Will be updated by _preload_heavy_libs
 MODEL_CACHE_PATH: Optional[Path] = None
@@ -145,6 +489,12 @@ def _detect_model_cache() -> Optional[Path]:
             return candidate
     return None
 
+
+def _refresh_model_cache() -> None:
+    global MODEL_CACHE_PATH, MODEL_CACHED
+    MODEL_CACHE_PATH = _detect_model_cache()
+    MODEL_CACHED = MODEL_CACHE_PATH is not None
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -154,6 +504,21 @@ app.add_middleware(
 )
 
 
+class _StartupGate:
+    """Hold requests (except /health) until _initialize_service has loaded the DB and started the worker."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and not service_ready.is_set() and scope["path"] != "/health":
+            await asyncio.to_thread(service_ready.wait)
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(_StartupGate)
+
+
 class CookieItem(BaseModel):
     name: str
     value: str
@@ -170,12 +535,76 @@ class CreateTaskRequest(BaseModel):
     title: Optional[str] = None
     site: Optional[str] = None
     cookies: Optional[List[CookieItem]] = None
+    profile: Optional[str] = None
+    twoPass: Optional[bool] = None
+    callbackUrl: Optional[str] = None
+
+
+class BulkCreateRequest(BaseModel):
+    urls: List[str] = []
+    playlistUrl: Optional[str] = None
+    site: Optional[str] = None
+    cookies: Optional[List[CookieItem]] = None
+    profile: Optional[str] = None
+    twoPass: Optional[bool] = None
+    callbackUrl: Optional[str] = None
 
 
 class ClearQueueRequest(BaseModel):
     include_done: bool = False
 
 
+class SettingsUpdateRequest(BaseModel):
+    modelSize: Optional[str] = Field(None, min_length=1, max_length=200)
+    compute: Optional[str] = None
+    cpuThreads: Optional[int] = Field(None, ge=0, le=256)
+    idleSeconds: Optional[int] = Field(None, ge=0)
+    # Keys to drop so they fall back to env settings or the tuned profile
+    reset: List[str] = []
+
+
+class LeaseRequest(BaseModel):
+    workerId: str
+    wait: float = Field(0, ge=0, le=60)
+
+
+class LeaseSegment(BaseModel):
+    seq: int
+    start: float
+    end: float
+    text: str
+
+
+class LeaseHeartbeatRequest(BaseModel):
+    status: Optional[str] = None
+    downloadProgress: int = Field(0, ge=0, le=100)
+    transcribeProgress: int = Field(0, ge=0, le=100)
+    segments: List[LeaseSegment] = []
+
+
+class LeaseCompleteRequest(BaseModel):
+    text: str
+    segments: List[LeaseSegment] = []
+    audioDuration: Optional[float] = None
+    realtimeFactor: Optional[float] = None
+    timeline: Optional[Dict[str, Any]] = None
+    downloadAttempts: List[Dict[str, Any]] = []
+    loopGuard: Optional[List[Dict[str, Any]]] = None
+
+
+class LeaseFailRequest(BaseModel):
+    errorCode: Optional[str] = None
+    errorMessage: Optional[str] = None
+    canceled: bool = False
+
+
+class ProfileRequest(BaseModel):
+    mode: str = "sampling"
+    tasks: Optional[int] = Field(None, ge=1, le=100)
+    seconds: Optional[float] = Field(None, gt=0, le=3600)
+    interval_ms: float = Field(10, ge=1, le=1000)
+
+
 class TaskCancelled(Exception):
     pass
 
@@ -187,27 +616,249 @@ TASK_STATUS_CANCELING = "canceling"
 TASK_STATUS_DONE = "done"
 TASK_STATUS_ERROR = "error"
 TASK_STATUS_CANCELED = "canceled"
+TERMINAL_STATUSES = (TASK_STATUS_DONE, TASK_STATUS_ERROR, TASK_STATUS_CANCELED)
+
+
+class _TimedLock:
+    """threading.Lock stand-in that reports wait and hold times to /metrics."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+        self._held_since = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._held_since = time.perf_counter()
+            self._owner = threading.get_ident()
+            METRIC_LOCK_WAIT.observe(self._held_since - start, lock=self.name)
+        return acquired
+
+    def release(self) -> None:
+        held = time.perf_counter() - self._held_since
+        self._owner = None
+        self._lock.release()
+        METRIC_LOCK_HOLD.observe(held, lock=self.name)
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def _is_owned(self) -> bool:
+        # Used by threading.Condition; avoids the default probe acquire skewing the stats
+        return self._owner == threading.get_ident()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
 
 
 tasks: Dict[str, Dict[str, Any]] = {}
 queue = deque()
 active_task_id: Optional[str] = None
-lock = threading.Lock()
+lock = _TimedLock("tasks") if LOCK_STATS else threading.Lock()
 condition = threading.Condition(lock)
-db_lock = threading.Lock()
+db_lock = _TimedLock("db") if LOCK_STATS else threading.Lock()
+strategy_lock = threading.Lock()
+strategy_stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+checkpoint_lock = threading.Lock()
+pending_segments: Dict[str, List[Tuple[int, float, float, str]]] = {}
+# Segments of tasks currently being transcribed, served to partial-transcript readers
+live_segments: Dict[str, List[Dict[str, Any]]] = {}
+# Full-text search tokenizer in use ("trigram" handles CJK text), None when FTS5 is unavailable
+search_tokenizer: Optional[str] = None
+task_timelines: Dict[str, "_TaskTimeline"] = {}
+# Tasks handed to remote workers, by lease id (guarded by `lock`)
+leases: Dict[str, Dict[str, Any]] = {}
+# (audio seconds, service seconds) of finished tasks and the linear model fitted to them
+throughput_samples: deque = deque(maxlen=THROUGHPUT_SAMPLES)
+throughput_model: Dict[str, Any] = {}
+probe_queue: "Queue[str]" = Queue()
+# Futures of /wait requests per task, resolved from any thread when the task finishes (guarded by `lock`)
+terminal_waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]]] = {}
+# Pending webhook deliveries as (due time, sequence, delivery), ordered by due time
+webhook_condition = threading.Condition()
+webhook_pending: List[Tuple[float, int, Dict[str, Any]]] = []
+webhook_sequence = 0
+storage_lock = threading.Lock()
+last_sweep: Dict[str, Any] = {}
 queue_sequence = int(time.time() * 1000)
 last_activity = time.time()
+# Set once _initialize_service has loaded the DB and started the background threads
+service_ready = threading.Event()
+
+
+class _Metric:
+    """Minimal Prometheus metric; values are keyed by a tuple of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        METRICS.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+
+class _Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class _Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class _Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Tuple[float, ...],
+        labels: Tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+METRICS: List[_Metric] = []
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 1800, 3600)
+METRIC_TASKS = _Counter(
+    "transcriber_tasks_total", "Tasks that reached a terminal status", ("status",)
+)
+METRIC_STAGE_SECONDS = _Histogram(
+    "transcriber_stage_seconds", "Time spent per task stage", DURATION_BUCKETS, ("stage",)
+)
+METRIC_REALTIME_FACTOR = _Histogram(
+    "transcriber_realtime_factor",
+    "Transcription time divided by transcribed audio duration",
+    (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5),
+)
+METRIC_QUEUE_WAIT = _Histogram(
+    "transcriber_queue_wait_seconds", "Time tasks spent queued before starting", DURATION_BUCKETS
+)
+METRIC_MODEL_LOAD = _Histogram(
+    "transcriber_model_load_seconds", "Whisper model initialization time", DURATION_BUCKETS
+)
+METRIC_DB_WRITE = _Histogram(
+    "transcriber_db_write_seconds",
+    "Task upsert latency including lock wait",
+    (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+LOCK_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+METRIC_LOCK_WAIT = _Histogram(
+    "transcriber_lock_wait_seconds", "Time spent waiting to acquire a lock", LOCK_BUCKETS, ("lock",)
+)
+METRIC_LOCK_HOLD = _Histogram(
+    "transcriber_lock_hold_seconds", "Time a lock was held per acquisition", LOCK_BUCKETS, ("lock",)
+)
+METRIC_LOOP_GUARD = _Counter(
+    "transcriber_loop_guard_total", "Decoding loops detected, by action taken", ("action",)
+)
+METRIC_DEDUP = _Counter(
+    "transcriber_dedup_total", "Fingerprint lookups after download, by outcome", ("outcome",)
+)
+METRIC_SSE_SUBSCRIBERS = _Gauge(
+    "transcriber_sse_subscribers", "Open server-sent event streams", ("stream",)
+)
+
+
+def _ytdlp_version() -> str:
+    global YTDLP_VERSION
+    if YTDLP_VERSION is None:
+        # Reading yt_dlp/version.py is much cheaper than importing the package. Package metadata
+        # would be too, but it normalizes the version ("2025.1.1" instead of "2025.01.01")
+        try:
+            import importlib.util
+
+            spec = importlib.util.find_spec("yt_dlp")
+            source = Path(spec.origin).with_name("version.py").read_text(encoding="utf-8")
+            line = next(line for line in source.splitlines() if line.startswith("__version__"))
+            YTDLP_VERSION = line.split("=", 1)[1].strip().strip("'\"")
+        except Exception:
+            # Frozen builds may not have the source file on disk
+            try:
+                import yt_dlp as _yt_dlp
+
+                YTDLP_VERSION = _yt_dlp.version.__version__
+            except Exception:
+                return "unknown"
+    return YTDLP_VERSION
 
 
 @app.get("/health")
 def health_check():
-    # Get yt-dlp version if available
-    ytdlp_version = "unknown"
-    try:
-        import yt_dlp
-        ytdlp_version = yt_dlp.version.__version__
-    except Exception:
-        pass
+    ytdlp_version = _ytdlp_version()
 
     # ==== 测试模式：返回旧版本号以触发更新提示 ====
     # 取消下方注释以测试更新提示功能
@@ -230,19 +881,35 @@ def service_status(request: Request, token: Optional[str] = Query(None)):
         "modelReady": model_ready,
         "modelLoading": model_loading,
         "modelError": model_error,
+        # What the loaded model uses, or what the next load will use
+        "modelConfig": dict(model_config) or _model_settings(),
+        "decodeProfiles": sorted(DECODE_PROFILES),
+        "defaultDecodeProfile": DEFAULT_DECODE_PROFILE,
+        "decodeOverrides": DECODE_OVERRIDES,
+        "dedup": {"enabled": DEDUP_ENABLED, "threshold": DEDUP_THRESHOLD},
+        "throughput": dict(throughput_model),
+        "maxQueuedHours": MAX_QUEUED_SECONDS / 3600 or None,
+        "tuning": dict(tuning_state),
+        "settings": _settings_view(),
+        "startup": {
+            "startedAt": SERVICE_STARTED_AT,
+            "origin": "process" if SERVICE_STARTED_AT != _MODULE_STARTED_AT else "module",
+            "phases": list(startup_timeline),
+        },
     }
 
 
 @app.on_event("startup")
 def _on_startup() -> None:
+    _mark_startup("http_ready")
     _log("HTTP_READY")
     # Start background warmup of heavy libraries
-    threading.Thread(target=_warmup_modules, daemon=True).start()
+    threading.Thread(target=_warmup_modules, name="module-warmup", daemon=True).start()
 
 
 def _warmup_modules() -> None:
     """Import heavy libraries and initialize resources in background."""
-    global yt_dlp, WhisperModel, OpenCC, MODEL_CACHE_PATH, MODEL_CACHED, OPENCC_T2S
+    global yt_dlp, WhisperModel, OpenCC, MODEL_CACHE_PATH, MODEL_CACHED, OPENCC_T2S, YTDLP_VERSION
     
     _log("")
     _log("=" * 60)
@@ -256,7 +923,9 @@ def _warmup_modules() -> None:
         start = time.monotonic()
         import yt_dlp as _yt_dlp
         yt_dlp = _yt_dlp
+        YTDLP_VERSION = _yt_dlp.version.__version__
         elapsed = time.monotonic() - start
+        _mark_startup("ytdlp_imported")
         _log(f"✅ yt-dlp 加载完成，耗时 {elapsed:.2f}秒")
         
         # 2. Warmup faster_whisper
@@ -266,11 +935,14 @@ def _warmup_modules() -> None:
         from faster_whisper import WhisperModel as _WhisperModel
         WhisperModel = _WhisperModel
         elapsed = time.monotonic() - start
+        _mark_startup("whisper_imported")
         _log(f"✅ Whisper 模块加载完成，耗时 {elapsed:.2f}秒")
         
         # 3. Check model cache
         _log("")
         _log("🔍 检查本地模型缓存...")
+        # MODEL_SIZE may come from the settings table
+        service_ready.wait()
         MODEL_CACHE_PATH = _detect_model_cache()
         MODEL_CACHED = MODEL_CACHE_PATH is not None
         if MODEL_CACHED:
@@ -304,7 +976,11 @@ def _warmup_modules() -> None:
         _log("=" * 60)
         _log("")
     
+    _mark_startup("warmup_done")
     _log("WARMUP_DONE")
+    service_ready.wait()
+    if _needs_autotune():
+        _start_autotune("first_run")
 
 
 
@@ -350,61 +1026,521 @@ def _to_simplified(text: str) -> str:
         return text
 
 
-def _get_whisper_model():
-    global whisper_model, model_ready, model_loading, model_error, WhisperModel
-    
+def _build_whisper_model(settings: Dict[str, Any]):
+    return WhisperModel(
+        settings["modelSize"],
+        device=WHISPER_DEVICE,
+        compute_type=settings["compute"],
+        cpu_threads=settings["cpuThreads"],
+        num_workers=1,
+    )
+
+
+def _load_whisper_model() -> None:
+    global whisper_model, model_ready, model_loading, model_error
+    start = time.monotonic()
+    settings = _model_target()
+    _log(
+        "MODEL_INIT_START "
+        f"size={settings['modelSize']} device={WHISPER_DEVICE} compute={settings['compute']} "
+        f"cpu_threads={settings['cpuThreads']} num_workers=1 source={settings['source']}"
+    )
+    try:
+        model = _build_whisper_model(settings)
+    except Exception as exc:
+        with model_lock:
+            model_error = str(exc)
+            model_loading = False
+        _log(f"MODEL_INIT_ERROR {exc}", level="error")
+        return
+    elapsed = time.monotonic() - start
+    METRIC_MODEL_LOAD.observe(elapsed)
+    with model_lock:
+        whisper_model = model
+        model_ready = True
+        model_loading = False
+        model_config.clear()
+        model_config.update(settings)
+    _log(f"MODEL_INIT_DONE elapsed={elapsed:.2f}s")
+    _log_slow("MODEL_INIT", start)
+    # Settings may have changed while the model was loading
+    _start_model_rebuild()
+
+
+def _get_whisper_model(task_id: Optional[str] = None):
+    global model_loading, model_error, WhisperModel
+
     # Ensure WhisperModel class is available
     if WhisperModel is None:
         from faster_whisper import WhisperModel as _WM
         WhisperModel = _WM
-    
+
+    started = False
     wait_logged = False
     while True:
         with model_lock:
             if whisper_model is not None:
                 return whisper_model
             if not model_loading:
+                if started and model_error:
+                    raise RuntimeError(model_error)
                 model_loading = True
                 model_error = None
-                break
-            if not wait_logged:
+                started = True
+                # Load on its own thread so a canceled task stops waiting immediately;
+                # the load itself continues and warms the model for the next task
+                threading.Thread(target=_load_whisper_model, name="model-loader", daemon=True).start()
+            elif not started and not wait_logged:
                 wait_logged = True
-        if wait_logged:
-            _log("MODEL_INIT_WAIT")
+                _log("MODEL_INIT_WAIT")
+        if task_id and _is_cancelled(task_id):
+            raise TaskCancelled("model init canceled")
         time.sleep(0.1)
+
+
+def _load_draft_model() -> None:
+    global draft_model, draft_model_loading, draft_model_error
+    settings = _model_settings()
     start = time.monotonic()
-    _log(
-        "MODEL_INIT_START "
-        f"size={MODEL_SIZE} device={WHISPER_DEVICE} compute={WHISPER_COMPUTE} "
-        f"cpu_threads={CPU_THREADS} num_workers=1"
-    )
     try:
         model = WhisperModel(
-            MODEL_SIZE,
+            DRAFT_MODEL_SIZE,
             device=WHISPER_DEVICE,
-            compute_type=WHISPER_COMPUTE,
-            cpu_threads=CPU_THREADS,
+            compute_type=settings["compute"],
+            cpu_threads=settings["cpuThreads"],
             num_workers=1,
         )
     except Exception as exc:
-        model_error = str(exc)
-        model_loading = False
-        _log(f"MODEL_INIT_ERROR {model_error}")
-        raise
+        with draft_model_lock:
+            draft_model_error = str(exc)
+            draft_model_loading = False
+        _log(f"DRAFT_MODEL_INIT_ERROR size={DRAFT_MODEL_SIZE} error={exc}", level="error")
+        return
+    with draft_model_lock:
+        draft_model = model
+        draft_model_loading = False
+    _log(f"DRAFT_MODEL_INIT_DONE size={DRAFT_MODEL_SIZE} elapsed={time.monotonic() - start:.2f}s")
+
+
+def _get_draft_model(task_id: Optional[str] = None):
+    global draft_model_loading, draft_model_error, WhisperModel
+    if WhisperModel is None:
+        from faster_whisper import WhisperModel as _WM
+        WhisperModel = _WM
+
+    started = False
+    while True:
+        with draft_model_lock:
+            if draft_model is not None:
+                return draft_model
+            if not draft_model_loading:
+                if started and draft_model_error:
+                    raise RuntimeError(draft_model_error)
+                draft_model_loading = True
+                draft_model_error = None
+                started = True
+                # Same as the main model: a canceled task stops waiting, the load finishes in the background
+                threading.Thread(target=_load_draft_model, name="draft-model-loader", daemon=True).start()
+        if task_id and _is_cancelled(task_id):
+            raise TaskCancelled("draft model init canceled")
+        time.sleep(0.1)
+
+
+def _tuning_key() -> str:
+    return f"{MODEL_SIZE}|{WHISPER_DEVICE}"
+
+
+def _load_tuning() -> Dict[str, Any]:
+    """The saved tuning profiles; callers must not modify the returned dict."""
+    global tuning_cache
+    if tuning_cache is None:
+        try:
+            tuning_cache = json.loads(TUNING_PATH.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            tuning_cache = {}
+    return tuning_cache
+
+
+def _tuned_profile() -> Optional[Dict[str, Any]]:
+    profile = _load_tuning().get(_tuning_key())
+    # A profile measured on different hardware (e.g. copied TEMP_DIR) is not trusted
+    if not profile or profile.get("cpuCount") != os.cpu_count():
+        return None
+    return profile
+
+
+def _model_settings() -> Dict[str, Any]:
+    settings = {"compute": WHISPER_COMPUTE, "cpuThreads": CPU_THREADS, "source": "default"}
+    if COMPUTE_FROM_ENV and THREADS_FROM_ENV:
+        settings["source"] = "env"
+    else:
+        profile = _tuned_profile()
+        if profile:
+            if not COMPUTE_FROM_ENV:
+                settings["compute"] = profile["compute"]
+            if not THREADS_FROM_ENV:
+                settings["cpuThreads"] = profile["cpuThreads"]
+            settings["source"] = "tuned"
+            settings["realtimeFactor"] = profile.get("realtimeFactor")
+    with settings_lock:
+        overrides = {key: runtime_settings[key] for key in ("compute", "cpuThreads") if key in runtime_settings}
+    if overrides:
+        settings.update(overrides)
+        settings["source"] = "settings"
+        settings.pop("realtimeFactor", None)
+    return settings
+
+
+def _model_target() -> Dict[str, Any]:
+    """What the next model build uses: MODEL_SIZE plus _model_settings()."""
+    settings = _model_settings()
+    settings["modelSize"] = MODEL_SIZE
+    return settings
+
+
+def _tuning_candidates() -> List[Tuple[str, int]]:
+    compute_types = list(TUNING_COMPUTE_TYPES)
+    try:
+        import ctranslate2
+
+        supported = ctranslate2.get_supported_compute_types(WHISPER_DEVICE)
+        compute_types = [item for item in compute_types if item in supported]
+    except Exception:
+        pass
+    if COMPUTE_FROM_ENV:
+        compute_types = [WHISPER_COMPUTE]
+    cores = os.cpu_count() or 4
+    threads = sorted({max(1, cores // 4), max(1, cores // 2), cores, CPU_THREADS})
+    if THREADS_FROM_ENV:
+        threads = [CPU_THREADS]
+    return [(compute, count) for compute in compute_types for count in threads]
+
+
+def _calibration_audio() -> Tuple[Any, str]:
+    """First TUNING_CLIP_SECONDS of real audio if any is on disk, else a synthetic voiced signal."""
+    import av
+    import numpy as np
+
+    limit = int(TUNING_CLIP_SECONDS * PCM_SAMPLE_RATE)
+    candidates = []
+    if os.getenv("TRANSCRIBER_TUNING_CLIP"):
+        candidates.append(Path(os.environ["TRANSCRIBER_TUNING_CLIP"]))
+    with lock:
+        done = sorted(
+            (task for task in tasks.values() if task["status"] == TASK_STATUS_DONE and task.get("audioPath")),
+            key=lambda task: task["updatedAt"],
+            reverse=True,
+        )
+    candidates.extend(Path(task["audioPath"]) for task in done)
+    for path in candidates:
+        if not path.is_file():
+            continue
+        try:
+            chunks = []
+            collected = 0
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=PCM_SAMPLE_RATE)
+            with av.open(str(path), mode="r", metadata_errors="ignore") as container:
+                for frame in container.decode(audio=0):
+                    frame.pts = None
+                    for resampled in resampler.resample(frame):
+                        chunk = resampled.to_ndarray().reshape(-1)
+                        chunks.append(chunk)
+                        collected += len(chunk)
+                    if collected >= limit:
+                        break
+            if collected >= limit // 2:
+                audio = np.concatenate(chunks)[:limit].astype(np.float32) / 32768.0
+                return audio, path.name
+        except Exception as exc:
+            _log(f"TUNING_CLIP_SKIP path={path.name} error={exc}", level="debug")
+    rng = np.random.default_rng(0)
+    t = np.arange(limit) / PCM_SAMPLE_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / PCM_SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = (np.sin(2 * np.pi * 3.5 * t) > -0.3).astype(np.float64)
+    audio = 0.3 * voiced * envelope + rng.normal(0, 0.01, limit)
+    return audio.astype(np.float32), "synthetic"
+
+
+class _TuningPreempted(Exception):
+    pass
+
+
+def _tuning_preempted() -> bool:
+    return active_task_id is not None or bool(queue)
+
+
+def _measure_tuning_candidate(audio, compute: str, threads: int) -> Tuple[float, float]:
+    """Load one candidate and time it on the clip; returns (load seconds, decode seconds).
+
+    Checks for waiting tasks after the load and after every segment, so a task never shares
+    the CPU with a measurement for longer than one segment (or the load itself).
+    """
+    load_start = time.monotonic()
+    model = WhisperModel(
+        MODEL_SIZE,
+        device=WHISPER_DEVICE,
+        compute_type=compute,
+        cpu_threads=threads,
+        num_workers=1,
+    )
+    try:
+        load_seconds = time.monotonic() - load_start
+        if _tuning_preempted():
+            raise _TuningPreempted()
+        options = _decode_options(None)
+        elapsed = 0.0
+        for clip, timed in ((audio[: 5 * PCM_SAMPLE_RATE], False), (audio, True)):
+            run_start = time.monotonic()
+            segments, _ = model.transcribe(clip, language="zh", **options)
+            for _ in segments:
+                if _tuning_preempted():
+                    raise _TuningPreempted()
+            if timed:
+                elapsed = time.monotonic() - run_start
+        if _tuning_preempted():
+            raise _TuningPreempted()
+        return load_seconds, elapsed
+    finally:
+        del model
+
+
+def _run_autotune(reason: str) -> None:
+    global WhisperModel, tuning_cache
+    with tuning_lock:
+        if tuning_state["running"]:
+            return
+        tuning_state.update(running=True, lastError=None, progress=None, startedAt=time.time())
+    start = time.monotonic()
+    try:
+        if WhisperModel is None:
+            from faster_whisper import WhisperModel as _WM
+            WhisperModel = _WM
+        audio, clip = _calibration_audio()
+        clip_seconds = len(audio) / PCM_SAMPLE_RATE
+        candidates = _tuning_candidates()
+        _log(f"TUNING_START reason={reason} model={MODEL_SIZE} clip={clip} candidates={len(candidates)}")
+        results = []
+        for index, (compute, threads) in enumerate(candidates):
+            tuning_state["progress"] = f"{index + 1}/{len(candidates)}"
+            while True:
+                # Measurements taken while a task runs would be meaningless; wait for the worker
+                while _tuning_preempted():
+                    time.sleep(1)
+                activity_before = last_activity
+                try:
+                    load_seconds, elapsed = _measure_tuning_candidate(audio, compute, threads)
+                except _TuningPreempted:
+                    # A task arrived mid-measurement: the candidate is dropped and measured again once idle
+                    _log(f"TUNING_PREEMPTED compute={compute} threads={threads}")
+                    continue
+                except Exception as exc:
+                    load_seconds = elapsed = None
+                    results.append({"compute": compute, "cpuThreads": threads, "error": str(exc)})
+                    _log(f"TUNING_CANDIDATE compute={compute} threads={threads} error={exc}", level="warning")
+                break
+            if elapsed is None:
+                continue
+            result = {
+                "compute": compute,
+                "cpuThreads": threads,
+                "loadSeconds": round(load_seconds, 2),
+                "realtimeFactor": round(elapsed / clip_seconds, 4),
+                "contended": last_activity != activity_before,
+            }
+            results.append(result)
+            _log(
+                f"TUNING_CANDIDATE compute={compute} threads={threads} rtf={result['realtimeFactor']} "
+                f"load={result['loadSeconds']}s contended={result['contended']}"
+            )
+        valid = [item for item in results if "error" not in item and not item["contended"]]
+        if not valid:
+            raise RuntimeError("没有可用的调优结果")
+        best = min(valid, key=lambda item: item["realtimeFactor"])
+        profile = {
+            "compute": best["compute"],
+            "cpuThreads": best["cpuThreads"],
+            "realtimeFactor": best["realtimeFactor"],
+            "cpuCount": os.cpu_count(),
+            "clip": clip,
+            "clipSeconds": round(clip_seconds, 1),
+            "measuredAt": time.time(),
+            "candidates": results,
+        }
+        saved = dict(_load_tuning())
+        saved[_tuning_key()] = profile
+        partial_path = TUNING_PATH.with_suffix(".json.part")
+        partial_path.write_text(json.dumps(saved, indent=2), encoding="utf-8")
+        partial_path.replace(TUNING_PATH)
+        tuning_cache = saved
+        _log(
+            f"TUNING_DONE model={MODEL_SIZE} compute={best['compute']} threads={best['cpuThreads']} "
+            f"rtf={best['realtimeFactor']} elapsed={time.monotonic() - start:.1f}s"
+        )
+        _start_model_rebuild()
+    except Exception as exc:
+        tuning_state["lastError"] = str(exc)
+        _log(f"TUNING_ERROR {exc}", level="error")
+    finally:
+        with tuning_lock:
+            tuning_state.update(running=False, progress=None)
+        _touch_activity()
+
+
+def _start_autotune(reason: str) -> bool:
+    if tuning_state["running"]:
+        return False
+    threading.Thread(target=_run_autotune, args=(reason,), name="auto-tuner", daemon=True).start()
+    return True
+
+
+def _needs_autotune() -> bool:
+    with settings_lock:
+        compute_fixed = COMPUTE_FROM_ENV or "compute" in runtime_settings
+        threads_fixed = THREADS_FROM_ENV or "cpuThreads" in runtime_settings
+    if compute_fixed and threads_fixed or _tuned_profile() is not None:
+        return False
+    return AUTOTUNE and WHISPER_DEVICE == "cpu" and PIPELINE_MODE != "fake"
+
+
+def _apply_settings() -> None:
+    """Point the module-level settings at SETTINGS_DEFAULTS overlaid with runtime_settings."""
+    global MODEL_SIZE, IDLE_SECONDS
+    with settings_lock:
+        effective = {**SETTINGS_DEFAULTS, **runtime_settings}
+    MODEL_SIZE = effective["modelSize"]
+    IDLE_SECONDS = effective["idleSeconds"]
+
+
+def _load_settings() -> None:
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute("SELECT key, value FROM settings").fetchall()
+    loaded = {}
+    for row in rows:
+        if row["key"] not in SETTINGS_DEFAULTS:
+            _log(f"SETTINGS_LOAD skip key={row['key']}", level="warning")
+            continue
+        try:
+            loaded[row["key"]] = json.loads(row["value"])
+        except ValueError:
+            _log(f"SETTINGS_LOAD skip key={row['key']} invalid value", level="warning")
+    with settings_lock:
+        runtime_settings.clear()
+        runtime_settings.update(loaded)
+    _apply_settings()
+    if loaded:
+        _log(f"SETTINGS_LOAD {' '.join(f'{key}={value}' for key, value in sorted(loaded.items()))}")
+
+
+def _db_save_settings(values: Dict[str, Any], removed: List[str]) -> None:
+    now = time.time()
+    with db_lock, _db_connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO settings (key, value, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """,
+            [(key, json.dumps(value), now) for key, value in values.items()],
+        )
+        conn.executemany("DELETE FROM settings WHERE key = ?", [(key,) for key in removed])
+        conn.commit()
+
+
+def _settings_view() -> Dict[str, Any]:
+    target = _model_target()
+    with settings_lock:
+        overrides = dict(runtime_settings)
+    with model_lock:
+        loaded = dict(model_config)
+        rebuild = dict(model_rebuild)
+        outdated = _model_outdated()
+    return {
+        "effective": {
+            "modelSize": target["modelSize"],
+            "compute": target["compute"],
+            "cpuThreads": target["cpuThreads"],
+            "idleSeconds": IDLE_SECONDS,
+        },
+        "source": target["source"],
+        "overrides": overrides,
+        "defaults": dict(SETTINGS_DEFAULTS),
+        # The model in use; differs from "effective" until a rebuild swaps in the new one
+        "loadedModel": loaded or None,
+        "pendingRebuild": outdated,
+        "rebuild": rebuild,
+    }
+
+
+def _model_outdated() -> bool:
+    """Caller holds model_lock."""
+    if whisper_model is None:
+        return False
+    target = _model_target()
+    return any(model_config.get(key) != target[key] for key in SETTINGS_MODEL_KEYS)
+
+
+def _start_model_rebuild() -> bool:
+    """Ask the worker to swap in a model for the current settings at its next task boundary."""
+    global model_rebuild_requested
+    with model_lock:
+        if not _model_outdated():
+            return False
+    with condition:
+        model_rebuild_requested = True
+        condition.notify_all()
+    return True
+
+
+def _rebuild_whisper_model() -> None:
+    """Build a model for the current settings and swap it in.
+
+    Called by the worker between tasks, so the build never competes with a task for
+    CPU_THREADS and the next task already runs on the new settings.
+    """
+    global whisper_model, draft_model, model_rebuild_requested
+    with condition:
+        model_rebuild_requested = False
+    with model_lock:
+        if not _model_outdated():
+            return
+        model_rebuild.update(running=True, lastError=None)
+    settings = _model_target()
+    start = time.monotonic()
+    _log(
+        f"MODEL_REBUILD_START size={settings['modelSize']} compute={settings['compute']} "
+        f"cpu_threads={settings['cpuThreads']} source={settings['source']}"
+    )
+    try:
+        model = _build_whisper_model(settings)
+    except Exception as exc:
+        with model_lock:
+            model_rebuild.update(running=False, lastError=str(exc))
+        _log(f"MODEL_REBUILD_ERROR {exc}", level="error")
+        return
     elapsed = time.monotonic() - start
+    METRIC_MODEL_LOAD.observe(elapsed)
     with model_lock:
         whisper_model = model
-        model_ready = True
-        model_loading = False
-    _log(f"MODEL_INIT_DONE elapsed={elapsed:.2f}s")
-    _log_slow("MODEL_INIT", start)
-    return model
+        model_config.clear()
+        model_config.update(settings)
+        model_rebuild["running"] = False
+    with draft_model_lock:
+        # Rebuilt lazily with the new compute/threads by the next two-pass task
+        draft_model = None
+    del model
+    _log(f"MODEL_REBUILD_DONE size={settings['modelSize']} elapsed={elapsed:.2f}s")
 
 
 def _cookiefile_path(task_id: str) -> Path:
     return TEMP_DIR / f"cookies-{task_id}.txt"
 
 
+def _batch_cookiefile_path(batch_id: str) -> Path:
+    # One file shared by every task of a bulk submission
+    return TEMP_DIR / f"cookies-batch-{batch_id}.txt"
+
+
 def _write_cookies_file(cookies: List[CookieItem], path: Path) -> None:
     lines = [
         "# Netscape HTTP Cookie File",
@@ -447,10 +1583,16 @@ def _needs_cookies(message: str) -> bool:
         "verification",
         "vip",
     ]
-    return any(keyword in lowered for keyword in keywords)
+    # Whole words only: "age" must not match "message" or "storage"
+    return any(re.search(rf"\b{re.escape(keyword)}\b", lowered) for keyword in keywords)
 
 
-def _task_public_view(task: Dict[str, Any], queue_positions: Dict[str, int]) -> Dict[str, Any]:
+def _task_public_view(
+    task: Dict[str, Any],
+    queue_positions: Dict[str, int],
+    etas: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    eta = (etas or {}).get(task["id"])
     return {
         "id": task["id"],
         "url": task["url"],
@@ -465,6 +1607,25 @@ def _task_public_view(task: Dict[str, Any], queue_positions: Dict[str, int]) ->
         "errorMessage": task.get("errorMessage"),
         "resultFilename": task.get("resultFilename"),
         "queuePosition": queue_positions.get(task["id"]),
+        "downloadAttempts": task.get("downloadAttempts") or [],
+        "resumeCount": task.get("resumeCount") or 0,
+        "cancelLatencyMs": task.get("cancelLatencyMs"),
+        "cancelModelLoading": bool(task.get("cancelModelLoading")),
+        "cookiesSupplied": bool(task.get("cookiesSupplied")),
+        "audioDuration": task.get("audioDuration"),
+        "realtimeFactor": task.get("realtimeFactor"),
+        "decodeProfile": task.get("decodeProfile") or DEFAULT_DECODE_PROFILE,
+        "twoPass": bool(task.get("twoPass")),
+        "hasDraft": bool(task.get("draftPath")),
+        "draftAt": task.get("draftAt"),
+        "loopGuard": task.get("loopGuard") or [],
+        "dedupOf": task.get("dedupOf"),
+        "dedupSimilarity": task.get("dedupSimilarity"),
+        "workerId": task.get("workerId"),
+        "probedDuration": task.get("probedDuration"),
+        "etaSeconds": round(eta) if eta is not None else None,
+        "batchId": task.get("batchId"),
+        "callbackUrl": task.get("callbackUrl"),
     }
 
 
@@ -477,6 +1638,7 @@ def _next_queue_order() -> int:
 def _db_connect() -> sqlite3.Connection:
     conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
+    conn.create_function("search_grams", 1, _search_grams, deterministic=True)
     return conn
 
 
@@ -508,70 +1670,626 @@ def _init_db() -> None:
             )
             """
         )
-        conn.commit()
-    _log(f"DB_INIT_DONE elapsed={time.monotonic() - start:.2f}s")
-
-
-def _db_upsert_task(task: Dict[str, Any]) -> None:
-    with db_lock, _db_connect() as conn:
+        _ensure_columns(conn, "tasks", TASK_EXTRA_COLUMNS)
         conn.execute(
             """
-            INSERT OR REPLACE INTO tasks (
-                id,
-                url,
-                title,
-                site,
-                status,
-                created_at,
-                updated_at,
-                download_progress,
-                transcribe_progress,
-                error_code,
-                error_message,
-                result_path,
-                result_filename,
-                audio_path,
-                cookiefile_path,
-                cancel_requested,
-                queue_order
+            CREATE TABLE IF NOT EXISTS download_strategy_stats (
+                site TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                consecutive_failures INTEGER NOT NULL DEFAULT 0,
+                avg_seconds REAL,
+                last_success_at REAL,
+                last_failure_at REAL,
+                PRIMARY KEY (site, strategy)
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                task["id"],
-                task["url"],
-                task.get("title"),
-                task.get("site"),
-                task["status"],
-                task["createdAt"],
-                task["updatedAt"],
-                int(task.get("downloadProgress") or 0),
-                int(task.get("transcribeProgress") or 0),
-                task.get("errorCode"),
-                task.get("errorMessage"),
-                task.get("resultPath"),
-                task.get("resultFilename"),
-                task.get("audioPath"),
-                task.get("cookiefilePath"),
-                1 if task.get("cancelRequested") else 0,
-                task.get("queueOrder"),
-            ),
+            """
         )
-        conn.commit()
-
-
-def _db_delete_task(task_id: str) -> None:
-    with db_lock, _db_connect() as conn:
-        conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-        conn.commit()
-
-
-def _db_load_tasks() -> List[sqlite3.Row]:
-    with db_lock, _db_connect() as conn:
-        return conn.execute("SELECT * FROM tasks").fetchall()
-
-
-def _load_tasks_from_db() -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcript_segments (
+                id INTEGER PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                start REAL NOT NULL,
+                end REAL NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE (task_id, seq)
+            )
+            """
+        )
+        _migrate_segment_ids(conn)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS storage_usage (
+                category TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL,
+                files INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS audio_fingerprints (
+                task_id TEXT PRIMARY KEY,
+                duration REAL NOT NULL,
+                frames INTEGER NOT NULL,
+                codes BLOB NOT NULL,
+                active BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        # A transcript is only reused for the same model size and decoding profile
+        _ensure_columns(conn, "audio_fingerprints", {"model_size": "TEXT", "decode_profile": "TEXT"})
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS audio_fingerprints_duration ON audio_fingerprints (duration)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS transcript_index (
+                task_id TEXT PRIMARY KEY,
+                indexed_at REAL NOT NULL
+            )
+            """
+        )
+        _init_search_table(conn)
+        conn.commit()
+    _log(f"DB_INIT_DONE elapsed={time.monotonic() - start:.2f}s")
+
+
+def _migrate_segment_ids(conn: sqlite3.Connection) -> None:
+    """Copy a transcript_segments table keyed by (task_id, seq) into one with an explicit id."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(transcript_segments)")}
+    if "id" in columns:
+        return
+    start = time.monotonic()
+    # The FTS index points at the old implicit rowids; _init_search_table rebuilds it
+    conn.execute("DROP TABLE IF EXISTS transcript_fts")
+    conn.execute("DROP TABLE IF EXISTS transcript_grams")
+    conn.execute("DROP TABLE IF EXISTS transcript_index")
+    conn.execute(
+        """
+        CREATE TABLE transcript_segments_new (
+            id INTEGER PRIMARY KEY,
+            task_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            start REAL NOT NULL,
+            end REAL NOT NULL,
+            text TEXT NOT NULL,
+            UNIQUE (task_id, seq)
+        )
+        """
+    )
+    cursor = conn.execute(
+        """
+        INSERT INTO transcript_segments_new (task_id, seq, start, end, text)
+        SELECT task_id, seq, start, end, text FROM transcript_segments ORDER BY task_id, seq
+        """
+    )
+    conn.execute("DROP TABLE transcript_segments")
+    conn.execute("ALTER TABLE transcript_segments_new RENAME TO transcript_segments")
+    _log(f"DB_MIGRATE transcript_segments.id rows={cursor.rowcount} elapsed={time.monotonic() - start:.2f}s")
+
+
+def _init_search_table(conn: sqlite3.Connection) -> None:
+    global search_tokenizer
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'transcript_fts'"
+    ).fetchone()
+    has_grams = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transcript_grams'"
+    ).fetchone()
+    if row:
+        tokenizer = "trigram" if "trigram" in (row["sql"] or "") else "unicode61"
+        if tokenizer == "unicode61" or has_grams:
+            search_tokenizer = tokenizer
+            return
+        # A trigram index from before transcript_grams; dropped so the search backfill rebuilds both
+        conn.execute("DROP TABLE transcript_fts")
+        conn.execute("DELETE FROM transcript_index")
+    # External-content index over transcript_segments; trigram needs SQLite >= 3.34
+    for tokenizer in ("trigram", "unicode61"):
+        try:
+            conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE transcript_fts USING fts5(
+                    text,
+                    content='transcript_segments',
+                    content_rowid='id',
+                    tokenize='{tokenizer}'
+                )
+                """
+            )
+        except sqlite3.OperationalError as exc:
+            _log(f"SEARCH_INIT tokenizer={tokenizer} unavailable error={exc}")
+            continue
+        if tokenizer == "trigram":
+            # Trigrams cannot match terms shorter than three characters (common for CJK words);
+            # this contentless index of character bigrams finds their candidate segments
+            conn.execute(
+                "CREATE VIRTUAL TABLE transcript_grams USING fts5(grams, content='', tokenize='unicode61')"
+            )
+        search_tokenizer = tokenizer
+        _log(f"SEARCH_INIT tokenizer={tokenizer}")
+        return
+
+
+# Columns added after the original schema; older databases get them via ALTER TABLE.
+TASK_EXTRA_COLUMNS: Dict[str, str] = {
+    "download_attempts": "TEXT",
+    "resume_count": "INTEGER",
+    "cancel_latency_ms": "REAL",
+    "cancel_model_loading": "INTEGER",
+    "cookies_supplied": "INTEGER",
+    "timeline": "TEXT",
+    "audio_duration": "REAL",
+    "realtime_factor": "REAL",
+    "decode_profile": "TEXT",
+    "two_pass": "INTEGER",
+    "draft_path": "TEXT",
+    "draft_at": "REAL",
+    "loop_guard": "TEXT",
+    "dedup_of": "TEXT",
+    "dedup_similarity": "REAL",
+    "worker_id": "TEXT",
+    "probed_duration": "REAL",
+    "batch_id": "TEXT",
+    "callback_url": "TEXT",
+}
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: Dict[str, str]) -> None:
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+            _log(f"DB_MIGRATE table={table} column={name}")
+
+
+def _task_to_row(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": task["id"],
+        "url": task["url"],
+        "title": task.get("title"),
+        "site": task.get("site"),
+        "status": task["status"],
+        "created_at": task["createdAt"],
+        "updated_at": task["updatedAt"],
+        "download_progress": int(task.get("downloadProgress") or 0),
+        "transcribe_progress": int(task.get("transcribeProgress") or 0),
+        "error_code": task.get("errorCode"),
+        "error_message": task.get("errorMessage"),
+        "result_path": task.get("resultPath"),
+        "result_filename": task.get("resultFilename"),
+        "audio_path": task.get("audioPath"),
+        "cookiefile_path": task.get("cookiefilePath"),
+        "cookies_supplied": 1 if task.get("cookiesSupplied") else 0,
+        "cancel_requested": 1 if task.get("cancelRequested") else 0,
+        "queue_order": task.get("queueOrder"),
+        "download_attempts": _json_dumps_or_none(task.get("downloadAttempts")),
+        "resume_count": int(task.get("resumeCount") or 0),
+        "cancel_latency_ms": task.get("cancelLatencyMs"),
+        "cancel_model_loading": 1 if task.get("cancelModelLoading") else 0,
+        "timeline": _json_dumps_or_none(task.get("timeline")),
+        "audio_duration": task.get("audioDuration"),
+        "realtime_factor": task.get("realtimeFactor"),
+        "decode_profile": task.get("decodeProfile"),
+        "two_pass": 1 if task.get("twoPass") else 0,
+        "draft_path": task.get("draftPath"),
+        "draft_at": task.get("draftAt"),
+        "loop_guard": _json_dumps_or_none(task.get("loopGuard")),
+        "dedup_of": task.get("dedupOf"),
+        "dedup_similarity": task.get("dedupSimilarity"),
+        "worker_id": task.get("workerId"),
+        "probed_duration": task.get("probedDuration"),
+        "batch_id": task.get("batchId"),
+        "callback_url": task.get("callbackUrl"),
+    }
+
+
+def _task_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "url": row["url"],
+        "title": row["title"],
+        "site": row["site"],
+        "status": row["status"],
+        "createdAt": row["created_at"],
+        "updatedAt": row["updated_at"],
+        "downloadProgress": row["download_progress"],
+        "transcribeProgress": row["transcribe_progress"],
+        "errorCode": row["error_code"],
+        "errorMessage": row["error_message"],
+        "resultPath": row["result_path"],
+        "resultFilename": row["result_filename"],
+        "audioPath": row["audio_path"],
+        "cookiefilePath": row["cookiefile_path"],
+        # Rows from before cookies_supplied only have the path to go by
+        "cookiesSupplied": bool(row["cookies_supplied"] or row["cookiefile_path"]),
+        "cancelRequested": bool(row["cancel_requested"]),
+        "queueOrder": row["queue_order"],
+        "downloadAttempts": _json_loads_or_none(row["download_attempts"]) or [],
+        "resumeCount": row["resume_count"] or 0,
+        "cancelLatencyMs": row["cancel_latency_ms"],
+        "cancelModelLoading": bool(row["cancel_model_loading"]),
+        "timeline": _json_loads_or_none(row["timeline"]),
+        "audioDuration": row["audio_duration"],
+        "realtimeFactor": row["realtime_factor"],
+        "decodeProfile": row["decode_profile"],
+        "twoPass": bool(row["two_pass"]),
+        "draftPath": row["draft_path"],
+        "draftAt": row["draft_at"],
+        "loopGuard": _json_loads_or_none(row["loop_guard"]),
+        "dedupOf": row["dedup_of"],
+        "dedupSimilarity": row["dedup_similarity"],
+        "workerId": row["worker_id"],
+        "probedDuration": row["probed_duration"],
+        "batchId": row["batch_id"],
+        "callbackUrl": row["callback_url"],
+    }
+
+
+def _json_dumps_or_none(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _json_loads_or_none(value: Optional[str]) -> Any:
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def _db_upsert_task(task: Dict[str, Any]) -> None:
+    _db_upsert_tasks([task])
+
+
+def _db_upsert_tasks(items: List[Dict[str, Any]]) -> None:
+    if not items:
+        return
+    start = time.monotonic()
+    rows = [_task_to_row(task) for task in items]
+    columns = ", ".join(rows[0].keys())
+    placeholders = ", ".join("?" for _ in rows[0])
+    with db_lock, _db_connect() as conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO tasks ({columns}) VALUES ({placeholders})",
+            [tuple(row.values()) for row in rows],
+        )
+        conn.commit()
+    METRIC_DB_WRITE.observe(time.monotonic() - start)
+
+
+def _db_delete_task(task_id: str) -> None:
+    _db_delete_tasks([task_id])
+
+
+def _db_delete_tasks(task_ids: List[str]) -> None:
+    """Delete tasks with their segments, search index entries and fingerprints in one transaction."""
+    if not task_ids:
+        return
+    with checkpoint_lock:
+        for task_id in task_ids:
+            pending_segments.pop(task_id, None)
+            live_segments.pop(task_id, None)
+    params = [(task_id,) for task_id in task_ids]
+    with db_lock, _db_connect() as conn:
+        for task_id in task_ids:
+            _unindex_transcript(conn, task_id)
+        conn.executemany("DELETE FROM transcript_segments WHERE task_id = ?", params)
+        conn.executemany("DELETE FROM audio_fingerprints WHERE task_id = ?", params)
+        conn.executemany("DELETE FROM tasks WHERE id = ?", params)
+        conn.commit()
+
+
+def _db_load_segments(task_id: str) -> List[sqlite3.Row]:
+    with db_lock, _db_connect() as conn:
+        return conn.execute(
+            "SELECT seq, start, end, text FROM transcript_segments WHERE task_id = ? ORDER BY seq",
+            (task_id,),
+        ).fetchall()
+
+
+def _db_clear_segments(task_id: str) -> None:
+    with checkpoint_lock:
+        pending_segments.pop(task_id, None)
+        live_segments.pop(task_id, None)
+    with db_lock, _db_connect() as conn:
+        _unindex_transcript(conn, task_id)
+        conn.execute("DELETE FROM transcript_segments WHERE task_id = ?", (task_id,))
+        conn.commit()
+
+
+def _checkpoint_segment(task_id: str, seq: int, start: float, end: float, text: str) -> None:
+    with checkpoint_lock:
+        pending_segments.setdefault(task_id, []).append((seq, start, end, text))
+        live = live_segments.get(task_id)
+        if live is not None:
+            live.append({"seq": seq, "start": start, "end": end, "text": text})
+
+
+def _segments_since(task_id: str, cursor: int) -> List[Dict[str, Any]]:
+    cursor = max(0, cursor)
+    with checkpoint_lock:
+        live = live_segments.get(task_id)
+        if live is not None:
+            # Live segments are contiguous from seq 0, so the cursor is a list index
+            return [dict(segment) for segment in live[cursor:]]
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute(
+            """
+            SELECT seq, start, end, text FROM transcript_segments
+            WHERE task_id = ? AND seq >= ? ORDER BY seq
+            """,
+            (task_id, cursor),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _flush_checkpoints(task_id: Optional[str] = None, lock_timeout: float = -1) -> int:
+    with checkpoint_lock:
+        if task_id is None:
+            batches = list(pending_segments.items())
+            pending_segments.clear()
+        else:
+            batches = [(task_id, pending_segments.pop(task_id, []))]
+    rows = [(tid, *segment) for tid, segments in batches for segment in segments]
+    if not rows:
+        return 0
+    if not db_lock.acquire(timeout=lock_timeout):
+        _log(f"CHECKPOINT_FLUSH skipped reason=db_busy segments={len(rows)}")
+        return 0
+    try:
+        with _db_connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO transcript_segments (task_id, seq, start, end, text)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (task_id, seq) DO UPDATE
+                SET start = excluded.start, end = excluded.end, text = excluded.text
+                """,
+                rows,
+            )
+            conn.commit()
+    finally:
+        db_lock.release()
+    return len(rows)
+
+
+def _unindex_transcript(conn: sqlite3.Connection, task_id: str) -> None:
+    indexed = conn.execute(
+        "SELECT 1 FROM transcript_index WHERE task_id = ?", (task_id,)
+    ).fetchone()
+    if not indexed:
+        return
+    conn.execute("DELETE FROM transcript_index WHERE task_id = ?", (task_id,))
+    if not search_tokenizer:
+        return
+    # External-content FTS rows are removed with the 'delete' command and their old values
+    conn.execute(
+        """
+        INSERT INTO transcript_fts (transcript_fts, rowid, text)
+        SELECT 'delete', id, text FROM transcript_segments WHERE task_id = ?
+        """,
+        (task_id,),
+    )
+    if search_tokenizer == "trigram":
+        conn.execute(
+            """
+            INSERT INTO transcript_grams (transcript_grams, rowid, grams)
+            SELECT 'delete', id, search_grams(text) FROM transcript_segments WHERE task_id = ?
+            """,
+            (task_id,),
+        )
+
+
+def _index_transcript(task_id: str, text: Optional[str] = None) -> None:
+    if not search_tokenizer:
+        return
+    start = time.monotonic()
+    with db_lock, _db_connect() as conn:
+        _unindex_transcript(conn, task_id)
+        has_segments = conn.execute(
+            "SELECT 1 FROM transcript_segments WHERE task_id = ? LIMIT 1", (task_id,)
+        ).fetchone()
+        if not has_segments:
+            if not text:
+                return
+            # Transcripts without stored segments are indexed as one untimed segment
+            conn.execute(
+                """
+                INSERT INTO transcript_segments (task_id, seq, start, end, text)
+                VALUES (?, 0, 0, 0, ?)
+                """,
+                (task_id, text),
+            )
+        cursor = conn.execute(
+            """
+            INSERT INTO transcript_fts (rowid, text)
+            SELECT id, text FROM transcript_segments WHERE task_id = ?
+            """,
+            (task_id,),
+        )
+        if search_tokenizer == "trigram":
+            conn.execute(
+                """
+                INSERT INTO transcript_grams (rowid, grams)
+                SELECT id, search_grams(text) FROM transcript_segments WHERE task_id = ?
+                """,
+                (task_id,),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO transcript_index (task_id, indexed_at) VALUES (?, ?)",
+            (task_id, time.time()),
+        )
+        conn.commit()
+    _log(
+        f"SEARCH_INDEX task={task_id} segments={cursor.rowcount} "
+        f"elapsed={time.monotonic() - start:.3f}s"
+    )
+
+
+def _backfill_search_index() -> None:
+    if not search_tokenizer:
+        return
+    with db_lock, _db_connect() as conn:
+        indexed = {row["task_id"] for row in conn.execute("SELECT task_id FROM transcript_index")}
+    with lock:
+        pending = [
+            (task["id"], task.get("resultPath"))
+            for task in tasks.values()
+            if task["status"] == TASK_STATUS_DONE and task["id"] not in indexed
+        ]
+    for task_id, result_path in pending:
+        try:
+            text = None
+            if result_path and Path(result_path).is_file():
+                text = Path(result_path).read_text(encoding="utf-8")
+            _index_transcript(task_id, text)
+        except (OSError, sqlite3.Error) as exc:
+            _log(f"SEARCH_BACKFILL failed task={task_id} error={exc}", level="warning")
+    if pending:
+        _log(f"SEARCH_BACKFILL count={len(pending)}")
+
+
+def _search_grams(text: Optional[str]) -> str:
+    """Character bigrams of a segment plus its last character, for transcript_grams.
+
+    Each gram is hex-encoded UTF-8 so it stays one unicode61 token whatever the characters are.
+    """
+    chars = [char for char in (text or "").lower() if not char.isspace()]
+    grams = {(chars[index] + chars[index + 1]).encode("utf-8").hex() for index in range(len(chars) - 1)}
+    if chars:
+        grams.add(chars[-1].encode("utf-8").hex())
+    return " ".join(sorted(grams))
+
+
+def _grams_query(term: str) -> str:
+    """transcript_grams MATCH expression for a term shorter than three characters."""
+    chars = list(term.lower())
+    if len(chars) == 1:
+        # Any bigram starting with the character, or the character ending a segment
+        return chars[0].encode("utf-8").hex() + "*"
+    return " AND ".join((chars[index] + chars[index + 1]).encode("utf-8").hex() for index in range(len(chars) - 1))
+
+
+def _search_snippet(text: str, terms: List[str], width: int = 64) -> str:
+    """The part of a segment around its first match with every term in brackets, like FTS5 snippet()."""
+    lowered = text.lower()
+    spans: List[List[int]] = []
+    for needle in sorted({term.lower() for term in terms}):
+        found = lowered.find(needle)
+        while found >= 0:
+            spans.append([found, found + len(needle)])
+            found = lowered.find(needle, found + len(needle))
+    spans.sort()
+    merged: List[List[int]] = []
+    for span in spans:
+        if merged and span[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], span[1])
+        else:
+            merged.append(span)
+    left = max(0, merged[0][0] - width // 4) if merged else 0
+    right = min(len(text), left + width)
+    parts = ["…" if left else ""]
+    cursor = left
+    for start, end in merged:
+        if end <= left or start >= right:
+            continue
+        start, end = max(start, left), min(end, right)
+        parts += [text[cursor:start], "[", text[start:end], "]"]
+        cursor = end
+    parts.append(text[cursor:right])
+    if right < len(text):
+        parts.append("…")
+    return "".join(parts)
+
+
+def _search_transcripts(query: str, limit: int, per_task: int) -> List[Dict[str, Any]]:
+    """Segments containing every term, best-ranked first, grouped by task.
+
+    Terms of three or more characters go through transcript_fts; shorter ones (trigram index
+    only) through transcript_grams, and LIKE then checks just those candidate segments.
+    """
+    terms = [term for term in query.split() if term]
+    if not terms:
+        return []
+    short_terms = [term for term in terms if search_tokenizer == "trigram" and len(term) < 3]
+    long_terms = [term for term in terms if search_tokenizer != "trigram" or len(term) >= 3]
+    # Each term is quoted as a phrase so FTS5 query syntax in user input is inert
+    fts_match = " AND ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+    grams_match = " AND ".join(f"({_grams_query(term)})" for term in short_terms)
+    ranked, match = ("transcript_fts", fts_match) if long_terms else ("transcript_grams", grams_match)
+    sql = f"""
+        SELECT s.task_id, s.seq, s.start, s.end, s.text
+        FROM {ranked}
+        JOIN transcript_segments s ON s.id = {ranked}.rowid
+        WHERE {ranked} MATCH ?
+    """
+    params: List[Any] = [match]
+    if long_terms and short_terms:
+        sql += " AND s.id IN (SELECT rowid FROM transcript_grams WHERE transcript_grams MATCH ?)"
+        params.append(grams_match)
+    for term in short_terms:
+        # Grams ignore whitespace and order, so candidates are confirmed against the text
+        sql += " AND s.text LIKE ? ESCAPE '\\'"
+        params.append("%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    sql += f" ORDER BY {ranked}.rank LIMIT ?"
+    params.append(limit * per_task * 4)
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with lock:
+        for row in rows:
+            task = tasks.get(row["task_id"])
+            if not task:
+                continue
+            entry = results.get(row["task_id"])
+            if entry is None:
+                if len(results) >= limit:
+                    continue
+                entry = results[row["task_id"]] = {
+                    "taskId": task["id"],
+                    "title": task.get("title"),
+                    "url": task["url"],
+                    "createdAt": task["createdAt"],
+                    "matches": [],
+                }
+            if len(entry["matches"]) < per_task:
+                entry["matches"].append(
+                    {
+                        "seq": row["seq"],
+                        "start": row["start"],
+                        "end": row["end"],
+                        "snippet": _search_snippet(row["text"], terms),
+                    }
+                )
+    return list(results.values())
+
+
+def _db_load_tasks() -> List[sqlite3.Row]:
+    with db_lock, _db_connect() as conn:
+        return conn.execute("SELECT * FROM tasks").fetchall()
+
+
+def _load_tasks_from_db() -> None:
     global queue_sequence
     rows = _db_load_tasks()
     _log(f"DB_LOAD count={len(rows)}")
@@ -581,30 +2299,22 @@ def _load_tasks_from_db() -> None:
     tasks_to_persist: List[Dict[str, Any]] = []
     with lock:
         for row in rows:
-            task = {
-                "id": row["id"],
-                "url": row["url"],
-                "title": row["title"],
-                "site": row["site"],
-                "status": row["status"],
-                "createdAt": row["created_at"],
-                "updatedAt": row["updated_at"],
-                "downloadProgress": row["download_progress"],
-                "transcribeProgress": row["transcribe_progress"],
-                "errorCode": row["error_code"],
-                "errorMessage": row["error_message"],
-                "resultPath": row["result_path"],
-                "resultFilename": row["result_filename"],
-                "audioPath": row["audio_path"],
-                "cookiefilePath": row["cookiefile_path"],
-                "cancelRequested": bool(row["cancel_requested"]),
-                "queueOrder": row["queue_order"],
-            }
+            task = _task_from_row(row)
 
             if task["status"] in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING):
-                task["status"] = TASK_STATUS_ERROR
-                task["errorCode"] = "interrupted"
-                task["errorMessage"] = "任务已取消，请重试"
+                if task["resumeCount"] < MAX_AUTO_RESUME:
+                    # Partial downloads are kept in TEMP_DIR, so the re-queued task resumes
+                    _log(
+                        f"TASK_RESUME task={task['id']} status={task['status']} "
+                        f"attempt={task['resumeCount'] + 1}"
+                    )
+                    task["status"] = TASK_STATUS_QUEUED
+                    task["resumeCount"] += 1
+                    task["cancelRequested"] = False
+                else:
+                    task["status"] = TASK_STATUS_ERROR
+                    task["errorCode"] = "interrupted"
+                    task["errorMessage"] = "任务已取消，请重试"
                 task["updatedAt"] = now
                 tasks_to_persist.append(task)
             elif task["status"] == TASK_STATUS_CANCELING:
@@ -635,14 +2345,14 @@ def _load_tasks_from_db() -> None:
         queue.clear()
         queue.extend([task["id"] for task in queued])
 
-    for task in tasks_to_persist:
-        _db_upsert_task(task)
+    _db_upsert_tasks(tasks_to_persist)
 
 
 def _snapshot_tasks() -> Dict[str, Any]:
     with lock:
         queue_positions = {task_id: idx + 1 for idx, task_id in enumerate(queue)}
-        snapshot = [_task_public_view(task, queue_positions) for task in tasks.values()]
+        etas = _estimate_etas()
+        snapshot = [_task_public_view(task, queue_positions, etas) for task in tasks.values()]
         snapshot.sort(key=lambda item: item["createdAt"])
         return {
             "tasks": snapshot,
@@ -650,6 +2360,154 @@ def _snapshot_tasks() -> Dict[str, Any]:
         }
 
 
+def _fit_throughput(samples: List[Tuple[float, float]]) -> Dict[str, Any]:
+    """Least-squares fit of service seconds = overhead + factor * audio seconds."""
+    if not samples:
+        tuned = _model_settings().get("realtimeFactor")
+        factor = tuned * 1.5 if tuned else THROUGHPUT_DEFAULT_FACTOR
+        return {"overhead": 0.0, "factor": factor, "samples": 0, "medianDuration": THROUGHPUT_DEFAULT_DURATION}
+    count = len(samples)
+    durations = sorted(duration for duration, _ in samples)
+    median_duration = durations[count // 2]
+    ratios = sorted(seconds / duration for duration, seconds in samples)
+    overhead, factor = 0.0, ratios[count // 2]
+    mean_x = sum(duration for duration, _ in samples) / count
+    mean_y = sum(seconds for _, seconds in samples) / count
+    variance = sum((duration - mean_x) ** 2 for duration, _ in samples)
+    if count >= 3 and variance > 0:
+        slope = sum((duration - mean_x) * (seconds - mean_y) for duration, seconds in samples) / variance
+        intercept = mean_y - slope * mean_x
+        # Same-length samples or outliers can give a nonsensical line; keep the median ratio then
+        if slope > 0 and intercept >= 0:
+            overhead, factor = min(intercept, 600.0), slope
+    return {
+        "overhead": round(overhead, 2),
+        "factor": round(factor, 4),
+        "samples": count,
+        "medianDuration": median_duration,
+    }
+
+
+def _learn_throughput(task: Dict[str, Any]) -> None:
+    timeline = task.get("timeline") or {}
+    duration = task.get("audioDuration")
+    # Deduplicated and resumed runs did not transcribe the whole clip, so they say little about speed
+    if task.get("status") != TASK_STATUS_DONE or task.get("dedupOf") or not duration:
+        return
+    if (timeline.get("transcribedSeconds") or 0) < duration * 0.9 or not timeline.get("totalMs"):
+        return
+    throughput_samples.append((float(duration), timeline["totalMs"] / 1000))
+    throughput_model.update(_fit_throughput(list(throughput_samples)))
+
+
+def _load_throughput_history() -> None:
+    with lock:
+        finished = sorted(
+            (dict(task) for task in tasks.values() if task["status"] == TASK_STATUS_DONE),
+            key=lambda item: item["updatedAt"],
+        )
+    for task in finished[-THROUGHPUT_SAMPLES:]:
+        _learn_throughput(task)
+    if not throughput_model:
+        throughput_model.update(_fit_throughput([]))
+    _log(
+        f"THROUGHPUT_MODEL samples={throughput_model['samples']} "
+        f"overhead={throughput_model['overhead']}s factor={throughput_model['factor']}"
+    )
+
+
+def _expected_duration(task: Dict[str, Any]) -> float:
+    return (
+        task.get("audioDuration")
+        or task.get("probedDuration")
+        or throughput_model.get("medianDuration")
+        or THROUGHPUT_DEFAULT_DURATION
+    )
+
+
+def _expected_service_seconds(task: Dict[str, Any]) -> float:
+    factor = throughput_model.get("factor", THROUGHPUT_DEFAULT_FACTOR)
+    return throughput_model.get("overhead", 0.0) + factor * _expected_duration(task)
+
+
+def _worker_slots() -> int:
+    """Tasks that can run at once: the local worker plus remote workers holding leases; caller holds `lock`."""
+    local = 1 if LOCAL_WORKER and ROLE != "worker" else 0
+    return max(1, local + len({lease["workerId"] for lease in leases.values()}))
+
+
+def _estimate_etas() -> Dict[str, float]:
+    """Seconds until each running or queued task should finish; caller holds `lock`."""
+    now = time.time()
+    lease_started = {lease["taskId"]: lease["grantedAt"] for lease in leases.values()}
+    etas: Dict[str, float] = {}
+    busy: List[float] = []
+    for task_id, task in tasks.items():
+        if task["status"] not in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING):
+            continue
+        timeline = task_timelines.get(task_id)
+        started = timeline.started_at if timeline else lease_started.get(task_id, task["updatedAt"])
+        expected = _expected_service_seconds(task)
+        # A task running past its estimate is assumed to be nearly done rather than finished
+        remaining = max(expected - (now - started), expected * 0.05)
+        etas[task_id] = remaining
+        busy.append(remaining)
+    slots = sorted(busy)[: _worker_slots()]
+    slots += [0.0] * (_worker_slots() - len(slots))
+    for task_id in queue:
+        task = tasks.get(task_id)
+        if not task:
+            continue
+        index = min(range(len(slots)), key=slots.__getitem__)
+        slots[index] += _expected_service_seconds(task)
+        etas[task_id] = slots[index]
+    return etas
+
+
+def _admission_retry_after(new_tasks: List[Dict[str, Any]]) -> Optional[int]:
+    """Seconds until the queue has room for the new tasks, or None when they fit now; caller holds `lock`."""
+    if MAX_QUEUED_SECONDS <= 0 or (not queue and len(new_tasks) == 1):
+        return None
+    queued_seconds = sum(_expected_duration(tasks[task_id]) for task_id in queue if task_id in tasks)
+    excess = queued_seconds + sum(_expected_duration(task) for task in new_tasks) - MAX_QUEUED_SECONDS
+    if excess <= 0:
+        return None
+    factor = throughput_model.get("factor", THROUGHPUT_DEFAULT_FACTOR)
+    return int(min(3600, max(10, excess * factor / _worker_slots())))
+
+
+def _probe_duration(url: str, cookiefile: Optional[str]) -> Optional[float]:
+    if PIPELINE_MODE == "fake":
+        return FAKE_AUDIO_SECONDS
+    import yt_dlp
+
+    opts: Dict[str, Any] = {"quiet": True, "no_warnings": True, "noplaylist": True, "socket_timeout": 15}
+    if cookiefile and os.path.exists(cookiefile):
+        opts["cookiefile"] = cookiefile
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+    duration = (info or {}).get("duration")
+    return float(duration) if duration else None
+
+
+def _duration_probe_loop() -> None:
+    while True:
+        task_id = probe_queue.get()
+        with lock:
+            task = dict(tasks.get(task_id) or {})
+        if task.get("status") != TASK_STATUS_QUEUED or task.get("probedDuration"):
+            continue
+        start = time.monotonic()
+        try:
+            duration = _probe_duration(task["url"], task.get("cookiefilePath"))
+        except Exception as exc:
+            _log(f"DURATION_PROBE failed task={task_id} error={exc}", level="debug")
+            continue
+        if duration:
+            _update_task(task_id, probedDuration=duration)
+        _log(f"DURATION_PROBE task={task_id} duration={duration} elapsed={time.monotonic() - start:.2f}s")
+
+
 def _touch_activity() -> None:
     global last_activity
     last_activity = time.time()
@@ -692,10 +2550,95 @@ def _update_task(task_id: str, **updates: Any) -> None:
                     updates.pop(key, None)
             if not updates:
                 return
+        previous_status = task.get("status")
         task.update(updates)
         task["updatedAt"] = time.time()
         _db_upsert_task(task)
         _touch_activity()
+        if task["status"] != previous_status and task["status"] in TERMINAL_STATUSES:
+            METRIC_TASKS.inc(status=task["status"])
+            _task_finished_locked(task)
+
+
+def _task_finished_locked(task: Dict[str, Any]) -> None:
+    """Wake /wait requests and queue the webhook for a task that just finished; caller holds `lock`."""
+    for loop, future in terminal_waiters.pop(task["id"], []):
+        loop.call_soon_threadsafe(_resolve_waiter, future)
+    if task.get("callbackUrl"):
+        _queue_webhook(
+            {
+                "id": uuid.uuid4().hex,
+                "url": task["callbackUrl"],
+                "event": f"task.{task['status']}",
+                "task": _task_public_view(task, {}),
+                "attempt": 0,
+            },
+            time.time(),
+        )
+
+
+def _resolve_waiter(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _queue_webhook(delivery: Dict[str, Any], due: float) -> None:
+    global webhook_sequence
+    with webhook_condition:
+        webhook_sequence += 1
+        heapq.heappush(webhook_pending, (due, webhook_sequence, delivery))
+        webhook_condition.notify()
+
+
+def _send_webhook(delivery: Dict[str, Any]) -> Tuple[bool, bool, str]:
+    """POST one delivery; returns (delivered, retryable, detail)."""
+    body = json.dumps(
+        {"event": delivery["event"], "deliveryId": delivery["id"], "sentAt": time.time(), "task": delivery["task"]},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "X-Transcriber-Event": delivery["event"],
+        "X-Transcriber-Delivery": delivery["id"],
+    }
+    # A dedicated secret, so receivers can verify the sender without holding the API token
+    if WEBHOOK_SECRET:
+        signature = hmac.new(WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Transcriber-Signature"] = f"sha256={signature}"
+    request = urllib.request.Request(delivery["url"], data=body, method="POST", headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+            response.read()
+            return True, False, str(response.status)
+    except urllib.error.HTTPError as exc:
+        return False, exc.code >= 500 or exc.code in (408, 429), str(exc.code)
+    except (OSError, ValueError) as exc:
+        return False, True, str(exc)
+
+
+def _webhook_delivery_loop() -> None:
+    while True:
+        with webhook_condition:
+            while not webhook_pending or webhook_pending[0][0] > time.time():
+                timeout = webhook_pending[0][0] - time.time() if webhook_pending else None
+                webhook_condition.wait(timeout)
+            _, _, delivery = heapq.heappop(webhook_pending)
+        delivery["attempt"] += 1
+        start = time.monotonic()
+        delivered, retryable, detail = _send_webhook(delivery)
+        task_id = delivery["task"]["id"]
+        _log(
+            f"WEBHOOK task={task_id} event={delivery['event']} attempt={delivery['attempt']} "
+            f"delivered={int(delivered)} result={detail} elapsed={time.monotonic() - start:.2f}s",
+            level="info" if delivered else "warning",
+        )
+        if delivered:
+            continue
+        if retryable and delivery["attempt"] < WEBHOOK_MAX_ATTEMPTS:
+            delay = min(1800.0, WEBHOOK_RETRY_SECONDS * 4 ** (delivery["attempt"] - 1))
+            _queue_webhook(delivery, time.time() + delay)
+        else:
+            _log(f"WEBHOOK_DROPPED task={task_id} event={delivery['event']} result={detail}", level="error")
 
 
 def _mark_canceled(task_id: str) -> None:
@@ -706,23 +2649,61 @@ def _mark_canceled(task_id: str) -> None:
         errorMessage=None,
         downloadProgress=0,
         transcribeProgress=0,
+        draftPath=None,
     )
+    _remove_file(_draft_path(task_id))
 
 
 def _clear_task_files(task: Dict[str, Any]) -> None:
-    for key in ("audioPath", "resultPath", "cookiefilePath"):
-        path = task.get(key)
-        if not path:
-            continue
-        try:
-            Path(path).unlink(missing_ok=True)
-        except OSError:
-            pass
+    _remove_task_files([task])
+    _db_clear_segments(task["id"])
+
+
+def _release_cookiefiles(paths: Set[str], exclude: Set[str]) -> None:
+    """Remove cookie files that no unfinished task outside `exclude` still downloads with."""
+    if not paths:
+        return
+    with lock:
+        in_use = {
+            task.get("cookiefilePath")
+            for task in tasks.values()
+            if task["id"] not in exclude and task["status"] not in (TASK_STATUS_DONE, TASK_STATUS_CANCELED)
+        }
+    for path in paths - in_use:
+        _remove_file(Path(path))
+
+
+def _remove_task_files(items: List[Dict[str, Any]]) -> None:
+    cookiefiles = set()
+    for task in items:
+        for key in ("audioPath", "resultPath", "draftPath"):
+            path = task.get(key)
+            if not path:
+                continue
+            try:
+                Path(path).unlink(missing_ok=True)
+            except OSError:
+                pass
+        if task.get("cookiefilePath"):
+            cookiefiles.add(task["cookiefilePath"])
+    # Tasks of a bulk batch share a cookie file; it goes with the last task that needs it
+    _release_cookiefiles(cookiefiles, {task["id"] for task in items})
+    # Partial downloads and fragment state ({task_id}.*.part, .ytdl, -Frag files), in one directory pass
+    task_ids = {task["id"] for task in items}
+    for leftover in TEMP_DIR.iterdir():
+        if leftover.name.split(".", 1)[0] in task_ids:
+            try:
+                leftover.unlink(missing_ok=True)
+            except OSError:
+                pass
 
 
 def _enqueue(task_id: str) -> None:
     with condition:
         queue.append(task_id)
+        task = tasks.get(task_id)
+        if task:
+            task["queuedAt"] = time.time()
         _touch_activity()
         condition.notify()
 
@@ -734,10 +2715,17 @@ def _is_cancelled(task_id: str) -> bool:
 
 
 def _resolve_audio_path(task_id: str, prepared_filename: str) -> Path:
-    mp3_path = Path(prepared_filename).with_suffix(".mp3")
+    prepared_path = Path(prepared_filename)
+    if prepared_path.is_file():
+        return prepared_path
+    mp3_path = prepared_path.with_suffix(".mp3")
     if mp3_path.exists():
         return mp3_path
-    candidates = list(TEMP_DIR.glob(f"{task_id}.*"))
+    candidates = [
+        candidate
+        for candidate in TEMP_DIR.glob(f"{task_id}.*")
+        if candidate.suffix not in (".part", ".ytdl", ".pcm", ".txt") and "-Frag" not in candidate.name
+    ]
     if candidates:
         return candidates[0]
     raise RuntimeError("音频文件未生成")
@@ -820,20 +2808,17 @@ def _run_yt_dlp(url: str, ydl_opts: Dict[str, Any], task_id: str) -> Path:
         # Custom logger to force-write to service.log
         class MyLogger:
             def debug(self, msg):
-                # if not msg.startswith('[debug] '):
-                #     _log(f"YTDLP_DBG: {msg}")
-                # else:
-                #     _log(f"{msg}")  # Already prefixed
-                pass
+                if LOG_LEVEL <= LOG_LEVELS["debug"]:
+                    _log(f"YTDLP_DBG: {msg}", level="debug")
 
             def info(self, msg):
                 _log(f"YTDLP_INF: {msg}")
 
             def warning(self, msg):
-                _log(f"YTDLP_WRN: {msg}")
+                _log(f"YTDLP_WRN: {msg}", level="warning")
 
             def error(self, msg):
-                _log(f"YTDLP_ERR: {msg}")
+                _log(f"YTDLP_ERR: {msg}", level="error")
 
         # Enable verbose logging and attach custom logger
         # ydl_opts["verbose"] = True  # Disabled to reduce log noise
@@ -875,7 +2860,10 @@ def _run_yt_dlp(url: str, ydl_opts: Dict[str, Any], task_id: str) -> Path:
         # _log(f"DEBUG: Final ydl_opts['ffmpeg_location'] = {ydl_opts.get('ffmpeg_location')}")
                 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+            with _timed_stage(task_id, "metadata"):
+                info = ydl.extract_info(url, download=False)
+            with _timed_stage(task_id, "download"):
+                info = ydl.process_ie_result(info, download=True)
             prepared_filename = ydl.prepare_filename(info)
             return _resolve_audio_path(task_id, prepared_filename)
     finally:
@@ -899,20 +2887,30 @@ def _download_audio(task_id: str, url: str, cookiefile: Optional[str]) -> Path:
                 _update_task(task_id, downloadProgress=progress)
         elif data.get("status") == "finished":
             _update_task(task_id, downloadProgress=100)
+            downloaded = data.get("total_bytes") or data.get("downloaded_bytes") or 0
+            elapsed = data.get("elapsed") or 0
+            _record_stage(
+                task_id,
+                "download",
+                0,
+                bytes=downloaded,
+                bytesPerSecond=round(downloaded / elapsed) if elapsed else None,
+            )
 
     base_opts = {
         "format": "bestaudio/best",
         "outtmpl": outtmpl,
         "quiet": True,
         "noplaylist": True,
+        # Keep .part files and fragment state so interrupted downloads resume
+        "continuedl": True,
+        "nopart": False,
+        "concurrent_fragment_downloads": CONCURRENT_FRAGMENTS,
+        "socket_timeout": 30,
         "progress_hooks": [progress_hook],
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
+        # The source audio is decoded directly (and cancellably) by _decode_to_pcm, so
+        # no ffmpeg re-encode or container fixup runs after the download
+        "fixup": "never",
     }
 
     # Configure Node.js runtime for n-signature solving if available
@@ -925,64 +2923,897 @@ def _download_audio(task_id: str, url: str, cookiefile: Optional[str]) -> Path:
         # No Node.js available, rely on mobile clients as fallback
         _log(f"YTDLP: No node runtime found, using mobile clients only")
 
-    has_cookiefile = cookiefile and os.path.exists(cookiefile)
-
-    # Strategy 1: Try with cookies if available
-    if has_cookiefile:
-        try:
-            opts = base_opts.copy()
-            opts["cookiefile"] = cookiefile
-            # Prefer mobile clients even with cookies to avoid n-signature issues
-            # They work well for most videos and don't require EJS
-            opts["extractor_args"] = {
-                "youtube": {
-                    "player_client": ["android", "ios", "web"],
-                }
-            }
-            _log(f"YTDLP: Trying with cookies + mobile clients for task={task_id}")
-            return _run_yt_dlp(url, opts, task_id)
-        except Exception as exc1:
-            _log(f"YTDLP: Failed with cookies ({exc1}), retrying without cookies")
-            # Fall through to strategy 2
+    has_cookiefile = bool(cookiefile and os.path.exists(cookiefile))
+    site = _strategy_site_key(url)
+    strategies = _order_download_strategies(site, has_cookiefile)
+    _log(
+        f"YTDLP: Strategy order for task={task_id} site={site}: "
+        + ",".join(strategy["name"] for strategy in strategies)
+    )
 
-    # Strategy 2: Use mobile clients without cookies (most reliable)
-    try:
+    last_error: Optional[Exception] = None
+    for strategy in strategies:
         opts = base_opts.copy()
+        if strategy["cookies"]:
+            opts["cookiefile"] = cookiefile
         opts["extractor_args"] = {
             "youtube": {
-                "player_client": ["android", "ios"],
+                "player_client": list(strategy["player_client"]),
             }
         }
-        _log(f"YTDLP: Using android/ios clients without cookies for task={task_id}")
-        return _run_yt_dlp(url, opts, task_id)
-    except Exception as exc2:
-        raise RuntimeError(f"下载音频失败: {exc2}")
-
+        _log(f"YTDLP: Trying strategy={strategy['name']} for task={task_id}")
+        attempt_start = time.monotonic()
+        try:
+            audio_path = _run_yt_dlp(url, opts, task_id)
+        except Exception as exc:
+            elapsed = time.monotonic() - attempt_start
+            if isinstance(exc, TaskCancelled) or _is_cancelled(task_id):
+                raise TaskCancelled("download canceled")
+            _record_download_attempt(task_id, site, strategy["name"], False, elapsed, str(exc))
+            _log(f"YTDLP: Strategy {strategy['name']} failed after {elapsed:.2f}s ({exc})", level="warning")
+            last_error = exc
+            continue
+        elapsed = time.monotonic() - attempt_start
+        _record_download_attempt(task_id, site, strategy["name"], True, elapsed)
+        return audio_path
+
+    raise RuntimeError(f"下载音频失败: {last_error}")
+
+
+DOWNLOAD_STRATEGIES: List[Dict[str, Any]] = [
+    # Prefer mobile clients even with cookies to avoid n-signature issues
+    # They work well for most videos and don't require EJS
+    {"name": "cookies_mobile_web", "cookies": True, "player_client": ["android", "ios", "web"]},
+    # Mobile clients without cookies (most reliable)
+    {"name": "mobile", "cookies": False, "player_client": ["android", "ios"]},
+]
+
+SITE_KEY_ALIASES = {
+    "youtu.be": "youtube.com",
+    "b23.tv": "bilibili.com",
+}
+# Public suffixes of two labels; a site under one of them is keyed by three labels (bbc.co.uk, not co.uk)
+MULTI_PART_SUFFIXES = frozenset(
+    {
+        "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk",
+        "com.cn", "net.cn", "org.cn", "gov.cn", "edu.cn",
+        "com.hk", "org.hk", "com.tw", "org.tw", "com.sg", "com.my",
+        "co.jp", "ne.jp", "or.jp", "ac.jp", "co.kr", "or.kr",
+        "com.au", "net.au", "org.au", "co.nz", "co.in", "co.id",
+        "com.br", "com.mx", "com.ar", "com.tr", "co.za",
+    }
+)
 
-def _transcribe_audio(task_id: str, audio_path: Path) -> str:
-    if not model_ready:
-        _log(f"MODEL_LOAD_PENDING task={task_id}")
-    model = _get_whisper_model()
-    segments, info = model.transcribe(str(audio_path), language="zh")
-    total_duration = getattr(info, "duration", None) or 0
-    parts = []
-    for segment in segments:
-        if _is_cancelled(task_id):
-            raise TaskCancelled("transcribe canceled")
-        parts.append(segment.text)
-        if total_duration:
-            progress = min(100, int(segment.end / total_duration * 100))
-            _update_task(task_id, transcribeProgress=progress)
-    _update_task(task_id, transcribeProgress=100)
-    text = "".join(parts).strip()
-    return _to_simplified(text)
 
+def _strategy_site_key(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    if host in SITE_KEY_ALIASES:
+        return SITE_KEY_ALIASES[host]
+    labels = [label for label in host.split(".") if label]
+    keep = 3 if ".".join(labels[-2:]) in MULTI_PART_SUFFIXES else 2
+    if len(labels) > keep:
+        labels = labels[-keep:]
+    site = ".".join(labels) or "unknown"
+    return SITE_KEY_ALIASES.get(site, site)
 
-def _process_task(task_id: str) -> None:
-    with lock:
-        task = tasks.get(task_id)
-    if not task:
-        return
+
+def _load_strategy_stats() -> None:
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute("SELECT * FROM download_strategy_stats").fetchall()
+    with strategy_lock:
+        strategy_stats.clear()
+        for row in rows:
+            strategy_stats[(row["site"], row["strategy"])] = {
+                "successes": row["successes"],
+                "failures": row["failures"],
+                "consecutiveFailures": row["consecutive_failures"],
+                "avgSeconds": row["avg_seconds"],
+                "lastSuccessAt": row["last_success_at"],
+                "lastFailureAt": row["last_failure_at"],
+            }
+    _log(f"STRATEGY_STATS_LOAD count={len(rows)}")
+
+
+def _strategy_is_cooling_down(stats: Optional[Dict[str, Any]], now: float) -> bool:
+    if not stats or STRATEGY_SKIP_FAILURES <= 0:
+        return False
+    if stats["consecutiveFailures"] < STRATEGY_SKIP_FAILURES:
+        return False
+    return now - (stats["lastFailureAt"] or 0) < STRATEGY_COOLDOWN_SECONDS
+
+
+def _order_download_strategies(site: str, has_cookiefile: bool) -> List[Dict[str, Any]]:
+    candidates = [
+        strategy for strategy in DOWNLOAD_STRATEGIES if has_cookiefile or not strategy["cookies"]
+    ]
+    now = time.time()
+    with strategy_lock:
+        snapshot = {
+            strategy["name"]: dict(strategy_stats[(site, strategy["name"])])
+            for strategy in candidates
+            if (site, strategy["name"]) in strategy_stats
+        }
+
+    def sort_key(item: Tuple[int, Dict[str, Any]]) -> Tuple[float, float, int]:
+        index, strategy = item
+        stats = snapshot.get(strategy["name"])
+        if not stats:
+            # Untried strategies keep their default position with a neutral score
+            return (-0.5, 0.0, index)
+        attempts = stats["successes"] + stats["failures"]
+        # Laplace-smoothed success rate, rounded so small differences fall back to latency
+        success_rate = round((stats["successes"] + 1) / (attempts + 2), 1)
+        return (-success_rate, stats["avgSeconds"] or 0.0, index)
+
+    ordered = [strategy for _, strategy in sorted(enumerate(candidates), key=sort_key)]
+    active = [s for s in ordered if not _strategy_is_cooling_down(snapshot.get(s["name"]), now)]
+    if not active:
+        # Everything is failing recently; still try them rather than give up outright
+        return ordered
+    skipped = [s["name"] for s in ordered if s not in active]
+    if skipped:
+        _log(f"YTDLP: Skipping recently failing strategies site={site} skipped={','.join(skipped)}")
+    return active
+
+
+def _record_download_attempt(
+    task_id: str,
+    site: str,
+    strategy: str,
+    ok: bool,
+    elapsed: float,
+    error: Optional[str] = None,
+) -> None:
+    now = time.time()
+    with strategy_lock:
+        stats = strategy_stats.setdefault(
+            (site, strategy),
+            {
+                "successes": 0,
+                "failures": 0,
+                "consecutiveFailures": 0,
+                "avgSeconds": None,
+                "lastSuccessAt": None,
+                "lastFailureAt": None,
+            },
+        )
+        if ok:
+            stats["successes"] += 1
+            stats["consecutiveFailures"] = 0
+            stats["lastSuccessAt"] = now
+            # Exponential moving average of successful attempt latency
+            previous = stats["avgSeconds"]
+            stats["avgSeconds"] = elapsed if previous is None else previous * 0.7 + elapsed * 0.3
+        else:
+            stats["failures"] += 1
+            stats["consecutiveFailures"] += 1
+            stats["lastFailureAt"] = now
+        row = dict(stats)
+    try:
+        with db_lock, _db_connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO download_strategy_stats (
+                    site,
+                    strategy,
+                    successes,
+                    failures,
+                    consecutive_failures,
+                    avg_seconds,
+                    last_success_at,
+                    last_failure_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    site,
+                    strategy,
+                    row["successes"],
+                    row["failures"],
+                    row["consecutiveFailures"],
+                    row["avgSeconds"],
+                    row["lastSuccessAt"],
+                    row["lastFailureAt"],
+                ),
+            )
+            conn.commit()
+    except sqlite3.Error as exc:
+        _log(f"STRATEGY_STATS_WRITE failed error={exc}", level="warning")
+
+    attempt = {"strategy": strategy, "ok": ok, "seconds": round(elapsed, 3)}
+    if error:
+        attempt["error"] = error[:200]
+    with lock:
+        task = tasks.get(task_id)
+        attempts = list(task.get("downloadAttempts") or []) if task else []
+    attempts.append(attempt)
+    _update_task(task_id, downloadAttempts=attempts)
+    _log(
+        f"DOWNLOAD_STRATEGY task={task_id} site={site} strategy={strategy} "
+        f"ok={int(ok)} elapsed={elapsed:.2f}s"
+    )
+
+
+PCM_SAMPLE_RATE = 16000
+PCM_BYTES_PER_SAMPLE = 2
+
+
+def _decode_options(profile: Optional[str]) -> Dict[str, Any]:
+    options = dict(DECODE_PROFILES.get(profile or DEFAULT_DECODE_PROFILE, DECODE_PROFILES["accurate"]))
+    options.update(DECODE_OVERRIDES)
+    return options
+
+
+def _pcm_path(task_id: str) -> Path:
+    return TEMP_DIR / f"{task_id}.pcm"
+
+
+def _decode_to_pcm(task_id: str, audio_path: Path) -> Path:
+    """Stream-decode audio to a 16 kHz mono s16le file without holding it in memory."""
+    import av
+
+    pcm_path = _pcm_path(task_id)
+    if pcm_path.is_file():
+        return pcm_path
+    partial_path = pcm_path.with_suffix(".pcm.part")
+    start = time.monotonic()
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=PCM_SAMPLE_RATE)
+    with av.open(str(audio_path), mode="r", metadata_errors="ignore") as container:
+        if not container.streams.audio:
+            raise RuntimeError("音频流不存在")
+        with partial_path.open("wb") as handle:
+            # Decode packet by packet so a damaged packet is skipped instead of ending the stream
+            skipped = 0
+            for index, packet in enumerate(container.demux(container.streams.audio[0])):
+                try:
+                    frames = packet.decode()
+                except av.error.InvalidDataError:
+                    skipped += 1
+                    continue
+                for frame in frames:
+                    frame.pts = None  # Ignore timestamp gaps in damaged streams
+                    for resampled in resampler.resample(frame):
+                        handle.write(resampled.to_ndarray().tobytes())
+                if index % 500 == 499 and _is_cancelled(task_id):
+                    raise TaskCancelled("decode canceled")
+            for resampled in resampler.resample(None):
+                handle.write(resampled.to_ndarray().tobytes())
+    partial_path.replace(pcm_path)
+    size = pcm_path.stat().st_size
+    _log(
+        f"PCM_DECODE task={task_id} seconds={size / PCM_BYTES_PER_SAMPLE / PCM_SAMPLE_RATE:.1f} "
+        f"elapsed={time.monotonic() - start:.2f}s skipped_packets={skipped}",
+        level="warning" if skipped else "info",
+    )
+    return pcm_path
+
+
+def _read_pcm_window(pcm_path: Path, start: float, end: float):
+    import numpy as np
+
+    first = int(start * PCM_SAMPLE_RATE)
+    count = max(0, int(end * PCM_SAMPLE_RATE) - first)
+    with pcm_path.open("rb") as handle:
+        handle.seek(first * PCM_BYTES_PER_SAMPLE)
+        samples = np.fromfile(handle, dtype=np.int16, count=count)
+    return samples.astype(np.float32) / 32768.0
+
+
+# Fingerprint frames: 256 ms windows every 64 ms on audio halved to 8 kHz, 33 bands of 300-2000 Hz
+FINGERPRINT_RATE = PCM_SAMPLE_RATE // 2
+FINGERPRINT_FRAME = 2048
+FINGERPRINT_HOP = 512
+FINGERPRINT_BLOCK_FRAMES = 4096
+# Frames quieter than this RMS carry no usable bits; clips with too few loud frames never match
+FINGERPRINT_MIN_RMS = 0.003
+FINGERPRINT_MIN_FRAMES = 150
+
+
+def _fingerprint_bands():
+    import numpy as np
+
+    edges_hz = np.geomspace(300, 2000, 34)
+    return np.round(edges_hz * FINGERPRINT_FRAME / FINGERPRINT_RATE).astype(np.int64)
+
+
+def _compute_fingerprint(task_id: str, pcm_path: Path):
+    """32-bit band-energy-difference code per frame (Haitsma-Kalker style) plus a loudness mask."""
+    import numpy as np
+
+    edges = _fingerprint_bands()
+    window = np.hanning(FINGERPRINT_FRAME).astype(np.float32)
+    block_samples = ((FINGERPRINT_BLOCK_FRAMES - 1) * FINGERPRINT_HOP + FINGERPRINT_FRAME) * 2
+    step_bytes = FINGERPRINT_BLOCK_FRAMES * FINGERPRINT_HOP * 2 * PCM_BYTES_PER_SAMPLE
+    codes: List[Any] = []
+    active: List[Any] = []
+    previous = None
+    offset = 0
+    with pcm_path.open("rb") as handle:
+        while True:
+            if _is_cancelled(task_id):
+                raise TaskCancelled("fingerprint canceled")
+            handle.seek(offset)
+            samples = np.fromfile(handle, dtype=np.int16, count=block_samples)
+            offset += step_bytes
+            usable = samples.size // 2 * 2
+            if usable < FINGERPRINT_FRAME * 2:
+                break
+            audio = samples[:usable].astype(np.float32).reshape(-1, 2).mean(axis=1) / 32768.0
+            frames = np.lib.stride_tricks.sliding_window_view(audio, FINGERPRINT_FRAME)[::FINGERPRINT_HOP]
+            power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2
+            energy = np.add.reduceat(power[:, edges[0]:edges[-1]], edges[:-1] - edges[0], axis=1)
+            band_diff = energy[:, :-1] - energy[:, 1:]
+            if previous is None:
+                previous = band_diff[:1]
+            bits = (band_diff - np.vstack([previous, band_diff[:-1]])) > 0
+            previous = band_diff[-1:]
+            codes.append(np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel())
+            active.append(np.sqrt(np.mean(frames * frames, axis=1)) >= FINGERPRINT_MIN_RMS)
+            if samples.size < block_samples:
+                break
+    if not codes:
+        return np.zeros(0, dtype="<u4"), np.zeros(0, dtype=bool)
+    return np.concatenate(codes), np.concatenate(active)
+
+
+def _fingerprint_similarity(codes_a, active_a, codes_b, active_b) -> float:
+    """Best 1 - bit error rate over start offsets within DEDUP_MAX_SHIFT_SECONDS."""
+    import numpy as np
+
+    popcount = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+    max_shift = int(DEDUP_MAX_SHIFT_SECONDS * FINGERPRINT_RATE / FINGERPRINT_HOP)
+    best = 0.0
+    for shift in range(-max_shift, max_shift + 1):
+        a_start, b_start = max(0, shift), max(0, -shift)
+        length = min(codes_a.size - a_start, codes_b.size - b_start)
+        if length < FINGERPRINT_MIN_FRAMES:
+            continue
+        mask = active_a[a_start:a_start + length] & active_b[b_start:b_start + length]
+        # Silence or clips much shorter than the other never count as the same recording
+        if mask.sum() < max(FINGERPRINT_MIN_FRAMES, 0.5 * max(codes_a.size, codes_b.size)):
+            continue
+        xor = codes_a[a_start:a_start + length][mask] ^ codes_b[b_start:b_start + length][mask]
+        errors = popcount[xor.view(np.uint8)].sum()
+        best = max(best, 1.0 - errors / (xor.size * 32))
+    return best
+
+
+def _db_store_fingerprint(task_id: str, duration: float, codes, active, profile: str) -> None:
+    import numpy as np
+
+    # model_size stays NULL until the transcript exists; see _db_set_fingerprint_model
+    with db_lock, _db_connect() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO audio_fingerprints
+                (task_id, duration, frames, codes, active, created_at, model_size, decode_profile)
+            VALUES (?, ?, ?, ?, ?, ?, NULL, ?)
+            """,
+            (
+                task_id,
+                duration,
+                int(codes.size),
+                codes.tobytes(),
+                np.packbits(active).tobytes(),
+                time.time(),
+                profile,
+            ),
+        )
+        conn.commit()
+
+
+def _db_set_fingerprint_model(task_id: str, model_size: Optional[str]) -> None:
+    with db_lock, _db_connect() as conn:
+        conn.execute("UPDATE audio_fingerprints SET model_size = ? WHERE task_id = ?", (model_size, task_id))
+        conn.commit()
+
+
+def _find_duplicate(task_id: str, pcm_path: Path, duration: float, profile: str) -> Optional[Tuple[str, float]]:
+    """Fingerprint the decoded audio and look for a finished task with the same recording.
+
+    Only transcripts made with the loaded model's size and the requested profile qualify.
+    """
+    import numpy as np
+
+    codes, active = _compute_fingerprint(task_id, pcm_path)
+    _db_store_fingerprint(task_id, duration, codes, active, profile)
+    # The loaded model transcribes this task; MODEL_SIZE may already name a pending rebuild
+    with model_lock:
+        model_size = model_config.get("modelSize") or MODEL_SIZE
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute(
+            """
+            SELECT task_id, frames, codes, active FROM audio_fingerprints
+            WHERE task_id != ? AND duration BETWEEN ? AND ? AND model_size = ? AND decode_profile = ?
+            """,
+            (
+                task_id,
+                duration - DEDUP_MAX_SHIFT_SECONDS,
+                duration + DEDUP_MAX_SHIFT_SECONDS,
+                model_size,
+                profile,
+            ),
+        ).fetchall()
+    with lock:
+        done = {
+            row["task_id"]
+            for row in rows
+            if (tasks.get(row["task_id"]) or {}).get("status") == TASK_STATUS_DONE
+        }
+    best: Optional[Tuple[str, float]] = None
+    for row in rows:
+        if row["task_id"] not in done:
+            continue
+        other_codes = np.frombuffer(row["codes"], dtype="<u4")
+        other_active = np.unpackbits(np.frombuffer(row["active"], dtype=np.uint8))[: row["frames"]].astype(bool)
+        similarity = _fingerprint_similarity(codes, active, other_codes, other_active)
+        if similarity >= DEDUP_THRESHOLD and (best is None or similarity > best[1]):
+            best = (row["task_id"], round(similarity, 4))
+    return best
+
+
+def _reuse_transcript(task_id: str, source_id: str, similarity: float, duration: float) -> Optional[str]:
+    with lock:
+        source = dict(tasks.get(source_id) or {})
+    text = None
+    result_path = source.get("resultPath")
+    if result_path and _ensure_result_file(source_id, result_path):
+        text = Path(result_path).read_text(encoding="utf-8")
+    if text is None:
+        return None
+    with db_lock, _db_connect() as conn:
+        conn.execute("DELETE FROM transcript_segments WHERE task_id = ?", (task_id,))
+        conn.execute(
+            """
+            INSERT INTO transcript_segments (task_id, seq, start, end, text)
+            SELECT ?, seq, start, end, text FROM transcript_segments WHERE task_id = ?
+            """,
+            (task_id, source_id),
+        )
+        # The reused transcript came from the source's model
+        conn.execute(
+            """
+            UPDATE audio_fingerprints
+            SET model_size = (SELECT model_size FROM audio_fingerprints WHERE task_id = ?)
+            WHERE task_id = ?
+            """,
+            (source_id, task_id),
+        )
+        conn.commit()
+    timeline = task_timelines.get(task_id)
+    if timeline:
+        timeline.audio_duration = duration
+        timeline.transcribed_seconds = 0.0
+    _update_task(
+        task_id,
+        transcribeProgress=100,
+        dedupOf=source_id,
+        dedupSimilarity=similarity,
+        loopGuard=source.get("loopGuard"),
+    )
+    return text
+
+
+class _LoopGuard:
+    """Spots Whisper repetition loops in the segment stream."""
+
+    def __init__(self) -> None:
+        self.last_text = ""
+        self.repeats = 0
+        self.recent: deque = deque(maxlen=5)
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return "".join(char for char in text.lower() if char.isalnum())
+
+    @staticmethod
+    def _ngram_coverage(text: str, size: int) -> float:
+        if len(text) < size * 6:
+            return 0.0
+        counts: Dict[str, int] = {}
+        for index in range(len(text) - size + 1):
+            gram = text[index:index + size]
+            counts[gram] = counts.get(gram, 0) + 1
+        return max(counts.values()) * size / len(text)
+
+    def reset(self) -> None:
+        self.last_text = ""
+        self.repeats = 0
+        self.recent.clear()
+
+    def check(self, text: str, compression_ratio: Optional[float]) -> Tuple[bool, Optional[str]]:
+        """Returns (keep, loop_reason); repeats are dropped and a reason means a loop was found."""
+        normalized = self._normalize(text)
+        if compression_ratio and compression_ratio > LOOP_COMPRESSION_LIMIT:
+            return False, f"compression_ratio={compression_ratio:.2f}"
+        if self._ngram_coverage(normalized, 4) >= 0.6:
+            return False, "repeated_ngram"
+        if normalized and normalized == self.last_text:
+            self.repeats += 1
+            if self.repeats >= LOOP_REPEAT_LIMIT:
+                return False, f"repeated_segment x{self.repeats + 1}"
+            # The first repeat may be genuine speech; later ones are dropped
+            return self.repeats == 1, None
+        self.last_text = normalized
+        self.repeats = 0
+        self.recent.append(normalized)
+        if self._ngram_coverage("".join(self.recent), 6) >= 0.7:
+            return False, "repeated_ngram_across_segments"
+        return True, None
+
+
+def _iter_pcm_segments(
+    task_id: str,
+    model: Any,
+    pcm_path: Path,
+    total_duration: float,
+    position: float,
+    options: Dict[str, Any],
+    parts: List[str],
+    loop_events: Optional[List[Dict[str, Any]]] = None,
+):
+    """Yields (start, end, text) over bounded windows; parts is read for the prompt of each window.
+
+    When the loop guard trips, the region is decoded once more with LOOP_RETRY_OPTIONS and no
+    prompt; if it loops again it is skipped. Actions are appended to loop_events.
+    """
+    guard = _LoopGuard()
+    redecode = False
+    while position < total_duration:
+        span = LOOP_REDECODE_SECONDS if redecode else DECODE_WINDOW_SECONDS
+        window_end = min(total_duration, position + span)
+        final_window = window_end >= total_duration
+        audio = _read_pcm_window(pcm_path, position, window_end)
+        if redecode:
+            window_options = dict(options, **LOOP_RETRY_OPTIONS)
+            prompt = None
+        else:
+            window_options = options
+            prompt = "".join(parts)[-CHECKPOINT_PROMPT_CHARS:] or None
+        segments, _ = model.transcribe(audio, language="zh", initial_prompt=prompt, **window_options)
+        accepted_end = position
+        dropped_from: Optional[float] = None
+        loop_at: Optional[Tuple[float, str]] = None
+        for segment in segments:
+            if _is_cancelled(task_id):
+                raise TaskCancelled("transcribe canceled")
+            start = position + segment.start
+            end = position + segment.end
+            if not final_window and end > window_end - DECODE_WINDOW_GUARD_SECONDS:
+                # Segment may be cut at the window edge; decode it again in the next window
+                break
+            keep, reason = guard.check(segment.text, getattr(segment, "compression_ratio", None))
+            if reason:
+                # Re-decode from the first dropped repeat so no real speech is lost
+                loop_at = (dropped_from if dropped_from is not None else max(start, accepted_end), reason)
+                break
+            if not keep:
+                if dropped_from is None:
+                    dropped_from = max(start, accepted_end)
+                continue
+            dropped_from = None
+            yield start, end, segment.text
+            accepted_end = end
+        del audio, segments
+        if loop_at is not None:
+            region_start, reason = loop_at
+            action = "skip" if redecode else "redecode"
+            event = {"action": action, "at": round(region_start, 2), "reason": reason}
+            if redecode:
+                event["resumeAt"] = round(min(total_duration, region_start + LOOP_SKIP_SECONDS), 2)
+                position = event["resumeAt"]
+            else:
+                position = region_start
+            redecode = not redecode
+            guard.reset()
+            METRIC_LOOP_GUARD.inc(action=action)
+            _log(f"LOOP_GUARD task={task_id} action={action} at={region_start:.2f}s reason={reason}")
+            if loop_events is not None:
+                loop_events.append(event)
+            continue
+        redecode = False
+        if final_window:
+            break
+        if accepted_end > position:
+            position = accepted_end
+        else:
+            position = window_end - DECODE_WINDOW_GUARD_SECONDS
+
+
+def _draft_path(task_id: str) -> Path:
+    return TEMP_DIR / f"{task_id}.draft.txt"
+
+
+def _write_draft(task_id: str, pcm_path: Path, total_duration: float) -> None:
+    """First pass with the small draft model; the result endpoint serves it until the final is ready."""
+    with _timed_stage(task_id, "draft_model_wait"):
+        model = _get_draft_model(task_id)
+    parts: List[str] = []
+    start = time.monotonic()
+    for _, _, text in _iter_pcm_segments(
+        task_id, model, pcm_path, total_duration, 0.0, _decode_options("fast"), parts
+    ):
+        parts.append(_to_simplified(text))
+    elapsed = time.monotonic() - start
+    rtf = round(elapsed / total_duration, 4) if total_duration else None
+    _record_stage(task_id, "draft_decode", elapsed, model=DRAFT_MODEL_SIZE, realtimeFactor=rtf)
+    draft_path = _draft_path(task_id)
+    draft_path.write_text("".join(parts).strip(), encoding="utf-8")
+    _update_task(task_id, draftPath=str(draft_path), draftAt=time.time())
+    _log(f"DRAFT_READY task={task_id} model={DRAFT_MODEL_SIZE} elapsed={elapsed:.2f}s rtf={rtf}")
+
+
+def _discard_draft(task_id: str) -> None:
+    """Drop the draft of a task that will not get a final transcript from this run."""
+    _update_task(task_id, draftPath=None)
+    _remove_file(_draft_path(task_id))
+
+
+def _transcribe_audio(task_id: str, audio_path: Path) -> str:
+    with _timed_stage(task_id, "postprocess"):
+        pcm_path = _decode_to_pcm(task_id, audio_path)
+    total_duration = pcm_path.stat().st_size / PCM_BYTES_PER_SAMPLE / PCM_SAMPLE_RATE
+
+    stored = [dict(row) for row in _db_load_segments(task_id)]
+    _update_task(task_id, dedupOf=None, dedupSimilarity=None)
+    with lock:
+        profile = (tasks.get(task_id) or {}).get("decodeProfile") or DEFAULT_DECODE_PROFILE
+    fingerprinted = DEDUP_ENABLED and ROLE != "worker" and not stored
+    if fingerprinted:
+        with _timed_stage(task_id, "fingerprint"):
+            duplicate = _find_duplicate(task_id, pcm_path, total_duration, profile)
+        text = _reuse_transcript(task_id, *duplicate, total_duration) if duplicate else None
+        METRIC_DEDUP.inc(outcome="reused" if text is not None else "miss")
+        if text is not None:
+            _log(f"DEDUP_REUSE task={task_id} source={duplicate[0]} similarity={duplicate[1]}")
+            return text
+    with lock:
+        task = dict(tasks.get(task_id) or {})
+    has_draft = bool(task.get("draftPath")) and Path(task["draftPath"]).is_file()
+    if task.get("twoPass") and DRAFT_MODEL_SIZE and not stored and not has_draft:
+        # The main model loads afterwards: loading it during the draft decode would split CPU_THREADS
+        draft_start = time.monotonic()
+        try:
+            _write_draft(task_id, pcm_path, total_duration)
+        except TaskCancelled:
+            raise
+        except Exception as exc:
+            # The draft is optional; fall back to the single final pass
+            _record_stage(task_id, "draft_failed", time.monotonic() - draft_start, error=str(exc)[:200])
+            _log(f"DRAFT_FAILED task={task_id} model={DRAFT_MODEL_SIZE} error={exc}", level="warning")
+
+    if not model_ready:
+        _log(f"MODEL_LOAD_PENDING task={task_id}")
+    with _timed_stage(task_id, "model_wait", warm=model_ready):
+        model = _get_whisper_model(task_id)
+    with model_lock:
+        # A rebuild may already have swapped in another model; then the size is unknown
+        model_size = model_config.get("modelSize") if whisper_model is model else None
+
+    for row in stored:
+        row["text"] = _to_simplified(row["text"])
+    parts = [row["text"] for row in stored]
+    seq = stored[-1]["seq"] + 1 if stored else 0
+    with checkpoint_lock:
+        live_segments[task_id] = list(stored)
+    position = 0.0
+    if stored:
+        # Seek past the checkpoint; the preceding text is passed to the model as context
+        position = stored[-1]["end"]
+        _log(f"TRANSCRIBE_RESUME task={task_id} from={position:.2f}s segments={len(stored)}")
+
+    resumed_from = position
+    options = _decode_options(profile)
+    opencc_seconds = 0.0
+    loop_events: List[Dict[str, Any]] = list(task.get("loopGuard") or []) if stored else []
+    decode_start = time.monotonic()
+    last_flush = time.monotonic()
+    try:
+        # Decode in bounded windows so memory does not grow with the input length
+        for start, end, raw_text in _iter_pcm_segments(
+            task_id, model, pcm_path, total_duration, position, options, parts, loop_events
+        ):
+            # Convert per segment so partial transcripts are already simplified Chinese
+            opencc_start = time.monotonic()
+            text = _to_simplified(raw_text)
+            opencc_seconds += time.monotonic() - opencc_start
+            parts.append(text)
+            _checkpoint_segment(task_id, seq, start, end, text)
+            seq += 1
+            if time.monotonic() - last_flush >= CHECKPOINT_SECONDS:
+                _flush_checkpoints(task_id)
+                last_flush = time.monotonic()
+            if total_duration:
+                progress = min(100, int(end / total_duration * 100))
+                _update_task(task_id, transcribeProgress=progress)
+    finally:
+        if _is_cancelled(task_id):
+            _db_clear_segments(task_id)
+        else:
+            _flush_checkpoints(task_id)
+            with checkpoint_lock:
+                live_segments.pop(task_id, None)
+    decode_seconds = time.monotonic() - decode_start - opencc_seconds
+    _record_stage(task_id, "decode", decode_seconds, windowSeconds=DECODE_WINDOW_SECONDS, profile=profile)
+    _record_stage(task_id, "opencc", opencc_seconds)
+    timeline = task_timelines.get(task_id)
+    if timeline:
+        timeline.audio_duration = total_duration
+        timeline.transcribed_seconds = max(0.0, total_duration - resumed_from)
+    _update_task(task_id, transcribeProgress=100, loopGuard=loop_events or None)
+    if fingerprinted:
+        _db_set_fingerprint_model(task_id, model_size)
+    return "".join(parts).strip()
+
+
+def _current_rss_bytes() -> Optional[int]:
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r", encoding="ascii") as handle:
+                return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.WorkingSetSize)
+        except Exception:
+            return None
+        return None
+    try:
+        import resource
+
+        # macOS has no cheap current-RSS call; ru_maxrss (bytes there) is the best available
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    except Exception:
+        return None
+
+
+class _TaskTimeline:
+    """Where one run of a task spent its time, stage by stage."""
+
+    def __init__(self, task_id: str, queued_at: Optional[float]) -> None:
+        self.task_id = task_id
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.audio_duration: Optional[float] = None
+        self.transcribed_seconds: Optional[float] = None
+        self.peak_rss_bytes: Optional[int] = None
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if queued_at:
+            self.add("queue_wait", max(0.0, self.started_at - queued_at))
+
+    def add(self, name: str, seconds: float, **extra: Any) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(name, {"name": name, "ms": 0.0, "count": 0})
+            if seconds:
+                stage["ms"] = round(stage["ms"] + seconds * 1000, 2)
+                stage["count"] += 1
+            stage.update(extra)
+
+    def realtime_factor(self) -> Optional[float]:
+        if not self.transcribed_seconds:
+            return None
+        with self._lock:
+            busy_ms = sum(self.stages.get(name, {}).get("ms", 0.0) for name in ("decode", "opencc"))
+        return round(busy_ms / 1000 / self.transcribed_seconds, 4)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = [dict(stage) for stage in self.stages.values()]
+        total_ms = round((time.monotonic() - self.started) * 1000, 2)
+        return {
+            "startedAt": self.started_at,
+            "totalMs": total_ms,
+            "stages": stages,
+            "audioDuration": self.audio_duration,
+            "transcribedSeconds": self.transcribed_seconds,
+            "realtimeFactor": self.realtime_factor(),
+            "endToEndFactor": round(total_ms / 1000 / self.audio_duration, 4)
+            if self.audio_duration
+            else None,
+            "peakRssBytes": self.peak_rss_bytes,
+        }
+
+
+def _record_stage(task_id: str, name: str, seconds: float, **extra: Any) -> None:
+    timeline = task_timelines.get(task_id)
+    if timeline is not None:
+        timeline.add(name, seconds, **extra)
+
+
+@contextmanager
+def _timed_stage(task_id: str, name: str, **extra: Any):
+    start = time.monotonic()
+    previous_stage = getattr(log_context, "stage", None)
+    log_context.stage = name
+    try:
+        yield
+    finally:
+        log_context.stage = previous_stage
+        _record_stage(task_id, name, time.monotonic() - start, **extra)
+
+
+def _finish_timeline(task_id: str, peak_rss_bytes: Optional[int]) -> None:
+    timeline = task_timelines.pop(task_id, None)
+    if timeline is None:
+        return
+    timeline.peak_rss_bytes = peak_rss_bytes
+    summary = timeline.to_dict()
+    for stage in summary["stages"]:
+        if stage["count"]:
+            METRIC_STAGE_SECONDS.observe(stage["ms"] / 1000, stage=stage["name"])
+        if stage["name"] == "queue_wait":
+            METRIC_QUEUE_WAIT.observe(stage["ms"] / 1000)
+    if summary["realtimeFactor"] is not None:
+        METRIC_REALTIME_FACTOR.observe(summary["realtimeFactor"])
+    _update_task(
+        task_id,
+        timeline=summary,
+        audioDuration=timeline.audio_duration,
+        realtimeFactor=summary["realtimeFactor"],
+    )
+    with lock:
+        task = dict(tasks.get(task_id) or {})
+    _learn_throughput(task)
+    stages = " ".join(f"{stage['name']}={stage['ms'] / 1000:.2f}s" for stage in summary["stages"])
+    _log(f"TASK_TIMING task={task_id} total={summary['totalMs'] / 1000:.2f}s rtf={summary['realtimeFactor']} {stages}")
+
+
+class _PeakRssSampler:
+    """Samples process RSS in the background while a task runs."""
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self.start_bytes = _current_rss_bytes()
+        self.peak_bytes = self.start_bytes or 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            current = _current_rss_bytes()
+            if current and current > self.peak_bytes:
+                self.peak_bytes = current
+
+    def __enter__(self) -> "_PeakRssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.interval * 2)
+        current = _current_rss_bytes()
+        if current and current > self.peak_bytes:
+            self.peak_bytes = current
+
+
+def _process_task(task_id: str) -> None:
+    with lock:
+        task = tasks.get(task_id)
+    if not task:
+        return
 
     _update_task(
         task_id,
@@ -991,13 +3822,23 @@ def _process_task(task_id: str) -> None:
         transcribeProgress=0,
         errorCode=None,
         errorMessage=None,
+        downloadAttempts=[],
     )
 
+    downloaded = False
     try:
-        download_start = time.monotonic()
-        audio_path = _download_audio(task_id, task["url"], task.get("cookiefilePath"))
-        _log_slow("DOWNLOAD", download_start, f"task={task_id}")
-        _update_task(task_id, audioPath=str(audio_path))
+        existing_audio = task.get("audioPath")
+        if existing_audio and Path(existing_audio).is_file():
+            # Download already finished before an interruption or failed transcription
+            audio_path = Path(existing_audio)
+            _log(f"DOWNLOAD_REUSE task={task_id} path={audio_path}")
+            _update_task(task_id, downloadProgress=100)
+        else:
+            download_start = time.monotonic()
+            audio_path = _download_audio(task_id, task["url"], task.get("cookiefilePath"))
+            _log_slow("DOWNLOAD", download_start, f"task={task_id}")
+            _update_task(task_id, audioPath=str(audio_path))
+        downloaded = True
 
         if _is_cancelled(task_id):
             raise TaskCancelled("download canceled")
@@ -1013,26 +3854,29 @@ def _process_task(task_id: str) -> None:
         if _is_cancelled(task_id):
             raise TaskCancelled("transcribe canceled")
 
-        filename = _sanitize_filename(task.get("title") or "transcription") + ".txt"
-        result_path = TEMP_DIR / f"{task_id}.txt"
-        result_path.write_text(text, encoding="utf-8")
-
-        _update_task(
-            task_id,
-            status=TASK_STATUS_DONE,
-            resultPath=str(result_path),
-            resultFilename=filename,
-        )
+        _complete_task(task_id, text)
     except TaskCancelled:
         _mark_canceled(task_id)
         with lock:
             task = tasks.get(task_id)
         if task:
             _clear_task_files(task)
+            requested_at = task.get("cancelRequestedAt")
+            if requested_at:
+                latency_ms = round((time.monotonic() - requested_at) * 1000, 1)
+                # A model load cannot be interrupted; it keeps CPU_THREADS busy after the task is canceled
+                with model_lock:
+                    loading = model_loading
+                with draft_model_lock:
+                    loading = loading or draft_model_loading
+                _update_task(task_id, cancelLatencyMs=latency_ms, cancelModelLoading=loading, cancelRequestedAt=None)
+                _log(f"CANCEL_LATENCY task={task_id} ms={latency_ms} model_loading={int(loading)}")
     except Exception as exc:
+        _remove_file(_pcm_path(task_id))
         message = str(exc)
         error_code = "download_failed"
-        if _needs_cookies(message) and not task.get("cookiefilePath"):
+        # Only a failed download can ask for cookies, and only if none were supplied
+        if not downloaded and _needs_cookies(message) and not task.get("cookiesSupplied"):
             error_code = "cookies_required"
         _update_task(
             task_id,
@@ -1040,49 +3884,545 @@ def _process_task(task_id: str) -> None:
             errorCode=error_code,
             errorMessage=message,
         )
+        _discard_draft(task_id)
     finally:
         _update_task(task_id, downloadProgress=task.get("downloadProgress", 0))
 
 
+def _complete_task(task_id: str, text: str) -> None:
+    with lock:
+        title = (tasks.get(task_id) or {}).get("title")
+    filename = _sanitize_filename(title or "transcription") + ".txt"
+    result_path = TEMP_DIR / f"{task_id}.txt"
+    with _timed_stage(task_id, "result_write"):
+        result_path.write_text(text, encoding="utf-8")
+    _remove_file(_pcm_path(task_id))
+
+    with lock:
+        cookiefile = (tasks.get(task_id) or {}).get("cookiefilePath")
+    _update_task(
+        task_id,
+        status=TASK_STATUS_DONE,
+        resultPath=str(result_path),
+        resultFilename=filename,
+        draftPath=None,
+        cookiefilePath=None,
+    )
+    _remove_file(_draft_path(task_id))
+    if cookiefile:
+        # Kept until now so a retry after the audio was evicted can download with cookies again
+        _release_cookiefiles({cookiefile}, {task_id})
+    try:
+        with _timed_stage(task_id, "search_index"):
+            _index_transcript(task_id, text)
+    except sqlite3.Error as exc:
+        _log(f"SEARCH_INDEX failed task={task_id} error={exc}", level="warning")
+
+
+def _fake_download_audio(task_id: str, url: str, cookiefile: Optional[str]) -> Path:
+    ticks = max(1, int(FAKE_DOWNLOAD_SECONDS * FAKE_PROGRESS_HZ))
+    with _timed_stage(task_id, "download"):
+        for tick in range(ticks):
+            if _is_cancelled(task_id):
+                raise TaskCancelled("download canceled")
+            time.sleep(1 / FAKE_PROGRESS_HZ)
+            _update_task(task_id, downloadProgress=int((tick + 1) / ticks * 100))
+    audio_path = TEMP_DIR / f"{task_id}.fake"
+    audio_path.write_bytes(b"")
+    return audio_path
+
+
+def _fake_transcribe_audio(task_id: str, audio_path: Path) -> str:
+    ticks = max(1, int(FAKE_TRANSCRIBE_SECONDS * FAKE_PROGRESS_HZ))
+    step = FAKE_AUDIO_SECONDS / ticks
+    parts: List[str] = []
+    with checkpoint_lock:
+        live_segments[task_id] = []
+    decode_start = time.monotonic()
+    last_flush = time.monotonic()
+    try:
+        for seq in range(ticks):
+            if _is_cancelled(task_id):
+                raise TaskCancelled("transcribe canceled")
+            time.sleep(1 / FAKE_PROGRESS_HZ)
+            text = f"第{seq + 1}段测试文本。"
+            parts.append(text)
+            _checkpoint_segment(task_id, seq, seq * step, (seq + 1) * step, text)
+            if time.monotonic() - last_flush >= CHECKPOINT_SECONDS:
+                _flush_checkpoints(task_id)
+                last_flush = time.monotonic()
+            _update_task(task_id, transcribeProgress=int((seq + 1) / ticks * 100))
+    finally:
+        if _is_cancelled(task_id):
+            _db_clear_segments(task_id)
+        else:
+            _flush_checkpoints(task_id)
+            with checkpoint_lock:
+                live_segments.pop(task_id, None)
+    _record_stage(task_id, "decode", time.monotonic() - decode_start)
+    timeline = task_timelines.get(task_id)
+    if timeline:
+        timeline.audio_duration = FAKE_AUDIO_SECONDS
+        timeline.transcribed_seconds = FAKE_AUDIO_SECONDS
+    return "".join(parts)
+
+
+if PIPELINE_MODE == "fake":
+    _download_audio = _fake_download_audio
+    _transcribe_audio = _fake_transcribe_audio
+
+
+PROFILE_MODES = ("cprofile", "sampling")
+# Model loads run on these threads while the task thread only polls for them
+MODEL_LOADER_THREADS = ("model-loader", "draft-model-loader")
+
+
+class _StackSampler:
+    """Periodically samples thread stacks and aggregates them as collapsed stacks."""
+
+    def __init__(
+        self,
+        interval: float,
+        thread_ids: Optional[Tuple[int, ...]] = None,
+        thread_names: Tuple[str, ...] = (),
+    ) -> None:
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.thread_names = thread_names
+        self.samples = 0
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            # Rebuilt every tick: idents of finished threads are reused by new ones such as model loaders
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids and thread_id not in self.thread_ids:
+                    if names.get(thread_id) not in self.thread_names:
+                        continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                parts.append(names.get(thread_id, str(thread_id)))
+                key = ";".join(reversed(parts))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def start(self) -> "_StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def dump(self, path: Path) -> None:
+        lines = [f"{stack} {count}" for stack, count in sorted(self.stacks.items())]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+profile_lock = threading.Lock()
+# Armed profiling request; None means disabled and the worker does no profiling work at all
+profile_request: Optional[Dict[str, Any]] = None
+window_sampler: Optional[_StackSampler] = None
+
+
+def _profile_dump_path(label: str, suffix: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime())
+    path = PROFILE_DIR / f"{stamp}-{label}{suffix}"
+    dumps = sorted(PROFILE_DIR.iterdir(), key=lambda item: item.stat().st_mtime)
+    for old in dumps[: max(0, len(dumps) - PROFILE_KEEP_FILES + 1)]:
+        _remove_file(old)
+    return path
+
+
+def _take_task_profile() -> Optional[Dict[str, Any]]:
+    """Claims one profiled run for the task about to start, if profiling is armed."""
+    global profile_request
+    with profile_lock:
+        armed = profile_request
+        if armed is None or armed.get("windowOnly"):
+            return None
+        if armed.get("deadline") and time.time() >= armed["deadline"]:
+            profile_request = None
+            return None
+        if armed.get("remainingTasks") is not None:
+            armed["remainingTasks"] -= 1
+            if armed["remainingTasks"] <= 0:
+                profile_request = None
+        return dict(armed)
+
+
+def _run_profiled(task_id: str, armed: Dict[str, Any]) -> None:
+    start = time.monotonic()
+    if armed["mode"] == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(_process_task, task_id)
+        finally:
+            path = _profile_dump_path(task_id, ".pstats")
+            profiler.dump_stats(str(path))
+            _log(f"PROFILE_DUMP task={task_id} mode=cprofile path={path.name}")
+        return
+    # Loader threads only exist during a load, so they show up exactly while the task waits on one
+    sampler = _StackSampler(armed["intervalMs"] / 1000, (threading.get_ident(),), MODEL_LOADER_THREADS).start()
+    try:
+        _process_task(task_id)
+    finally:
+        sampler.stop()
+        path = _profile_dump_path(task_id, ".collapsed")
+        sampler.dump(path)
+        _log(
+            f"PROFILE_DUMP task={task_id} mode=sampling samples={sampler.samples} "
+            f"elapsed={time.monotonic() - start:.2f}s path={path.name}"
+        )
+
+
+def _finish_window_profile(sampler: _StackSampler, seconds: float) -> None:
+    global profile_request, window_sampler
+    time.sleep(seconds)
+    with profile_lock:
+        if window_sampler is not sampler:
+            return
+        window_sampler = None
+        if profile_request is not None and profile_request.get("windowOnly"):
+            profile_request = None
+    sampler.stop()
+    path = _profile_dump_path("window", ".collapsed")
+    sampler.dump(path)
+    _log(f"PROFILE_DUMP mode=sampling window={seconds:.0f}s samples={sampler.samples} path={path.name}")
+
+
 def _worker_loop() -> None:
     global active_task_id
     while True:
+        # Settings changed since the last task take effect before the next one starts
+        _rebuild_whisper_model()
         with condition:
-            while not queue:
+            while not queue and not model_rebuild_requested:
                 condition.wait()
+            if not queue:
+                continue
             task_id = queue.popleft()
             active_task_id = task_id
             _touch_activity()
+            task = tasks.get(task_id) or {}
+            queued_at = task.get("queuedAt") or task.get("updatedAt")
+        task_timelines[task_id] = _TaskTimeline(task_id, queued_at)
+        log_context.task_id = task_id
+        sampler = _PeakRssSampler()
+        armed = _take_task_profile() if profile_request is not None else None
         try:
-            _process_task(task_id)
+            with sampler:
+                if armed is None:
+                    _process_task(task_id)
+                else:
+                    _run_profiled(task_id, armed)
+            _log(
+                f"TASK_PEAK_RSS task={task_id} peak_mb={sampler.peak_bytes / 1048576:.1f} "
+                f"start_mb={(sampler.start_bytes or 0) / 1048576:.1f}"
+            )
         finally:
+            _finish_timeline(task_id, sampler.peak_bytes or None)
+            log_context.task_id = None
+            log_context.stage = None
             with lock:
                 active_task_id = None
 
 
+STORAGE_SYSTEM_PREFIXES = ("tasks.db", "service.log", "service.token", "tuning.json")
+
+
+def _classify_temp_file(path: Path, task_by_id: Dict[str, Dict[str, Any]]) -> Tuple[str, Optional[str]]:
+    name = path.name
+    if name.startswith(STORAGE_SYSTEM_PREFIXES):
+        return "system", None
+    if name.startswith("cookies-") and name.endswith(".txt"):
+        return "cookies", name[len("cookies-"):-len(".txt")]
+    task_id = name.split(".", 1)[0]
+    task = task_by_id.get(task_id)
+    if task is None:
+        return ("orphan" if len(task_id) == 32 else "other"), task_id
+    if task.get("audioPath") and Path(task["audioPath"]).name == name:
+        return "audio", task_id
+    if task.get("resultPath") and Path(task["resultPath"]).name == name:
+        return "transcript", task_id
+    return "partial", task_id
+
+
+def _remove_file(path: Path) -> int:
+    try:
+        size = path.stat().st_size
+        path.unlink()
+    except OSError:
+        return 0
+    return size
+
+
+def _has_stored_segments(task_id: str) -> bool:
+    with db_lock, _db_connect() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM transcript_segments WHERE task_id = ? LIMIT 1", (task_id,)
+        ).fetchone()
+    return row is not None
+
+
+def _sweep_storage() -> Dict[str, Any]:
+    with storage_lock:
+        start = time.monotonic()
+        now = time.time()
+        with lock:
+            task_by_id = {task_id: dict(task) for task_id, task in tasks.items()}
+            busy = {
+                task_id
+                for task_id, task in task_by_id.items()
+                if task["status"] not in TERMINAL_STATUSES
+            }
+            if active_task_id:
+                busy.add(active_task_id)
+
+        files: List[Tuple[Path, str, Optional[str], int, float]] = []
+        for path in TEMP_DIR.iterdir():
+            if not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            category, task_id = _classify_temp_file(path, task_by_id)
+            files.append((path, category, task_id, stat.st_size, stat.st_mtime))
+
+        # Matched by file name: tasks of a bulk batch share one cookie file
+        cookie_names = {
+            Path(task["cookiefilePath"]).name
+            for task in task_by_id.values()
+            if task.get("cookiefilePath") and task["status"] not in (TASK_STATUS_DONE, TASK_STATUS_CANCELED)
+        }
+        freed = {"partial": 0, "orphan": 0, "cookies": 0, "audio": 0, "transcript": 0}
+        kept = []
+        for path, category, task_id, size, mtime in files:
+            stale = now - mtime >= PARTIAL_MAX_AGE_SECONDS
+            removable = False
+            if task_id in busy:
+                removable = False
+            elif category in ("partial", "orphan"):
+                removable = stale
+            elif category == "cookies":
+                # Kept for retries of failed tasks; done and canceled tasks no longer download
+                removable = path.name not in cookie_names
+            if removable:
+                freed[category] += _remove_file(path)
+            else:
+                kept.append((path, category, task_id, size, mtime))
+
+        total = sum(item[3] for item in kept)
+        evicted_audio: List[str] = []
+        evicted_transcripts: List[str] = []
+        if DISK_QUOTA_BYTES > 0 and total > DISK_QUOTA_BYTES:
+            def age_key(item: Tuple[Path, str, Optional[str], int, float]) -> float:
+                task = task_by_id.get(item[2] or "")
+                return task["updatedAt"] if task else item[4]
+
+            # Audio goes first (only needed for retries), then the oldest transcripts
+            for category in ("audio", "transcript"):
+                candidates = sorted(
+                    (item for item in kept if item[1] == category and item[2] not in busy),
+                    key=age_key,
+                )
+                for item in candidates:
+                    if total <= DISK_QUOTA_BYTES:
+                        break
+                    path, _, task_id, size, _ = item
+                    # Transcript files are rebuilt from stored segments on download
+                    if category == "transcript" and not _has_stored_segments(task_id):
+                        continue
+                    removed = _remove_file(path)
+                    if not removed and path.exists():
+                        continue
+                    freed[category] += removed
+                    total -= size
+                    kept.remove(item)
+                    if category == "audio":
+                        evicted_audio.append(task_id)
+                    else:
+                        evicted_transcripts.append(task_id)
+
+        for task_id in evicted_audio:
+            _update_task(task_id, audioPath=None)
+
+        usage: Dict[str, Dict[str, int]] = {}
+        for _, category, _, size, _ in kept:
+            bucket = usage.setdefault(category, {"bytes": 0, "files": 0})
+            bucket["bytes"] += size
+            bucket["files"] += 1
+        with db_lock, _db_connect() as conn:
+            conn.execute("DELETE FROM storage_usage")
+            conn.executemany(
+                "INSERT INTO storage_usage (category, bytes, files, updated_at) VALUES (?, ?, ?, ?)",
+                [(category, item["bytes"], item["files"], now) for category, item in usage.items()],
+            )
+            conn.commit()
+
+        summary = {
+            "at": now,
+            "elapsedMs": round((time.monotonic() - start) * 1000, 2),
+            "totalBytes": total,
+            "freedBytes": freed,
+            "evictedAudio": len(evicted_audio),
+            "evictedTranscripts": len(evicted_transcripts),
+        }
+        last_sweep.clear()
+        last_sweep.update(summary)
+    if any(freed.values()):
+        _log(
+            f"STORAGE_SWEEP total={total} freed={sum(freed.values())} "
+            f"audio={len(evicted_audio)} transcripts={len(evicted_transcripts)}"
+        )
+    return summary
+
+
+def _storage_sweeper_loop() -> None:
+    while True:
+        time.sleep(SWEEP_INTERVAL_SECONDS)
+        try:
+            _sweep_storage()
+        except Exception as exc:
+            _log(f"STORAGE_SWEEP failed error={exc}", level="warning")
+
+
+def _ensure_result_file(task_id: str, result_path: str) -> bool:
+    path = Path(result_path)
+    if path.is_file():
+        return True
+    segments = _segments_since(task_id, 0)
+    if not segments:
+        return False
+    path.write_text("".join(segment["text"] for segment in segments).strip(), encoding="utf-8")
+    _log(f"RESULT_REBUILD task={task_id} segments={len(segments)}")
+    return True
+
+
 def _idle_monitor_loop() -> None:
-    if IDLE_SECONDS <= 0:
-        return
     while True:
         time.sleep(5)
+        # Read on every pass: PUT /api/settings can change or disable the timeout
+        if IDLE_SECONDS <= 0:
+            continue
         with lock:
-            has_active = bool(queue) or active_task_id is not None
+            has_active = (
+                bool(queue)
+                or active_task_id is not None
+                or bool(leases)
+                or bool(webhook_pending)
+                or tuning_state["running"]
+                or model_rebuild["running"]
+            )
             idle_for = time.time() - last_activity
         if has_active:
             continue
         if idle_for >= IDLE_SECONDS:
             _log("SERVICE_EXIT_IDLE")
+            _flush_logs()
             os._exit(0)
 
 
-_init_db()
-_load_tasks_from_db()
-worker = threading.Thread(target=_worker_loop, daemon=True)
-worker.start()
-_log("WORKER_READY")
-idle_monitor = threading.Thread(target=_idle_monitor_loop, daemon=True)
-idle_monitor.start()
-_log("IDLE_MONITOR_READY")
+def _requeue_expired_lease(lease: Dict[str, Any]) -> None:
+    """Put a task whose worker stopped sending heartbeats back at the head of the queue."""
+    task_id = lease["taskId"]
+    with condition:
+        task = tasks.get(task_id)
+        if not task:
+            return
+        if task["status"] == TASK_STATUS_CANCELING:
+            action = "canceled"
+        elif task["status"] not in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING):
+            return
+        elif (task.get("resumeCount") or 0) < MAX_AUTO_RESUME:
+            action = "requeued"
+            task["status"] = TASK_STATUS_QUEUED
+            task["resumeCount"] = (task.get("resumeCount") or 0) + 1
+            task["workerId"] = None
+            task["queuedAt"] = time.time()
+            queue.appendleft(task_id)
+            condition.notify()
+        else:
+            action = "failed"
+            task["status"] = TASK_STATUS_ERROR
+            task["errorCode"] = "interrupted"
+            task["errorMessage"] = "转录节点已失联，请重试"
+            task["draftPath"] = None
+            _task_finished_locked(task)
+        if action != "canceled":
+            task["updatedAt"] = time.time()
+            _db_upsert_task(task)
+    if action == "canceled":
+        _mark_canceled(task_id)
+        _clear_task_files(task)
+    elif action == "failed":
+        METRIC_TASKS.inc(status=TASK_STATUS_ERROR)
+        _remove_file(_draft_path(task_id))
+    _log(
+        f"LEASE_EXPIRED lease={lease['leaseId']} task={task_id} worker={lease['workerId']} action={action}",
+        level="warning",
+    )
+
+
+def _lease_reaper_loop() -> None:
+    while True:
+        time.sleep(max(1.0, LEASE_SECONDS / 4))
+        now = time.time()
+        with lock:
+            expired = [lease for lease in leases.values() if lease["expiresAt"] <= now]
+            for lease in expired:
+                leases.pop(lease["leaseId"], None)
+        for lease in expired:
+            _requeue_expired_lease(lease)
+
+
+def _initialize_service() -> None:
+    """Everything the API needs besides the app itself; runs off the main thread so the port binds first."""
+    try:
+        _write_token()
+        _init_db()
+        _mark_startup("db_ready")
+        _load_settings()
+        _load_strategy_stats()
+        _load_tasks_from_db()
+        _load_throughput_history()
+        _mark_startup("tasks_loaded")
+        if ROLE != "worker":
+            if PROBE_DURATION:
+                threading.Thread(target=_duration_probe_loop, name="duration-probe", daemon=True).start()
+                with lock:
+                    for task_id in queue:
+                        probe_queue.put(task_id)
+            if LOCAL_WORKER:
+                worker = threading.Thread(target=_worker_loop, name="task-worker", daemon=True)
+                worker.start()
+                _log("WORKER_READY")
+            threading.Thread(target=_lease_reaper_loop, name="lease-reaper", daemon=True).start()
+            threading.Thread(target=_webhook_delivery_loop, name="webhook-delivery", daemon=True).start()
+            idle_monitor = threading.Thread(target=_idle_monitor_loop, name="idle-monitor", daemon=True)
+            idle_monitor.start()
+            _log("IDLE_MONITOR_READY")
+        threading.Thread(target=_backfill_search_index, name="search-backfill", daemon=True).start()
+        storage_sweeper = threading.Thread(target=_storage_sweeper_loop, name="storage-sweeper", daemon=True)
+        storage_sweeper.start()
+    except Exception as exc:
+        _log(f"SERVICE_INIT_ERROR {exc}\n{traceback.format_exc()}", level="error")
+        _flush_logs()
+        os._exit(1)
+    _mark_startup("service_ready")
+    service_ready.set()
+    _log("SERVICE_READY " + " ".join(f"{item['phase']}={item['ms']}ms" for item in startup_timeline))
 
 
 @app.get("/api/tasks")
@@ -1091,27 +4431,26 @@ def list_tasks(request: Request, token: Optional[str] = Query(None)):
     return JSONResponse(_snapshot_tasks())
 
 
-@app.post("/api/tasks")
-def create_task(
-    request: Request,
-    payload: CreateTaskRequest = Body(...),
-    token: Optional[str] = Query(None),
-):
-    _require_token(request, token)
-    if not payload.url.startswith("http"):
-        raise HTTPException(status_code=400, detail="无效的URL")
+def _new_task(
+    url: str,
+    title: Optional[str],
+    site: Optional[str],
+    cookies: Optional[List[CookieItem]],
+    profile: Optional[str],
+    two_pass: Optional[bool],
+    **extra: Any,
+) -> Dict[str, Any]:
     task_id = uuid.uuid4().hex
     now = time.time()
     cookiefile_path = None
-    if payload.cookies:
+    if cookies:
         cookiefile_path = str(_cookiefile_path(task_id))
-        _write_cookies_file(payload.cookies, Path(cookiefile_path))
-
-    task = {
+        _write_cookies_file(cookies, Path(cookiefile_path))
+    return {
         "id": task_id,
-        "url": payload.url,
-        "title": payload.title,
-        "site": payload.site,
+        "url": url,
+        "title": title,
+        "site": site,
         "status": TASK_STATUS_QUEUED,
         "createdAt": now,
         "updatedAt": now,
@@ -1123,17 +4462,289 @@ def create_task(
         "resultFilename": None,
         "audioPath": None,
         "cookiefilePath": cookiefile_path,
+        "cookiesSupplied": cookiefile_path is not None,
         "cancelRequested": False,
         "queueOrder": _next_queue_order(),
+        "downloadAttempts": [],
+        "decodeProfile": profile or DEFAULT_DECODE_PROFILE,
+        "twoPass": bool(DRAFT_MODEL_SIZE and DRAFT_MODEL_SIZE != MODEL_SIZE)
+        and (TWO_PASS_DEFAULT if two_pass is None else two_pass),
+        **extra,
+    }
+
+
+def _expand_playlist(url: str, cookiefile: Optional[str]) -> List[Dict[str, Any]]:
+    """List a playlist's videos from flat extraction (one metadata request, nothing downloaded)."""
+    import yt_dlp
+
+    opts: Dict[str, Any] = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": "in_playlist",
+        "playlistend": BULK_MAX_TASKS + 1,
+        "socket_timeout": 30,
     }
+    if cookiefile:
+        opts["cookiefile"] = cookiefile
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False) or {}
+    entries = info.get("entries")
+    if entries is None:
+        # Not a playlist: the URL is a single video
+        return [{"url": info.get("webpage_url") or url, "title": info.get("title"), "duration": info.get("duration")}]
+    items = []
+    for entry in entries:
+        if not entry:
+            continue
+        link = entry.get("url") or ""
+        if not link.startswith("http"):
+            link = entry.get("webpage_url") or ""
+        if link.startswith("http"):
+            items.append({"url": link, "title": entry.get("title"), "duration": entry.get("duration")})
+    return items
+
+
+def _check_callback_url(url: Optional[str]) -> None:
+    if url is not None and urlparse(url).scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail="无效的回调地址")
+
+
+@app.post("/api/tasks")
+def create_task(
+    request: Request,
+    payload: CreateTaskRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    if not payload.url.startswith("http"):
+        raise HTTPException(status_code=400, detail="无效的URL")
+    if payload.profile is not None and payload.profile not in DECODE_PROFILES:
+        raise HTTPException(status_code=400, detail="未知的解码配置")
+    _check_callback_url(payload.callbackUrl)
+    task = _new_task(
+        payload.url,
+        payload.title,
+        payload.site,
+        payload.cookies,
+        payload.profile,
+        payload.twoPass,
+        callbackUrl=payload.callbackUrl,
+    )
+    task_id = task["id"]
+    cookiefile_path = task["cookiefilePath"]
 
     with lock:
-        tasks[task_id] = task
-        _db_upsert_task(task)
+        retry_after = _admission_retry_after([task])
+        if retry_after is None:
+            tasks[task_id] = task
+            _db_upsert_task(task)
+    if retry_after is not None:
+        if cookiefile_path:
+            _remove_file(Path(cookiefile_path))
+        _log(f"TASK_REJECTED reason=queue_full retry_after={retry_after}s", level="warning")
+        raise HTTPException(
+            status_code=429,
+            detail="排队的音频过多，请稍后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
 
     _enqueue(task_id)
+    if PROBE_DURATION:
+        probe_queue.put(task_id)
+    snapshot = _snapshot_tasks()
+    view = next((item for item in snapshot["tasks"] if item["id"] == task_id), None)
+    return JSONResponse({"task": view or _task_public_view(task, {}), "snapshot": snapshot})
+
+
+@app.post("/api/tasks/bulk")
+def create_tasks_bulk(
+    request: Request,
+    payload: BulkCreateRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    if payload.profile is not None and payload.profile not in DECODE_PROFILES:
+        raise HTTPException(status_code=400, detail="未知的解码配置")
+    _check_callback_url(payload.callbackUrl)
+    entries: List[Dict[str, Any]] = []
+    for url in payload.urls:
+        if not url.startswith("http"):
+            raise HTTPException(status_code=400, detail="无效的URL")
+        entries.append({"url": url})
+    batch_id = uuid.uuid4().hex
+    # Written once for the playlist expansion and every task of the batch
+    cookiefile = None
+    if payload.cookies:
+        cookiefile = _batch_cookiefile_path(batch_id)
+        _write_cookies_file(payload.cookies, cookiefile)
+    try:
+        if payload.playlistUrl:
+            if not payload.playlistUrl.startswith("http"):
+                raise HTTPException(status_code=400, detail="无效的URL")
+            start = time.monotonic()
+            try:
+                expanded = _expand_playlist(payload.playlistUrl, str(cookiefile) if cookiefile else None)
+            except Exception as exc:
+                raise HTTPException(status_code=400, detail=f"播放列表解析失败: {exc}")
+            _log(
+                f"PLAYLIST_EXPAND url={payload.playlistUrl} entries={len(expanded)} "
+                f"elapsed={time.monotonic() - start:.2f}s"
+            )
+            entries.extend(expanded)
+        seen = set()
+        unique = []
+        for entry in entries:
+            if entry["url"] not in seen:
+                seen.add(entry["url"])
+                unique.append(entry)
+        if not unique:
+            raise HTTPException(status_code=400, detail="没有可添加的视频")
+        if len(unique) > BULK_MAX_TASKS:
+            raise HTTPException(status_code=400, detail=f"任务数量超过上限 ({BULK_MAX_TASKS})")
+    except HTTPException:
+        if cookiefile:
+            _remove_file(cookiefile)
+        raise
+
+    new_tasks = [
+        _new_task(
+            entry["url"],
+            entry.get("title"),
+            payload.site,
+            None,
+            payload.profile,
+            payload.twoPass,
+            batchId=batch_id,
+            probedDuration=float(entry["duration"]) if entry.get("duration") else None,
+            callbackUrl=payload.callbackUrl,
+            cookiefilePath=str(cookiefile) if cookiefile else None,
+            cookiesSupplied=cookiefile is not None,
+        )
+        for entry in unique
+    ]
+    with condition:
+        retry_after = _admission_retry_after(new_tasks)
+        if retry_after is None:
+            now = time.time()
+            for task in new_tasks:
+                task["queuedAt"] = now
+                tasks[task["id"]] = task
+                queue.append(task["id"])
+            _db_upsert_tasks(new_tasks)
+            _touch_activity()
+            # One wake-up for the local worker and any remote workers waiting for a lease
+            condition.notify_all()
+    if retry_after is not None:
+        _remove_task_files(new_tasks)
+        _log(f"BATCH_REJECTED reason=queue_full tasks={len(new_tasks)} retry_after={retry_after}s", level="warning")
+        raise HTTPException(
+            status_code=429,
+            detail="排队的音频过多，请稍后再试",
+            headers={"Retry-After": str(retry_after)},
+        )
+    if PROBE_DURATION:
+        for task in new_tasks:
+            if not task.get("probedDuration"):
+                probe_queue.put(task["id"])
+    _log(f"BATCH_CREATED batch={batch_id} tasks={len(new_tasks)}")
+    snapshot = _snapshot_tasks()
+    return JSONResponse(
+        {
+            "batchId": batch_id,
+            "tasks": [item for item in snapshot["tasks"] if item.get("batchId") == batch_id],
+            "snapshot": snapshot,
+        }
+    )
+
+
+def _batch_tasks(batch_id: str) -> List[Dict[str, Any]]:
+    """Tasks of a batch; caller holds `lock`."""
+    items = [task for task in tasks.values() if task.get("batchId") == batch_id]
+    if not items:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    return items
+
+
+def _remove_from_queue(task_ids: set) -> None:
+    """Drop tasks from the queue in one pass; caller holds `lock`."""
+    remaining = [task_id for task_id in queue if task_id not in task_ids]
+    queue.clear()
+    queue.extend(remaining)
+
+
+@app.get("/api/batches/{batch_id}")
+def get_batch(request: Request, batch_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with lock:
+        ids = {task["id"] for task in _batch_tasks(batch_id)}
     snapshot = _snapshot_tasks()
-    return JSONResponse({"task": _task_public_view(task, {}), "snapshot": snapshot})
+    items = [item for item in snapshot["tasks"] if item["id"] in ids]
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return JSONResponse({"batchId": batch_id, "counts": counts, "tasks": items})
+
+
+@app.post("/api/batches/{batch_id}/cancel")
+def cancel_batch(request: Request, batch_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    now = time.time()
+    with lock:
+        items = _batch_tasks(batch_id)
+        queued = [task for task in items if task["status"] == TASK_STATUS_QUEUED]
+        running = [
+            task["id"]
+            for task in items
+            if task["status"] in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING)
+        ]
+        _remove_from_queue({task["id"] for task in queued})
+        for task in queued:
+            task.update(
+                status=TASK_STATUS_CANCELED,
+                errorCode=None,
+                errorMessage=None,
+                downloadProgress=0,
+                transcribeProgress=0,
+                updatedAt=now,
+            )
+            _task_finished_locked(task)
+        _db_upsert_tasks(queued)
+    if queued:
+        METRIC_TASKS.inc(len(queued), status=TASK_STATUS_CANCELED)
+    # The batch cookie file stays while a running task of the batch still needs it
+    _remove_task_files(queued)
+    for task_id in running:
+        _update_task(
+            task_id,
+            status=TASK_STATUS_CANCELING,
+            cancelRequested=True,
+            cancelRequestedAt=time.monotonic(),
+            cancelLatencyMs=None,
+            cancelModelLoading=False,
+        )
+    _touch_activity()
+    return JSONResponse({"ok": True, "canceled": len(queued), "canceling": len(running)})
+
+
+@app.delete("/api/batches/{batch_id}")
+def delete_batch(request: Request, batch_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with lock:
+        items = _batch_tasks(batch_id)
+        removable = [
+            task
+            for task in items
+            if task["status"] not in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING, TASK_STATUS_CANCELING)
+        ]
+        ids = [task["id"] for task in removable]
+        _remove_from_queue(set(ids))
+        for task_id in ids:
+            tasks.pop(task_id, None)
+        _db_delete_tasks(ids)
+    _remove_task_files(removable)
+    _touch_activity()
+    # Running tasks stay; cancel the batch first and delete again once they stopped
+    return JSONResponse({"ok": True, "deleted": len(ids), "running": len(items) - len(ids)})
 
 
 @app.post("/api/tasks/{task_id}/cancel")
@@ -1158,7 +4769,14 @@ def cancel_task(request: Request, task_id: str, token: Optional[str] = Query(Non
         if task["status"] == TASK_STATUS_CANCELING:
             return JSONResponse({"ok": True})
     if should_canceling:
-        _update_task(task_id, status=TASK_STATUS_CANCELING, cancelRequested=True)
+        _update_task(
+            task_id,
+            status=TASK_STATUS_CANCELING,
+            cancelRequested=True,
+            cancelRequestedAt=time.monotonic(),
+            cancelLatencyMs=None,
+            cancelModelLoading=False,
+        )
     if should_mark:
         _mark_canceled(task_id)
     return JSONResponse({"ok": True})
@@ -1173,6 +4791,7 @@ def retry_task(request: Request, task_id: str, token: Optional[str] = Query(None
             raise HTTPException(status_code=404, detail="任务不存在")
         if task["status"] in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING, TASK_STATUS_CANCELING):
             raise HTTPException(status_code=400, detail="任务正在执行")
+        rerun_done = task["status"] == TASK_STATUS_DONE
         task["status"] = TASK_STATUS_QUEUED
         task["downloadProgress"] = 0
         task["transcribeProgress"] = 0
@@ -1182,6 +4801,9 @@ def retry_task(request: Request, task_id: str, token: Optional[str] = Query(None
         task["queueOrder"] = _next_queue_order()
         task["updatedAt"] = time.time()
         _db_upsert_task(task)
+    if rerun_done:
+        # A finished task is transcribed again from scratch rather than from its checkpoint
+        _db_clear_segments(task_id)
     _enqueue(task_id)
     return JSONResponse({"ok": True})
 
@@ -1200,8 +4822,8 @@ def delete_task(request: Request, task_id: str, token: Optional[str] = Query(Non
         except ValueError:
             pass
         tasks.pop(task_id, None)
-        _db_delete_task(task_id)
-    _clear_task_files(task)
+        _db_delete_tasks([task_id])
+    _remove_task_files([task])
     return JSONResponse({"ok": True})
 
 
@@ -1212,24 +4834,28 @@ def clear_tasks(
     token: Optional[str] = Query(None),
 ):
     _require_token(request, token)
+    removed: List[Dict[str, Any]] = []
+    now = time.time()
     with lock:
         queue.clear()
         if payload.include_done:
-            removable = [
-                task_id
-                for task_id, task in tasks.items()
+            removed = [
+                task
+                for task in tasks.values()
                 if task["status"] in (TASK_STATUS_DONE, TASK_STATUS_ERROR, TASK_STATUS_CANCELED)
             ]
-            for task_id in removable:
-                task = tasks.pop(task_id, None)
-                if task:
-                    _clear_task_files(task)
-                _db_delete_task(task_id)
-        else:
-            for task_id, task in tasks.items():
-                if task["status"] == TASK_STATUS_QUEUED:
-                    task["status"] = TASK_STATUS_CANCELED
-                    task["updatedAt"] = time.time()
+            for task in removed:
+                tasks.pop(task["id"], None)
+            _db_delete_tasks([task["id"] for task in removed])
+        queued = [task for task in tasks.values() if task["status"] == TASK_STATUS_QUEUED]
+        for task in queued:
+            task["status"] = TASK_STATUS_CANCELED
+            task["updatedAt"] = now
+            _task_finished_locked(task)
+        _db_upsert_tasks(queued)
+    if queued:
+        METRIC_TASKS.inc(len(queued), status=TASK_STATUS_CANCELED)
+    _remove_task_files(removed)
     return JSONResponse({"ok": True})
 
 
@@ -1247,7 +4873,7 @@ def set_task_cookies(
             raise HTTPException(status_code=404, detail="任务不存在")
     cookiefile_path = _cookiefile_path(task_id)
     _write_cookies_file(cookies, cookiefile_path)
-    _update_task(task_id, cookiefilePath=str(cookiefile_path))
+    _update_task(task_id, cookiefilePath=str(cookiefile_path), cookiesSupplied=True)
     return JSONResponse({"ok": True})
 
 
@@ -1256,11 +4882,84 @@ async def stream_tasks(request: Request, token: Optional[str] = Query(None)):
     _require_token(request, token)
 
     async def event_generator():
-        while True:
-            snapshot = _snapshot_tasks()
-            payload = json.dumps(snapshot, ensure_ascii=False)
-            yield f"data: {payload}\n\n"
-            await asyncio.sleep(1)
+        METRIC_SSE_SUBSCRIBERS.inc(stream="tasks")
+        try:
+            while True:
+                snapshot = _snapshot_tasks()
+                payload = json.dumps(snapshot, ensure_ascii=False)
+                yield f"data: {payload}\n\n"
+                await asyncio.sleep(1)
+        finally:
+            METRIC_SSE_SUBSCRIBERS.inc(-1, stream="tasks")
+
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+    }
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+
+
+def _task_status(task_id: str) -> Optional[str]:
+    with lock:
+        task = tasks.get(task_id)
+        return task["status"] if task else None
+
+
+@app.get("/api/tasks/{task_id}/transcript")
+def partial_transcript(
+    request: Request,
+    task_id: str,
+    cursor: int = Query(0, ge=0),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    status = _task_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    segments = _segments_since(task_id, cursor)
+    next_cursor = segments[-1]["seq"] + 1 if segments else cursor
+    return JSONResponse(
+        {
+            "status": status,
+            "segments": segments,
+            "nextCursor": next_cursor,
+            "complete": status in TERMINAL_STATUSES,
+        }
+    )
+
+
+@app.get("/api/tasks/{task_id}/transcript/stream")
+async def stream_transcript(
+    request: Request,
+    task_id: str,
+    cursor: int = Query(0, ge=0),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    if _task_status(task_id) is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    # EventSource reconnects send the id of the last event they received
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        cursor = max(cursor, int(last_event_id))
+
+    async def event_generator():
+        next_cursor = cursor
+        METRIC_SSE_SUBSCRIBERS.inc(stream="transcript")
+        try:
+            while True:
+                status = _task_status(task_id)
+                for segment in _segments_since(task_id, next_cursor):
+                    next_cursor = segment["seq"] + 1
+                    payload = json.dumps(segment, ensure_ascii=False)
+                    yield f"id: {next_cursor}\nevent: segment\ndata: {payload}\n\n"
+                if status is None or status in TERMINAL_STATUSES:
+                    payload = json.dumps({"status": status, "nextCursor": next_cursor})
+                    yield f"event: end\ndata: {payload}\n\n"
+                    return
+                await asyncio.sleep(0.5)
+        finally:
+            METRIC_SSE_SUBSCRIBERS.inc(-1, stream="transcript")
 
     headers = {
         "Cache-Control": "no-cache",
@@ -1269,6 +4968,71 @@ async def stream_tasks(request: Request, token: Optional[str] = Query(None)):
     return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
 
 
+@app.get("/api/tasks/{task_id}/wait")
+async def wait_task(
+    request: Request,
+    task_id: str,
+    timeout: float = Query(30, ge=0, le=WAIT_MAX_SECONDS),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    loop = asyncio.get_running_loop()
+    future: "asyncio.Future[None]" = loop.create_future()
+    with lock:
+        task = tasks.get(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        finished = task["status"] in TERMINAL_STATUSES
+        if not finished:
+            terminal_waiters.setdefault(task_id, []).append((loop, future))
+    if not finished:
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with lock:
+                waiters = terminal_waiters.get(task_id)
+                if waiters and (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                    if not waiters:
+                        terminal_waiters.pop(task_id, None)
+    snapshot = _snapshot_tasks()
+    view = next((item for item in snapshot["tasks"] if item["id"] == task_id), None)
+    if view is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return JSONResponse({"task": view, "complete": view["status"] in TERMINAL_STATUSES})
+
+
+@app.get("/api/tasks/{task_id}/timing")
+def task_timing(request: Request, task_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with lock:
+        task = tasks.get(task_id)
+        if not task:
+            raise HTTPException(status_code=404, detail="任务不存在")
+        status = task["status"]
+        timeline = task.get("timeline")
+        audio_duration = task.get("audioDuration")
+        realtime_factor = task.get("realtimeFactor")
+    running = task_timelines.get(task_id)
+    if running is not None:
+        timeline = running.to_dict()
+        audio_duration = running.audio_duration
+        realtime_factor = timeline["realtimeFactor"]
+    return JSONResponse(
+        {
+            "taskId": task_id,
+            "status": status,
+            "running": running is not None,
+            "audioDuration": audio_duration,
+            "realtimeFactor": realtime_factor,
+            "downloadAttempts": task.get("downloadAttempts") or [],
+            "timeline": timeline,
+        }
+    )
+
+
 @app.get("/api/tasks/{task_id}/result")
 def download_result(request: Request, task_id: str, token: Optional[str] = Query(None)):
     _require_token(request, token)
@@ -1276,11 +5040,846 @@ def download_result(request: Request, task_id: str, token: Optional[str] = Query
         task = tasks.get(task_id)
         if not task:
             raise HTTPException(status_code=404, detail="任务不存在")
+        draft_path = task.get("draftPath")
+        active = task["status"] in (TASK_STATUS_QUEUED, TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING)
+        if active and draft_path and Path(draft_path).is_file():
+            # Two-pass task still refining: serve the draft and say so
+            filename = _sanitize_filename(task.get("title") or "transcription") + ".draft.txt"
+            return FileResponse(
+                path=draft_path,
+                filename=filename,
+                media_type="text/plain",
+                headers={"X-Transcript-Stage": "draft"},
+            )
         if task["status"] != TASK_STATUS_DONE or not task.get("resultPath"):
             raise HTTPException(status_code=400, detail="任务未完成")
         result_path = task["resultPath"]
         filename = task.get("resultFilename") or "transcription.txt"
-    return FileResponse(path=result_path, filename=filename, media_type="text/plain")
+    if not _ensure_result_file(task_id, result_path):
+        raise HTTPException(status_code=410, detail="转录结果已被清理")
+    return FileResponse(
+        path=result_path, filename=filename, media_type="text/plain", headers={"X-Transcript-Stage": "final"}
+    )
+
+
+@app.get("/api/search")
+def search_transcripts(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    per_task: int = Query(5, ge=1, le=50),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    if not search_tokenizer:
+        raise HTTPException(status_code=503, detail="全文搜索不可用")
+    start = time.monotonic()
+    results = _search_transcripts(q, limit, per_task)
+    return JSONResponse(
+        {
+            "query": q,
+            "results": results,
+            "elapsedMs": round((time.monotonic() - start) * 1000, 2),
+        }
+    )
+
+
+@app.get("/api/storage")
+def storage_usage(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with db_lock, _db_connect() as conn:
+        rows = conn.execute("SELECT category, bytes, files, updated_at FROM storage_usage").fetchall()
+    categories = {
+        row["category"]: {"bytes": row["bytes"], "files": row["files"]} for row in rows
+    }
+    return JSONResponse(
+        {
+            "tempDir": str(TEMP_DIR),
+            "quotaBytes": DISK_QUOTA_BYTES,
+            "totalBytes": sum(item["bytes"] for item in categories.values()),
+            "categories": categories,
+            "updatedAt": max((row["updated_at"] for row in rows), default=None),
+            "lastSweep": dict(last_sweep) or None,
+        }
+    )
+
+
+@app.post("/api/storage/sweep")
+def sweep_storage(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    return JSONResponse(_sweep_storage())
+
+
+@app.get("/metrics")
+def metrics(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with lock:
+        queued = [tasks[task_id] for task_id in queue if task_id in tasks]
+        busy = active_task_id is not None
+        by_status: Dict[str, int] = {}
+        for task in tasks.values():
+            by_status[task["status"]] = by_status.get(task["status"], 0) + 1
+    now = time.time()
+    oldest_wait = max(
+        (now - (task.get("queuedAt") or task["updatedAt"]) for task in queued), default=0.0
+    )
+    cpu = os.times()
+    gauges = [
+        ("transcriber_queue_depth", "Tasks waiting in the queue", len(queued)),
+        ("transcriber_queue_oldest_wait_seconds", "Age of the oldest queued task", oldest_wait),
+        ("transcriber_worker_busy", "1 while the worker is processing a task", int(busy)),
+        ("transcriber_model_ready", "1 once the Whisper model is loaded", int(model_ready)),
+        (
+            "transcriber_temp_dir_bytes",
+            "TEMP_DIR size at the last storage sweep",
+            last_sweep.get("totalBytes", 0),
+        ),
+        ("process_resident_memory_bytes", "Resident memory size", _current_rss_bytes() or 0),
+        ("process_cpu_seconds_total", "User and system CPU time", cpu.user + cpu.system),
+        ("process_start_time_seconds", "Service start time", SERVICE_STARTED_AT),
+    ]
+    lines: List[str] = []
+    for name, help_text, value in gauges:
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"])
+    lines.extend(
+        [
+            "# HELP transcriber_tasks Tasks currently known to the service by status",
+            "# TYPE transcriber_tasks gauge",
+        ]
+    )
+    for status, count in sorted(by_status.items()):
+        lines.append(f'transcriber_tasks{{status="{status}"}} {count}')
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+def _profile_state() -> Dict[str, Any]:
+    with profile_lock:
+        armed = dict(profile_request) if profile_request is not None else None
+    return {"armed": armed}
+
+
+@app.get("/api/debug/profile")
+def get_profile(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    return JSONResponse(_profile_state())
+
+
+@app.post("/api/debug/profile")
+def arm_profile(
+    request: Request,
+    payload: ProfileRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    global profile_request, window_sampler
+    _require_token(request, token)
+    if payload.mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail="不支持的分析模式")
+    if payload.tasks is None and payload.seconds is None:
+        raise HTTPException(status_code=400, detail="需要指定 tasks 或 seconds")
+    armed = {
+        "mode": payload.mode,
+        "remainingTasks": payload.tasks,
+        "deadline": time.time() + payload.seconds if payload.seconds else None,
+        "intervalMs": payload.interval_ms,
+        "armedAt": time.time(),
+    }
+    sampler = None
+    with profile_lock:
+        if window_sampler is not None:
+            raise HTTPException(status_code=409, detail="已有采样窗口在运行")
+        if payload.mode == "sampling" and payload.seconds and payload.tasks is None:
+            # A sampling window covers every thread, not just tasks started inside it
+            armed["windowOnly"] = True
+            sampler = window_sampler = _StackSampler(payload.interval_ms / 1000)
+        profile_request = armed
+    if sampler is not None:
+        sampler.start()
+        threading.Thread(
+            target=_finish_window_profile,
+            args=(sampler, payload.seconds),
+            name="profile-window",
+            daemon=True,
+        ).start()
+    _log(
+        f"PROFILE_ARM mode={payload.mode} tasks={payload.tasks} seconds={payload.seconds} "
+        f"interval_ms={payload.interval_ms}"
+    )
+    return JSONResponse(_profile_state())
+
+
+@app.delete("/api/debug/profile")
+def disarm_profile(request: Request, token: Optional[str] = Query(None)):
+    global profile_request, window_sampler
+    _require_token(request, token)
+    with profile_lock:
+        profile_request = None
+        sampler, window_sampler = window_sampler, None
+    if sampler is not None:
+        sampler.stop()
+    _log("PROFILE_DISARM")
+    return JSONResponse(_profile_state())
+
+
+@app.get("/api/debug/profiles")
+def list_profiles(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    items = []
+    if PROFILE_DIR.exists():
+        for path in sorted(PROFILE_DIR.iterdir(), key=lambda item: item.stat().st_mtime, reverse=True):
+            stat = path.stat()
+            items.append({"name": path.name, "bytes": stat.st_size, "createdAt": stat.st_mtime})
+    return JSONResponse({"profiles": items})
+
+
+@app.get("/api/debug/profiles/{name}")
+def download_profile(name: str, request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    path = PROFILE_DIR / name
+    if Path(name).name != name or not path.is_file():
+        raise HTTPException(status_code=404, detail="分析文件不存在")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
+@app.get("/api/debug/threads")
+def thread_stacks(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    frames = sys._current_frames()
+    items = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        items.append(
+            {
+                "name": thread.name,
+                "ident": thread.ident,
+                "daemon": thread.daemon,
+                "stack": traceback.format_stack(frame) if frame is not None else [],
+            }
+        )
+    return JSONResponse({"activeTaskId": active_task_id, "threads": items})
+
+
+@app.get("/api/tuning")
+def get_tuning(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    return JSONResponse(
+        {
+            "state": dict(tuning_state),
+            "active": _model_settings(),
+            "profiles": _load_tuning(),
+        }
+    )
+
+
+@app.post("/api/tuning")
+def start_tuning(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    if WHISPER_DEVICE != "cpu":
+        raise HTTPException(status_code=400, detail="仅支持 CPU 调优")
+    if not _start_autotune("manual"):
+        raise HTTPException(status_code=409, detail="调优正在进行中")
+    return JSONResponse({"state": dict(tuning_state)}, status_code=202)
+
+
+@app.get("/api/settings")
+def get_settings(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    return JSONResponse(_settings_view())
+
+
+@app.put("/api/settings")
+def update_settings(payload: SettingsUpdateRequest, request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    unknown = [key for key in payload.reset if key not in SETTINGS_DEFAULTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知的设置项: {', '.join(unknown)}")
+    if payload.compute is not None and payload.compute not in COMPUTE_TYPES:
+        raise HTTPException(status_code=400, detail="不支持的计算类型")
+    values = {
+        key: getattr(payload, key)
+        for key in SETTINGS_DEFAULTS
+        if getattr(payload, key) is not None and key not in payload.reset
+    }
+    if "modelSize" in values:
+        values["modelSize"] = values["modelSize"].strip()
+        if not values["modelSize"]:
+            raise HTTPException(status_code=400, detail="模型名称不能为空")
+    _db_save_settings(values, payload.reset)
+    with settings_lock:
+        before = {**SETTINGS_DEFAULTS, **runtime_settings}
+        for key in payload.reset:
+            runtime_settings.pop(key, None)
+        runtime_settings.update(values)
+        after = {**SETTINGS_DEFAULTS, **runtime_settings}
+    _apply_settings()
+    changed = sorted(key for key in after if after[key] != before[key])
+    _log(f"SETTINGS_UPDATE changed={','.join(changed) or '-'} reset={','.join(payload.reset) or '-'}")
+    _touch_activity()
+    if "modelSize" in changed:
+        threading.Thread(target=_refresh_model_cache, name="model-cache-check", daemon=True).start()
+        if _needs_autotune():
+            _start_autotune("model_change")
+    _start_model_rebuild()
+    return JSONResponse(_settings_view())
+
+
+@app.get("/api/download-strategies")
+def list_download_strategies(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    now = time.time()
+    with strategy_lock:
+        items = [
+            {
+                "site": site,
+                "strategy": strategy,
+                **stats,
+                "coolingDown": _strategy_is_cooling_down(stats, now),
+            }
+            for (site, strategy), stats in strategy_stats.items()
+        ]
+    items.sort(key=lambda item: (item["site"], item["strategy"]))
+    return JSONResponse({"strategies": items})
+
+
+def _get_lease(lease_id: str) -> Dict[str, Any]:
+    with lock:
+        lease = leases.get(lease_id)
+    if lease is None:
+        raise HTTPException(status_code=410, detail="租约已失效")
+    return lease
+
+
+def _release_lease(lease_id: str) -> Dict[str, Any]:
+    with lock:
+        lease = leases.pop(lease_id, None)
+    if lease is None:
+        raise HTTPException(status_code=410, detail="租约已失效")
+    return lease
+
+
+@app.post("/api/worker/lease")
+def lease_task(request: Request, payload: LeaseRequest = Body(...), token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    deadline = time.monotonic() + payload.wait
+    with condition:
+        while not queue:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return Response(status_code=204)
+            condition.wait(remaining)
+        task_id = queue.popleft()
+        task = tasks[task_id]
+        now = time.time()
+        lease = {
+            "leaseId": uuid.uuid4().hex,
+            "taskId": task_id,
+            "workerId": payload.workerId,
+            "grantedAt": now,
+            "expiresAt": now + LEASE_SECONDS,
+        }
+        leases[lease["leaseId"]] = lease
+        queued_at = task.get("queuedAt") or task.get("updatedAt")
+        task.update(
+            status=TASK_STATUS_DOWNLOADING,
+            downloadProgress=0,
+            transcribeProgress=0,
+            errorCode=None,
+            errorMessage=None,
+            workerId=payload.workerId,
+            updatedAt=now,
+        )
+        _db_upsert_task(task)
+        task = dict(task)
+    if queued_at:
+        METRIC_QUEUE_WAIT.observe(max(0.0, now - queued_at))
+    cookies = None
+    if task.get("cookiefilePath") and Path(task["cookiefilePath"]).is_file():
+        cookies = Path(task["cookiefilePath"]).read_text(encoding="utf-8")
+    audio_path = task.get("audioPath")
+    _log(f"LEASE_GRANTED lease={lease['leaseId']} task={task_id} worker={payload.workerId}")
+    return JSONResponse(
+        {
+            **lease,
+            "leaseSeconds": LEASE_SECONDS,
+            "heartbeatSeconds": LEASE_SECONDS / 4,
+            "url": task["url"],
+            "title": task.get("title"),
+            "site": task.get("site"),
+            "decodeProfile": task.get("decodeProfile"),
+            "twoPass": bool(task.get("twoPass")),
+            "cookies": cookies,
+            "audioName": Path(audio_path).name if audio_path and Path(audio_path).is_file() else None,
+            # Checkpointed segments of an earlier attempt, so the worker resumes instead of restarting
+            "segments": [dict(row) for row in _db_load_segments(task_id)],
+        }
+    )
+
+
+@app.post("/api/worker/leases/{lease_id}/heartbeat")
+def lease_heartbeat(
+    request: Request,
+    lease_id: str,
+    payload: LeaseHeartbeatRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    lease = _get_lease(lease_id)
+    task_id = lease["taskId"]
+    with lock:
+        lease["expiresAt"] = time.time() + LEASE_SECONDS
+        task = tasks.get(task_id) or {}
+        cancel = bool(task.get("cancelRequested")) or task.get("status") == TASK_STATUS_CANCELED
+    updates: Dict[str, Any] = {
+        "downloadProgress": payload.downloadProgress,
+        "transcribeProgress": payload.transcribeProgress,
+    }
+    if payload.status in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING):
+        updates["status"] = payload.status
+    _update_task(task_id, **updates)
+    if payload.segments and not cancel:
+        for segment in payload.segments:
+            _checkpoint_segment(task_id, segment.seq, segment.start, segment.end, segment.text)
+        _flush_checkpoints(task_id)
+    return JSONResponse({"ok": True, "cancel": cancel, "expiresAt": lease["expiresAt"]})
+
+
+@app.get("/api/worker/leases/{lease_id}/audio")
+def lease_audio(request: Request, lease_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    lease = _get_lease(lease_id)
+    with lock:
+        audio_path = (tasks.get(lease["taskId"]) or {}).get("audioPath")
+    if not audio_path or not Path(audio_path).is_file():
+        raise HTTPException(status_code=404, detail="音频不存在")
+    return FileResponse(audio_path, media_type="application/octet-stream", filename=Path(audio_path).name)
+
+
+def _upload_audio_suffix(name: str) -> str:
+    suffix = Path(name).suffix.lower()
+    return suffix if suffix in UPLOAD_AUDIO_SUFFIXES else ".audio"
+
+
+@app.put("/api/worker/leases/{lease_id}/audio")
+async def upload_lease_audio(
+    request: Request,
+    lease_id: str,
+    name: str = Query(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    lease = _get_lease(lease_id)
+    task_id = lease["taskId"]
+    audio_path = TEMP_DIR / f"{task_id}{_upload_audio_suffix(name)}"
+    partial_path = audio_path.with_name(audio_path.name + ".upload.part")
+    with partial_path.open("wb") as handle:
+        async for chunk in request.stream():
+            handle.write(chunk)
+    partial_path.replace(audio_path)
+    _update_task(task_id, audioPath=str(audio_path))
+    _log(f"LEASE_AUDIO_STORED task={task_id} bytes={audio_path.stat().st_size}")
+    return JSONResponse({"ok": True})
+
+
+@app.put("/api/worker/leases/{lease_id}/draft")
+async def upload_lease_draft(request: Request, lease_id: str, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    task_id = _get_lease(lease_id)["taskId"]
+    draft_path = _draft_path(task_id)
+    partial_path = draft_path.with_name(draft_path.name + ".part")
+    partial_path.write_bytes(await request.body())
+    with lock:
+        task = tasks.get(task_id)
+        # Checked under the lock so a draft racing the final report cannot outlive it
+        stored = (
+            lease_id in leases
+            and task is not None
+            and task["status"] in (TASK_STATUS_DOWNLOADING, TASK_STATUS_TRANSCRIBING)
+        )
+        if stored:
+            partial_path.replace(draft_path)
+            task["draftPath"] = str(draft_path)
+            task["draftAt"] = time.time()
+            task["updatedAt"] = time.time()
+            _db_upsert_task(task)
+    if not stored:
+        _remove_file(partial_path)
+        raise HTTPException(status_code=410, detail="租约已失效")
+    _log(f"LEASE_DRAFT_STORED task={task_id} bytes={draft_path.stat().st_size}")
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/worker/leases/{lease_id}/complete")
+def complete_lease(
+    request: Request,
+    lease_id: str,
+    payload: LeaseCompleteRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    lease = _release_lease(lease_id)
+    task_id = lease["taskId"]
+    with lock:
+        task = dict(tasks.get(task_id) or {})
+    if not task:
+        return JSONResponse({"ok": True})
+    if task.get("cancelRequested") or task["status"] == TASK_STATUS_CANCELED:
+        _mark_canceled(task_id)
+        _clear_task_files(task)
+        return JSONResponse({"ok": True, "canceled": True})
+    _db_clear_segments(task_id)
+    with db_lock, _db_connect() as conn:
+        conn.executemany(
+            "INSERT INTO transcript_segments (task_id, seq, start, end, text) VALUES (?, ?, ?, ?, ?)",
+            [(task_id, item.seq, item.start, item.end, item.text) for item in payload.segments],
+        )
+        conn.commit()
+    if payload.realtimeFactor is not None:
+        METRIC_REALTIME_FACTOR.observe(payload.realtimeFactor)
+    _update_task(
+        task_id,
+        timeline=payload.timeline,
+        audioDuration=payload.audioDuration,
+        realtimeFactor=payload.realtimeFactor,
+        downloadAttempts=payload.downloadAttempts,
+        loopGuard=payload.loopGuard,
+        transcribeProgress=100,
+    )
+    _complete_task(task_id, payload.text)
+    with lock:
+        task = dict(tasks.get(task_id) or {})
+    _learn_throughput(task)
+    _log(f"LEASE_COMPLETE lease={lease_id} task={task_id} worker={lease['workerId']}")
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/worker/leases/{lease_id}/fail")
+def fail_lease(
+    request: Request,
+    lease_id: str,
+    payload: LeaseFailRequest = Body(...),
+    token: Optional[str] = Query(None),
+):
+    _require_token(request, token)
+    lease = _release_lease(lease_id)
+    task_id = lease["taskId"]
+    with lock:
+        task = dict(tasks.get(task_id) or {})
+    if not task:
+        return JSONResponse({"ok": True})
+    if payload.canceled or task.get("cancelRequested"):
+        _mark_canceled(task_id)
+        _clear_task_files(task)
+    else:
+        _update_task(
+            task_id,
+            status=TASK_STATUS_ERROR,
+            errorCode=payload.errorCode or "download_failed",
+            errorMessage=payload.errorMessage,
+        )
+        _discard_draft(task_id)
+    _log(
+        f"LEASE_FAILED lease={lease_id} task={task_id} worker={lease['workerId']} "
+        f"canceled={int(payload.canceled)} code={payload.errorCode}"
+    )
+    return JSONResponse({"ok": True})
+
+
+@app.get("/api/worker/leases")
+def list_leases(request: Request, token: Optional[str] = Query(None)):
+    _require_token(request, token)
+    with lock:
+        items = [dict(lease) for lease in leases.values()]
+    return JSONResponse({"leases": items, "leaseSeconds": LEASE_SECONDS})
+
+
+class _LeaseLost(Exception):
+    pass
+
+
+def _coordinator_request(method: str, path: str, payload: Any = None, timeout: float = 30.0) -> Any:
+    headers = {"Authorization": f"Bearer {SERVICE_TOKEN}"}
+    data = None
+    if payload is not None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    request = urllib.request.Request(COORDINATOR_URL + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+    except urllib.error.HTTPError as exc:
+        if exc.code == 410:
+            raise _LeaseLost(path) from exc
+        raise
+    return json.loads(body) if body else None
+
+
+def _coordinator_download(path: str, target: Path) -> Path:
+    request = urllib.request.Request(
+        COORDINATOR_URL + path, headers={"Authorization": f"Bearer {SERVICE_TOKEN}"}
+    )
+    partial_path = target.with_name(target.name + ".part")
+    with urllib.request.urlopen(request, timeout=60) as response, partial_path.open("wb") as handle:
+        shutil.copyfileobj(response, handle, 1024 * 1024)
+    partial_path.replace(target)
+    return target
+
+
+def _coordinator_upload(path: str, source: Path) -> None:
+    with source.open("rb") as handle:
+        request = urllib.request.Request(
+            COORDINATOR_URL + path,
+            data=handle,
+            method="PUT",
+            headers={
+                "Authorization": f"Bearer {SERVICE_TOKEN}",
+                "Content-Type": "application/octet-stream",
+                "Content-Length": str(source.stat().st_size),
+            },
+        )
+        with urllib.request.urlopen(request, timeout=300) as response:
+            response.read()
+
+
+def _request_local_cancel(task_id: str) -> None:
+    _update_task(
+        task_id,
+        status=TASK_STATUS_CANCELING,
+        cancelRequested=True,
+        cancelRequestedAt=time.monotonic(),
+    )
+
+
+class _LeaseHeartbeat:
+    """Renews a lease while its task runs, reporting progress and new segments."""
+
+    def __init__(self, lease: Dict[str, Any]) -> None:
+        self.lease = lease
+        self.task_id = lease["taskId"]
+        self.cursor = len(lease.get("segments") or [])
+        self.lost = False
+        self.audio_sent = bool(lease.get("audioName")) or not WORKER_UPLOAD_AUDIO
+        self.draft_sent = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def __enter__(self) -> "_LeaseHeartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease["heartbeatSeconds"]):
+            self.beat()
+
+    def beat(self) -> None:
+        lease_id = self.lease["leaseId"]
+        with lock:
+            task = dict(tasks.get(self.task_id) or {})
+        segments = _segments_since(self.task_id, self.cursor)
+        payload = {
+            "status": task.get("status"),
+            "downloadProgress": int(task.get("downloadProgress") or 0),
+            "transcribeProgress": int(task.get("transcribeProgress") or 0),
+            "segments": segments,
+        }
+        try:
+            reply = _coordinator_request("POST", f"/api/worker/leases/{lease_id}/heartbeat", payload)
+        except _LeaseLost:
+            _log(f"LEASE_LOST lease={lease_id} task={self.task_id}", level="warning")
+            self.lost = True
+            self._stop.set()
+            _request_local_cancel(self.task_id)
+            return
+        except (OSError, ValueError) as exc:
+            _log(f"LEASE_HEARTBEAT failed lease={lease_id} error={exc}", level="warning")
+            return
+        if segments:
+            self.cursor = segments[-1]["seq"] + 1
+        if reply.get("cancel") and not task.get("cancelRequested"):
+            _log(f"LEASE_CANCEL lease={lease_id} task={self.task_id}")
+            _request_local_cancel(self.task_id)
+        draft_path = task.get("draftPath")
+        if not self.draft_sent and draft_path and Path(draft_path).is_file():
+            # Two-pass drafts are only readable through the coordinator's result endpoint
+            self.draft_sent = True
+            try:
+                _coordinator_upload(f"/api/worker/leases/{lease_id}/draft", Path(draft_path))
+            except OSError as exc:
+                _log(f"LEASE_DRAFT_UPLOAD failed lease={lease_id} error={exc}", level="warning")
+        audio_path = task.get("audioPath")
+        if not self.audio_sent and audio_path and task.get("status") == TASK_STATUS_TRANSCRIBING:
+            self.audio_sent = True
+            threading.Thread(
+                target=self._upload_audio, args=(Path(audio_path),), name="audio-upload", daemon=True
+            ).start()
+
+    def _upload_audio(self, audio_path: Path) -> None:
+        lease_id = self.lease["leaseId"]
+        try:
+            _coordinator_upload(
+                f"/api/worker/leases/{lease_id}/audio?name={quote(audio_path.name)}",
+                audio_path,
+            )
+        except (OSError, _LeaseLost) as exc:
+            _log(f"LEASE_AUDIO_UPLOAD failed lease={lease_id} error={exc}", level="warning")
+
+
+def _report_lease(lease_id: str, path: str, payload: Dict[str, Any], heartbeat: _LeaseHeartbeat) -> bool:
+    """POST the final report of a lease, retrying transient failures until it lands or the lease is lost."""
+    delay = 1.0
+    while not heartbeat.lost:
+        try:
+            _coordinator_request("POST", path, payload, timeout=120)
+            return True
+        except _LeaseLost:
+            return False
+        except urllib.error.HTTPError as exc:
+            if exc.code < 500 and exc.code not in (408, 429):
+                raise
+            error = f"http {exc.code}"
+        except OSError as exc:
+            error = str(exc)
+        _log(f"LEASE_REPORT retry lease={lease_id} in={delay:.0f}s error={error}", level="warning")
+        time.sleep(delay)
+        delay = min(delay * 2, 60.0)
+    return False
+
+
+def _run_lease(lease: Dict[str, Any]) -> None:
+    global active_task_id
+    task_id = lease["taskId"]
+    lease_id = lease["leaseId"]
+    cookiefile_path = None
+    if lease.get("cookies"):
+        cookiefile_path = str(_cookiefile_path(task_id))
+        Path(cookiefile_path).write_text(lease["cookies"], encoding="utf-8")
+    audio_path = None
+    if lease.get("audioName"):
+        target = TEMP_DIR / f"{task_id}{_upload_audio_suffix(lease['audioName'])}"
+        try:
+            audio_path = str(_coordinator_download(f"/api/worker/leases/{lease_id}/audio", target))
+        except OSError as exc:
+            _log(f"LEASE_AUDIO_FETCH failed lease={lease_id} error={exc}", level="warning")
+    now = time.time()
+    task = {
+        "id": task_id,
+        "url": lease["url"],
+        "title": lease.get("title"),
+        "site": lease.get("site"),
+        "status": TASK_STATUS_QUEUED,
+        "createdAt": now,
+        "updatedAt": now,
+        "downloadProgress": 0,
+        "transcribeProgress": 0,
+        "errorCode": None,
+        "errorMessage": None,
+        "resultPath": None,
+        "resultFilename": None,
+        "audioPath": audio_path,
+        "cookiefilePath": cookiefile_path,
+        "cookiesSupplied": cookiefile_path is not None,
+        "cancelRequested": False,
+        "queueOrder": None,
+        "downloadAttempts": [],
+        "decodeProfile": lease.get("decodeProfile"),
+        "twoPass": bool(lease.get("twoPass")),
+        "workerId": WORKER_ID,
+    }
+    with lock:
+        tasks[task_id] = task
+        _db_upsert_task(task)
+        active_task_id = task_id
+    for segment in lease.get("segments") or []:
+        _checkpoint_segment(task_id, segment["seq"], segment["start"], segment["end"], segment["text"])
+    _flush_checkpoints(task_id)
+    task_timelines[task_id] = _TaskTimeline(task_id, None)
+    log_context.task_id = task_id
+    _log(f"LEASE_START lease={lease_id} task={task_id} audio_reused={int(audio_path is not None)}")
+    sampler = _PeakRssSampler()
+    try:
+        with _LeaseHeartbeat(lease) as heartbeat:
+            try:
+                with sampler:
+                    _process_task(task_id)
+            finally:
+                _finish_timeline(task_id, sampler.peak_bytes or None)
+            with lock:
+                task = dict(tasks.get(task_id) or task)
+            if heartbeat.lost:
+                return
+            if task["status"] == TASK_STATUS_DONE:
+                path = f"/api/worker/leases/{lease_id}/complete"
+                payload = {
+                    "text": Path(task["resultPath"]).read_text(encoding="utf-8"),
+                    "segments": [dict(row) for row in _db_load_segments(task_id)],
+                    "audioDuration": task.get("audioDuration"),
+                    "realtimeFactor": task.get("realtimeFactor"),
+                    "timeline": task.get("timeline"),
+                    "downloadAttempts": task.get("downloadAttempts") or [],
+                    "loopGuard": task.get("loopGuard"),
+                }
+            else:
+                path = f"/api/worker/leases/{lease_id}/fail"
+                payload = {
+                    "errorCode": task.get("errorCode"),
+                    "errorMessage": task.get("errorMessage"),
+                    "canceled": task["status"] == TASK_STATUS_CANCELED,
+                }
+            # Still inside the heartbeat, so the lease stays ours while the report is retried
+            reported = _report_lease(lease_id, path, payload, heartbeat)
+        if reported:
+            _log(f"LEASE_REPORTED lease={lease_id} task={task_id} status={task['status']}")
+        else:
+            _log(f"LEASE_REPORT dropped lease={lease_id} task={task_id} reason=lease_lost", level="warning")
+    except (OSError, ValueError, _LeaseLost) as exc:
+        _log(f"LEASE_REPORT failed lease={lease_id} task={task_id} error={exc}", level="error")
+    finally:
+        _clear_task_files(task)
+        _db_delete_task(task_id)
+        with lock:
+            tasks.pop(task_id, None)
+            active_task_id = None
+        log_context.task_id = None
+        log_context.stage = None
+
+
+def _run_remote_worker() -> None:
+    """Worker role: lease tasks from the coordinator and run them through the local pipeline."""
+    if not COORDINATOR_URL or not os.getenv("TRANSCRIBER_TOKEN"):
+        raise SystemExit("TRANSCRIBER_COORDINATOR_URL and TRANSCRIBER_TOKEN are required for the worker role")
+    service_ready.wait()
+    # TEMP_DIR only holds scratch copies of leased tasks; anything left over belongs to dead leases
+    with lock:
+        stale = list(tasks.values())
+        tasks.clear()
+        queue.clear()
+    for task in stale:
+        _clear_task_files(task)
+        _db_delete_task(task["id"])
+    _log(f"WORKER_START id={WORKER_ID} coordinator={COORDINATOR_URL} stale_tasks={len(stale)}")
+    threading.Thread(target=_warmup_modules, name="module-warmup", daemon=True).start()
+    backoff = 1.0
+    while True:
+        _rebuild_whisper_model()
+        try:
+            lease = _coordinator_request("POST", "/api/worker/lease", {"workerId": WORKER_ID, "wait": 20}, timeout=40)
+        except (OSError, ValueError) as exc:
+            _log(f"WORKER_LEASE failed error={exc} retry_in={backoff:.0f}s", level="warning")
+            time.sleep(backoff)
+            backoff = min(60.0, backoff * 2)
+            continue
+        backoff = 1.0
+        if lease:
+            _run_lease(lease)
+
+
+# Started last so every function and global above exists before the thread touches them
+threading.Thread(target=_initialize_service, name="service-init", daemon=True).start()
 
 
 if __name__ == "__main__":
@@ -1291,6 +5890,10 @@ if __name__ == "__main__":
 
     def _on_signal(sig, frame):
         _log(f"SERVICE_EXIT_SIGNAL signal={sig}")
+        flushed = _flush_checkpoints(lock_timeout=5)
+        if flushed:
+            _log(f"CHECKPOINT_FLUSH_ON_EXIT segments={flushed}")
+        _flush_logs()
         os._exit(0)
 
     signal.signal(signal.SIGTERM, _on_signal)
@@ -1302,10 +5905,19 @@ if __name__ == "__main__":
         f"{MODEL_SIZE} device={WHISPER_DEVICE} compute={WHISPER_COMPUTE} "
         f"cpu_threads={CPU_THREADS} num_workers=1 idle_seconds={IDLE_SECONDS}"
     )
+    if PIPELINE_MODE == "fake":
+        _log(
+            f"PIPELINE_FAKE download={FAKE_DOWNLOAD_SECONDS}s transcribe={FAKE_TRANSCRIBE_SECONDS}s "
+            f"progress_hz={FAKE_PROGRESS_HZ} lock_stats={LOCK_STATS}"
+        )
     os.environ.pop("WEB_CONCURRENCY", None)
     os.environ.pop("UVICORN_WORKERS", None)
+    if ROLE == "worker":
+        _run_remote_worker()
     try:
-        uvicorn.run(app, host="127.0.0.1", port=SERVICE_PORT, workers=1, reload=False)
+        config = uvicorn.Config(app, host=SERVICE_HOST, port=SERVICE_PORT, workers=1, reload=False)
+        uvicorn.Server(config).run(sockets=[prebound_socket] if prebound_socket else None)
     except Exception as exc:
-        _log(f"SERVICE_CRASH error={exc}")
+        _log(f"SERVICE_CRASH error={exc}", level="error")
+        _flush_logs()
         raise
@@ -0,0 +1,189 @@
+"""API tests against the fake pipeline.
+
+The service runs in-process with ``TRANSCRIBER_PIPELINE=fake`` and no local
+worker, and each test plays the worker through the lease API. The environment
+is fixed before import because the module reads its configuration at import time.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+os.environ.update(
+    {
+        "TRANSCRIBER_BASE_DIR": tempfile.mkdtemp(prefix="transcriber-test-"),
+        "TRANSCRIBER_TOKEN": "test-token",
+        "TRANSCRIBER_PIPELINE": "fake",
+        "TRANSCRIBER_LOCAL_WORKER": "0",
+        "TRANSCRIBER_LEASE_SECONDS": "5",
+        "TRANSCRIBER_IDLE_SECONDS": "0",
+        "TRANSCRIBER_AUTOTUNE": "0",
+        "TRANSCRIBER_PROBE_DURATION": "0",
+        "TRANSCRIBER_DEDUP": "0",
+    }
+)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mini_transcriber as service  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+HEADERS = {"Authorization": "Bearer test-token"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    assert service.service_ready.wait(30)
+    return TestClient(service.app)
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(client):
+    yield
+    # Queued leftovers would be handed to the next test's lease
+    client.post("/api/tasks/clear", headers=HEADERS, json={})
+
+
+def create_task(client, url="https://example.com/video/1"):
+    response = client.post("/api/tasks", headers=HEADERS, json={"url": url, "title": "test"})
+    assert response.status_code == 200
+    return response.json()["task"]["id"]
+
+
+def get_task(client, task_id):
+    tasks = client.get("/api/tasks", headers=HEADERS).json()["tasks"]
+    return next(item for item in tasks if item["id"] == task_id)
+
+
+def take_lease(client):
+    response = client.post("/api/worker/lease", headers=HEADERS, json={"workerId": "test-worker", "wait": 1})
+    assert response.status_code == 200
+    return response.json()
+
+
+def complete_lease(client, lease_id, text="第1段测试文本。"):
+    payload = {"text": text, "segments": [{"seq": 0, "start": 0.0, "end": 5.0, "text": text}], "audioDuration": 5.0}
+    return client.post(f"/api/worker/leases/{lease_id}/complete", headers=HEADERS, json=payload)
+
+
+def wait_for(predicate, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def test_expired_lease_is_requeued(client):
+    task_id = create_task(client)
+    lease = take_lease(client)
+    assert lease["taskId"] == task_id
+    assert get_task(client, task_id)["workerId"] == "test-worker"
+
+    # No heartbeats: the reaper hands the task back to the queue after LEASE_SECONDS
+    assert wait_for(lambda: get_task(client, task_id)["status"] == "queued")
+    task = get_task(client, task_id)
+    assert task["resumeCount"] == 1
+    assert task["workerId"] is None
+    heartbeat = client.post(f"/api/worker/leases/{lease['leaseId']}/heartbeat", headers=HEADERS, json={})
+    assert heartbeat.status_code == 410
+
+    lease = take_lease(client)
+    assert lease["taskId"] == task_id
+    assert complete_lease(client, lease["leaseId"]).status_code == 200
+    assert get_task(client, task_id)["status"] == "done"
+    assert client.get(f"/api/tasks/{task_id}/result", headers=HEADERS).text == "第1段测试文本。"
+
+
+def test_expired_lease_past_resume_limit_fails(client, monkeypatch):
+    monkeypatch.setattr(service, "MAX_AUTO_RESUME", 0)
+    errors = service.METRIC_TASKS._values.get(("error",), 0.0)
+    task_id = create_task(client)
+    take_lease(client)
+
+    assert wait_for(lambda: get_task(client, task_id)["status"] == "error")
+    assert get_task(client, task_id)["errorCode"] == "interrupted"
+    assert service.METRIC_TASKS._values.get(("error",), 0.0) == errors + 1
+
+
+def test_batch_cancel_and_delete(client):
+    urls = [f"https://example.com/batch/{index}" for index in range(3)]
+    response = client.post("/api/tasks/bulk", headers=HEADERS, json={"urls": urls})
+    assert response.status_code == 200
+    batch_id = response.json()["batchId"]
+    lease = take_lease(client)
+
+    canceled = client.post(f"/api/batches/{batch_id}/cancel", headers=HEADERS).json()
+    assert (canceled["canceled"], canceled["canceling"]) == (2, 1)
+    heartbeat = client.post(f"/api/worker/leases/{lease['leaseId']}/heartbeat", headers=HEADERS, json={})
+    assert heartbeat.json()["cancel"] is True
+    # Running tasks are only deleted once they stopped
+    assert client.delete(f"/api/batches/{batch_id}", headers=HEADERS).json()["running"] == 1
+
+    client.post(f"/api/worker/leases/{lease['leaseId']}/fail", headers=HEADERS, json={"canceled": True})
+    counts = client.get(f"/api/batches/{batch_id}", headers=HEADERS).json()["counts"]
+    assert counts == {"canceled": 1}
+    assert client.delete(f"/api/batches/{batch_id}", headers=HEADERS).json()["deleted"] == 1
+    assert client.get(f"/api/batches/{batch_id}", headers=HEADERS).status_code == 404
+
+
+def test_wait_returns_when_task_finishes(client):
+    task_id = create_task(client)
+    lease = take_lease(client)
+    result = {}
+
+    def wait():
+        started = time.monotonic()
+        result["body"] = client.get(f"/api/tasks/{task_id}/wait", headers=HEADERS, params={"timeout": 30}).json()
+        result["seconds"] = time.monotonic() - started
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.5)
+    assert waiter.is_alive()
+    assert complete_lease(client, lease["leaseId"]).status_code == 200
+    waiter.join(10)
+    assert not waiter.is_alive()
+    assert result["body"]["complete"] is True
+    assert result["body"]["task"]["status"] == "done"
+    assert result["seconds"] < 10
+
+
+def test_wait_times_out_on_unfinished_task(client):
+    task_id = create_task(client)
+    body = client.get(f"/api/tasks/{task_id}/wait", headers=HEADERS, params={"timeout": 0.2}).json()
+    assert body["complete"] is False
+    assert body["task"]["status"] == "queued"
+
+
+def test_settings_round_trip(client):
+    view = client.put("/api/settings", headers=HEADERS, json={"cpuThreads": 3, "idleSeconds": 3600}).json()
+    assert view["effective"]["cpuThreads"] == 3
+    assert view["effective"]["idleSeconds"] == 3600
+    assert view["overrides"] == {"cpuThreads": 3, "idleSeconds": 3600}
+    assert view["source"] == "settings"
+    assert client.get("/api/settings", headers=HEADERS).json()["effective"] == view["effective"]
+
+    # What a restart sees: the values come back from the database
+    with service.settings_lock:
+        service.runtime_settings.clear()
+    service._load_settings()
+    assert client.get("/api/settings", headers=HEADERS).json()["overrides"] == {"cpuThreads": 3, "idleSeconds": 3600}
+
+    view = client.put("/api/settings", headers=HEADERS, json={"reset": ["cpuThreads", "idleSeconds"]}).json()
+    assert view["overrides"] == {}
+    assert view["effective"]["idleSeconds"] == view["defaults"]["idleSeconds"]
+    service._load_settings()
+    assert client.get("/api/settings", headers=HEADERS).json()["overrides"] == {}
+
+
+def test_settings_rejects_invalid_values(client):
+    assert client.put("/api/settings", headers=HEADERS, json={"compute": "bogus"}).status_code == 400
+    assert client.put("/api/settings", headers=HEADERS, json={"reset": ["unknown"]}).status_code == 400
+    assert client.put("/api/settings", headers=HEADERS, json={"cpuThreads": -1}).status_code == 422
+    assert client.put("/api/settings", json={}).status_code == 401